@@ -1,4 +1,5 @@
 import logging
+import functools
 from datetime import timedelta
 
 from django.contrib import admin
@@ -6,8 +7,12 @@ from django.contrib import messages
 from django.contrib.auth import get_permission_codename
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
+from django.db import transaction
 from django.http import HttpResponseRedirect
 from django.shortcuts import render
+from django.urls import reverse
+from django.utils.html import format_html
+from django.utils import timezone
 from django.utils.translation import ngettext
 from core import utils
 
@@ -15,7 +20,15 @@ from apps.ifc_validation_models.models import ValidationRequest, ValidationTask,
 from apps.ifc_validation_models.models import Model, ModelInstance, Company, AuthoringTool
 from apps.ifc_validation_models.models import set_user_context
 
-from .tasks import ifc_file_validation_task
+from .tasks import ifc_file_validation_task, purge_requests_task
+from .models import PurgeJob
+from .purge import schedule_purge
+from .messages import render_message
+from .search import search_outcomes, search_instances
+from .pagination import EstimatedCountPaginator
+
+from apps.ifc_validation_bff.snapshots import invalidate_report_snapshots
+from apps.ifc_validation_bff.caching import invalidate_user_ids
 
 logger = logging.getLogger(__name__)
 
@@ -50,6 +63,7 @@ class ValidationRequestAdmin(BaseAdmin, NonAdminAddable):
 
     list_display = ["id", "public_id", "file_name", "file_size_text", "status", "progress", "duration_text", "created", "created_by", "updated", "updated_by", "is_deleted"]
     readonly_fields = ["id", "public_id", "deleted", "file_name", "file", "file_size_text", "duration", "duration_text", "created", "created_by", "updated", "updated_by"] 
+    list_select_related = ["created_by", "updated_by"]
     date_hierarchy = "created"
 
     list_filter = ["status", "deleted", "created_by", "created", "updated"]
@@ -87,17 +101,22 @@ class ValidationRequestAdmin(BaseAdmin, NonAdminAddable):
         
         if 'apply' in request.POST:
 
-            for obj in queryset:
-                obj.hard_delete()
+            # deleted in the background (see purge.py), the requests are hidden until then
+            job = schedule_purge(queryset.values_list('id', flat=True), user=request.user)
+            transaction.on_commit(functools.partial(purge_requests_task.delay, job.id))
 
             self.message_user(
                 request,
-                ngettext(
-                    "%d Validation Request was successfully deleted.",
-                    "%d Validation Requests were successfully deleted.",
-                    len(queryset),
-                )
-                % len(queryset),
+                format_html(
+                    '{} - progress is shown on <a href="{}">Purge Job #{}</a>.',
+                    ngettext(
+                        "%d Validation Request is scheduled for permanent deletion",
+                        "%d Validation Requests are scheduled for permanent deletion",
+                        job.total,
+                    ) % job.total,
+                    reverse('admin:ifc_validation_purgejob_change', args=[job.id]),
+                    job.id
+                ),
                 messages.SUCCESS,
             )
             return HttpResponseRedirect(request.get_full_path())
@@ -116,6 +135,7 @@ class ValidationRequestAdmin(BaseAdmin, NonAdminAddable):
 
         for obj in queryset:
             obj.soft_delete()
+            invalidate_report_snapshots(obj.id)
 
         self.message_user(
             request,
@@ -162,7 +182,8 @@ class ValidationRequestAdmin(BaseAdmin, NonAdminAddable):
             logger.info(f"Authenticated, user.id = {request.user.id}")
             set_user_context(request.user)
 
-        queryset.update(status=ValidationRequest.Status.FAILED)
+        # bulk update, bypasses auto_now (see conditional.py)
+        queryset.update(status=ValidationRequest.Status.FAILED, updated=timezone.now())
 
     @admin.action(
         description="Restart processing of selected Validation Requests",
@@ -179,6 +200,7 @@ class ValidationRequestAdmin(BaseAdmin, NonAdminAddable):
             obj.mark_as_pending(reason='Resubmitted for processing via Django admin UI')
             if obj.model:
                 obj.model.reset_status()
+            invalidate_report_snapshots(obj.id)
             ifc_file_validation_task.delay(obj.id, obj.file_name)
             logger.info(f"Task 'ifc_file_validation_task' re-submitted for id:{obj.id} file_name: {obj.file_name}")
 
@@ -223,6 +245,7 @@ class ValidationTaskAdmin(BaseAdmin, NonAdminAddable):
 
     list_display = ["id", "public_id", "request", "type", "status", "progress", "started", "ended", "duration_text", "created", "updated"]
     readonly_fields = ["id", "public_id", "request", "type", "process_id", "process_cmd", "started", "ended", "duration", "created", "updated"]
+    list_select_related = ["request"]
     date_hierarchy = "created"
 
     list_filter = ["status", "type", "status", "started", "ended", "created", "updated"]
@@ -245,11 +268,23 @@ class ValidationTaskAdmin(BaseAdmin, NonAdminAddable):
 
 class ValidationOutcomeAdmin(BaseAdmin, NonAdminAddable):
 
-    list_display = ["id", "public_id", "file_name_text", "type_text", "instance_id", "feature", "feature_version", "outcome_code", "severity", "expected", "observed", "created", "updated"]
+    list_display = ["id", "public_id", "file_name_text", "type_text", "instance_id", "feature", "feature_version", "outcome_code", "severity", "expected_text", "observed_text", "created", "updated"]
     readonly_fields = ["id", "public_id", "created", "updated"]
+    list_select_related = ["validation_task__request"]
 
     list_filter = ['validation_task__type', 'severity', 'outcome_code']
-    search_fields = ('validation_task__request__file_name', 'feature', 'feature_version', 'outcome_code', 'severity', 'expected', 'observed')
+    # each with a trigram index (see migrations 0010 and 0011), via search.py
+    search_fields = ('feature', 'observed', 'expected', 'validation_task__request__file_name')
+    search_help_text = "Searches rule (feature), messages and file name; use the filters for type, severity and outcome code."
+
+    # large table - estimated counts (see pagination.py)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+
+        # interned messages are matched through their templates, file names through the request table (see search.py)
+        return search_outcomes(queryset, search_term, file_name=True), False
 
     @admin.display(description="File Name")
     def file_name_text(self, obj):
@@ -259,6 +294,14 @@ class ValidationOutcomeAdmin(BaseAdmin, NonAdminAddable):
     def type_text(self, obj):
         return obj.validation_task.type
 
+    @admin.display(description="Expected")
+    def expected_text(self, obj):
+        return render_message(obj.expected)
+
+    @admin.display(description="Observed")
+    def observed_text(self, obj):
+        return render_message(obj.observed)
+
 
 class ModelAdmin(BaseAdmin, NonAdminAddable):
 
@@ -291,8 +334,19 @@ class ModelAdmin(BaseAdmin, NonAdminAddable):
 class ModelInstanceAdmin(BaseAdmin, NonAdminAddable):
 
     list_display = ["id", "public_id", "stepfile_id", "model", "ifc_type", "created", "updated"]
+    list_select_related = ["model"]
+
+    # btree (stepfile_id) and trigram indexes (see migrations 0010 and 0011), via search.py
+    search_fields = ('=stepfile_id', 'ifc_type', 'model__file_name')
+    search_help_text = "Searches STEP id (exact), IFC type and file name."
+
+    # large table - estimated counts (see pagination.py)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
 
-    search_fields = ('stepfile_id', 'model__file_name', 'ifc_type')
+        return search_instances(queryset, search_term), False
 
 
 class CompanyAdmin(BaseAdmin):
@@ -316,6 +370,22 @@ class AuthoringToolAdmin(BaseAdmin):
     list_filter = ["company", "created", "updated"]
 
 
+class PurgeJobAdmin(BaseAdmin, NonAdminAddable):
+
+    list_display = ["id", "reason", "status", "progress_text", "rows_deleted", "files_deleted", "created_by", "created", "started", "ended"]
+    readonly_fields = ["id", "reason", "status", "request_ids", "total", "processed", "progress_text", "rows_deleted", "files_deleted", "error", "created_by", "created", "started", "ended"]
+    date_hierarchy = "created"
+
+    list_filter = ["status", "reason", "created"]
+
+    @admin.display(description="Progress")
+    def progress_text(self, obj):
+
+        if not obj.total:
+            return None
+        return f'{obj.processed:,} / {obj.total:,} ({obj.processed / obj.total:.0%})'
+
+
 class CustomUserAdmin(UserAdmin):
 
     list_display = ["id", "username", "email", "first_name", "last_name", "is_active", "is_staff", "is_superuser", "last_login", "date_joined"]
@@ -330,13 +400,19 @@ class CustomUserAdmin(UserAdmin):
         description="Activate selected user(s)"
     )
     def activate(self, request, queryset):
+        user_ids = list(queryset.values_list('id', flat=True))
         queryset.update(is_active=True)
+        # update() bypasses the post_save signal - cached users (see views_legacy.get_current_user)
+        transaction.on_commit(functools.partial(invalidate_user_ids, user_ids))
 
     @admin.action(
         description="Deactivate selected user(s)"
     )
     def deactivate(self, request, queryset):
+        user_ids = list(queryset.values_list('id', flat=True))
         queryset.update(is_active=False)
+        # update() bypasses the post_save signal - cached users (see views_legacy.get_current_user)
+        transaction.on_commit(functools.partial(invalidate_user_ids, user_ids))
 
 
 # register all admin classes
@@ -347,6 +423,7 @@ admin.site.register(Model, ModelAdmin)
 admin.site.register(ModelInstance, ModelInstanceAdmin)
 admin.site.register(Company, CompanyAdmin)
 admin.site.register(AuthoringTool, AuthoringToolAdmin)
+admin.site.register(PurgeJob, PurgeJobAdmin)
 
 admin.site.unregister(User)
 admin.site.register(User, CustomUserAdmin)
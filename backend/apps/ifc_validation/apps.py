@@ -5,3 +5,6 @@ class IfcValidationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.ifc_validation'
     verbose_name = 'IFC VALIDATION'  # name in Django Admin
+
+    def ready(self):
+        from . import signals  # noqa: F401 - registers signal receivers
@@ -0,0 +1,374 @@
+import os
+import gzip
+import json
+import base64
+import logging
+import datetime
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from apps.ifc_validation_models.models import ValidationRequest, ValidationTask, ValidationOutcome, ModelInstance
+
+from .models import OutcomeArchive, OutcomeAggregate
+
+logger = logging.getLogger(__name__)
+
+# IMPORTANT
+#
+# Cold archival of Validation Outcomes (opt-in, see OUTCOME_RETENTION_DAYS): outcomes (and the model instances only
+# they refer to) of requests older than the retention window are moved to one gzipped NDJSON file per request, and
+# deleted from the (hot) tables - at most OUTCOME_ARCHIVE_LIMIT requests per scheduled run.
+# Outcome summaries stay, so statuses and dashboard badges do not need the outcomes. Reports are served from their
+# snapshots; when a report has to be rebuilt, the outcomes are restored on demand (with their original ids, so
+# public ids do not change) and archived again once they have not been restored for a while. The outcome API
+# endpoints restore them in a task instead, and tell the client to retry meanwhile (see views.py).
+#
+# Archive format - one JSON document per line:
+#   {"format": 1, "request": <id>}
+#   {"model": "instance" | "outcome" | "aggregate", "fields": {<column>: <value>, ...}}
+
+ARCHIVE_FORMAT = 1
+ARCHIVE_BATCH_SIZE = 5000
+RESTORE_SCHEDULE_TIMEOUT = 5 * 60
+
+ARCHIVED_MODELS = {
+    'instance': ModelInstance,
+    'outcome': ValidationOutcome,
+    'aggregate': OutcomeAggregate,
+}
+
+
+class ArchiveEncoder(DjangoJSONEncoder):
+
+    def default(self, o):
+
+        # full precision (DjangoJSONEncoder truncates to milliseconds)
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        if isinstance(o, (bytes, memoryview)):
+            return base64.b64encode(bytes(o)).decode()
+        return super().default(o)
+
+
+def get_archive_root():
+
+    return getattr(settings, 'OUTCOME_ARCHIVE_ROOT', None) or os.path.join(settings.MEDIA_ROOT, '_archive')
+
+
+def get_retention_days():
+
+    return getattr(settings, 'OUTCOME_RETENTION_DAYS', 0)
+
+
+def get_restored_days():
+
+    return getattr(settings, 'OUTCOME_RESTORED_DAYS', 7)
+
+
+def get_archive_limit():
+
+    return getattr(settings, 'OUTCOME_ARCHIVE_LIMIT', 100)
+
+
+def get_archive_path(request):
+
+    return os.path.join(f'{request.created:%Y}', f'{request.created:%m}', f'{request.id}.ndjson.gz')
+
+
+def get_archivable_requests(now=None):
+
+    """
+    Returns (completed or failed) Validation Requests older than the retention window with outcomes in the hot tables;
+    requests which were restored are archived again when they have not been restored for OUTCOME_RESTORED_DAYS.
+    """
+
+    now = now or timezone.now()
+    retention_days = get_retention_days()
+    if not retention_days:
+        return ValidationRequest.objects.none()
+
+    has_outcomes = Exists(ValidationOutcome.objects.filter(validation_task__request=OuterRef('pk')))
+    recently_restored = Exists(OutcomeArchive.objects.filter(request=OuterRef('pk'), restored__gte=now - datetime.timedelta(days=get_restored_days())))
+
+    return ValidationRequest.objects.filter(
+        created__lt=now - datetime.timedelta(days=retention_days),
+        status__in=[ValidationRequest.Status.COMPLETED, ValidationRequest.Status.FAILED]
+    ).filter(has_outcomes).exclude(recently_restored).order_by('id')
+
+
+def get_archived_querysets(request):
+
+    outcomes = ValidationOutcome.objects.filter(validation_task__request=request)
+    # instances of the request's model which are not referred to by outcomes of other requests
+    instances = ModelInstance.objects.filter(model_id=request.model_id).exclude(
+        Exists(ValidationOutcome.objects.filter(instance=OuterRef('pk')).exclude(validation_task__request=request))
+    ) if request.model_id else ModelInstance.objects.none()
+    aggregates = OutcomeAggregate.objects.filter(outcome__validation_task__request=request)
+
+    return {'instance': instances, 'outcome': outcomes, 'aggregate': aggregates}
+
+
+def iterate_rows(model, queryset):
+
+    columns = [field.attname for field in model._meta.concrete_fields]
+    for values in queryset.order_by('pk').values_list(*columns).iterator(chunk_size=ARCHIVE_BATCH_SIZE):
+        yield dict(zip(columns, values))
+
+
+def delete_in_batches(queryset):
+
+    ids = list(queryset.values_list('pk', flat=True))
+    for i in range(0, len(ids), ARCHIVE_BATCH_SIZE):
+        queryset.model.objects.filter(pk__in=ids[i:i + ARCHIVE_BATCH_SIZE]).delete()
+    return len(ids)
+
+
+def archive_request(request):
+
+    """
+    Moves the outcomes of a Validation Request (and the model instances only they refer to) to its archive file.
+    The file is written next to its final location and moved in place before any row is deleted.
+
+    Returns:
+       Number of outcomes archived.
+    """
+
+    path = get_archive_path(request)
+    full_path = os.path.join(get_archive_root(), path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+    with transaction.atomic():
+
+        # one archiver per request (beat may run on several workers)
+        if not ValidationRequest.objects.select_for_update(skip_locked=True).filter(pk=request.pk).exists():
+            logger.info(f"Skipped archiving Validation Request id: {request.id} (locked)")
+            return 0
+        archive, _ = OutcomeArchive.objects.get_or_create(request=request, defaults={'file': path})
+        querysets = get_archived_querysets(request)
+
+        counts = dict.fromkeys(ARCHIVED_MODELS, 0)
+        outcome_ids = None
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(full_path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f, gzip.GzipFile(fileobj=f, mode='wb', compresslevel=6, mtime=0) as gz:
+                gz.write(json.dumps({'format': ARCHIVE_FORMAT, 'request': request.id}).encode() + b'\n')
+                for name, model in ARCHIVED_MODELS.items():
+                    for row in iterate_rows(model, querysets[name]):
+                        gz.write(json.dumps({'model': name, 'fields': row}, cls=ArchiveEncoder).encode() + b'\n')
+                        counts[name] += 1
+                        if name == 'outcome':
+                            # rows are read in id order
+                            outcome_ids = (outcome_ids[0] if outcome_ids else row['id'], row['id'])
+            os.replace(tmp_path, full_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        # outcomes first (aggregates cascade), then the instances they referred to
+        delete_in_batches(querysets['outcome'])
+        delete_in_batches(querysets['instance'])
+
+        archive.file = path
+        archive.outcome_count = counts['outcome']
+        archive.instance_count = counts['instance']
+        archive.first_outcome_id, archive.last_outcome_id = outcome_ids or (None, None)
+        archive.archived = timezone.now()
+        archive.restored = None
+        archive.save()
+
+    logger.info(f"Archived {counts['outcome']:,} outcomes and {counts['instance']:,} instances of Validation Request id: {request.id} to '{path}'")
+    return counts['outcome']
+
+
+def archive_outcomes(now=None, limit=None):
+
+    """
+    Archives the outcomes of all archivable Validation Requests (see get_archivable_requests).
+
+    Optional Args:
+       now: reference date/time (default: now)
+       limit: maximum number of requests to archive
+
+    Returns:
+       Number of requests archived.
+    """
+
+    requests = get_archivable_requests(now)
+    if limit:
+        requests = requests[:limit]
+
+    count = 0
+    for request in list(requests):
+        archive_request(request)
+        count += 1
+    return count
+
+
+def is_archived(request):
+
+    return OutcomeArchive.objects.filter(request=request, restored__isnull=True).exists()
+
+
+def get_archived_requests(requests, outcome_id=None):
+
+    """
+    Returns the Validation Requests of a queryset whose outcomes are archived (and not restored).
+
+    Optional Args:
+       outcome_id: only the requests whose archive may hold this outcome
+    """
+
+    archives = OutcomeArchive.objects.filter(restored__isnull=True)
+    if outcome_id is not None:
+        archives = archives.filter(first_outcome_id__lte=outcome_id, last_outcome_id__gte=outcome_id)
+    return requests.filter(id__in=archives.values('request_id'))
+
+
+def schedule_restore(request_ids):
+
+    """
+    Restores the archived outcomes of Validation Requests in a (background) task - once per request,
+    however often clients ask for them meanwhile.
+    """
+
+    from .tasks import restore_request_task
+
+    for request_id in request_ids:
+        if cache.add(f'archival:restore:{request_id}', True, RESTORE_SCHEDULE_TIMEOUT):
+            restore_request_task.delay(request_id)
+
+
+def read_archive(archive):
+
+    """
+    Yields the (model name, fields) documents of an archive file.
+    """
+
+    with gzip.open(os.path.join(get_archive_root(), archive.file), 'rt') as f:
+        header = json.loads(f.readline())
+        if header.get('format') != ARCHIVE_FORMAT:
+            raise ValueError(f"Unsupported archive format '{header.get('format')}' in '{archive.file}'")
+        for line in f:
+            document = json.loads(line)
+            yield document['model'], document['fields']
+
+
+def get_existing_ids(model, ids):
+
+    ids = list(ids)
+    existing = set()
+    for i in range(0, len(ids), ARCHIVE_BATCH_SIZE):
+        existing.update(model.objects.filter(pk__in=ids[i:i + ARCHIVE_BATCH_SIZE]).values_list('pk', flat=True))
+    return existing
+
+
+def insert_rows(model, rows):
+
+    # raw insert (as loaddata does, through the same private QuerySet._insert - deliberate, covered by tests_archival):
+    # keeps ids and audit dates (auto_now/auto_now_add) as archived, without a save() per row;
+    # shared model instances may have been restored with another request already
+    if model is ModelInstance:
+        existing = get_existing_ids(model, [row.pk for row in rows])
+        rows = [row for row in rows if row.pk not in existing]
+    if rows:
+        model.objects.all()._insert(rows, fields=model._meta.concrete_fields, raw=True)
+
+
+def to_row(model, fields):
+
+    return model(**{field.attname: field.to_python(fields[field.attname]) for field in model._meta.concrete_fields})
+
+
+def restore_shared_instances(request, archive, instance_ids):
+
+    """
+    Restores model instances from the archives of other requests of the same model: an instance shared by several
+    requests is archived with the last of them, and may be needed by another request restored before that one.
+
+    Returns:
+       Ids of the instances restored.
+    """
+
+    restored = set()
+    others = OutcomeArchive.objects.filter(request__model_id=request.model_id, restored__isnull=True).exclude(pk=archive.pk).order_by('id')
+    for other in others:
+        rows = [to_row(ModelInstance, fields) for name, fields in read_archive(other) if name == 'instance' and fields['id'] in instance_ids - restored]
+        for i in range(0, len(rows), ARCHIVE_BATCH_SIZE):
+            insert_rows(ModelInstance, rows[i:i + ARCHIVE_BATCH_SIZE])
+        restored.update(row.pk for row in rows)
+        if restored >= instance_ids:
+            break
+    return restored
+
+
+def restore_request(request):
+
+    """
+    Restores the archived outcomes of a Validation Request (with their original ids), if any.
+    Model instances archived with another request are restored from that archive; outcomes referring to instances
+    which no longer exist are restored without an instance.
+
+    Returns:
+       Number of outcomes restored (0 if the outcomes were not archived).
+    """
+
+    with transaction.atomic():
+
+        archive = OutcomeArchive.objects.select_for_update().filter(request=request, restored__isnull=True).first()
+        if archive is None:
+            return 0
+
+        # outcomes of tasks which were removed since (eg. re-processed requests) are not restored
+        task_ids = set(ValidationTask.objects.filter(request=request).values_list('id', flat=True))
+        restored_ids, instance_ids = set(), set()
+        batches = {name: [] for name in ARCHIVED_MODELS}
+        count = 0
+
+        def flush(name):
+            if batches[name]:
+                insert_rows(ARCHIVED_MODELS[name], batches[name])
+                batches[name] = []
+
+        for name, fields in read_archive(archive):
+            if name == 'outcome':
+                if fields['validation_task_id'] not in task_ids:
+                    continue
+                restored_ids.add(fields['id'])
+                if fields['instance_id'] is not None:
+                    instance_ids.add(fields['instance_id'])
+                count += 1
+            if name == 'aggregate' and fields['outcome_id'] not in restored_ids:
+                continue
+
+            batches[name].append(to_row(ARCHIVED_MODELS[name], fields))
+            if len(batches[name]) >= ARCHIVE_BATCH_SIZE:
+                # instances and outcomes are archived before the rows referring to them
+                for previous in ARCHIVED_MODELS:
+                    flush(previous)
+                    if previous == name:
+                        break
+
+        for name in ARCHIVED_MODELS:
+            flush(name)
+
+        # instances shared with other requests (see archive_request) - foreign keys are checked at commit
+        missing = instance_ids - get_existing_ids(ModelInstance, instance_ids)
+        if missing and request.model_id:
+            missing -= restore_shared_instances(request, archive, missing)
+        if missing:
+            missing = list(missing)
+            for i in range(0, len(missing), ARCHIVE_BATCH_SIZE):
+                ValidationOutcome.objects.filter(validation_task__request=request, instance_id__in=missing[i:i + ARCHIVE_BATCH_SIZE]).update(instance_id=None)
+            logger.warning(f"Restored outcomes of Validation Request id: {request.id} without {len(missing):,} instance(s) that no longer exist")
+
+        archive.restored = timezone.now()
+        archive.save(update_fields=['restored'])
+
+    logger.info(f"Restored {count:,} outcomes of Validation Request id: {request.id} from '{archive.file}'")
+    return count
@@ -0,0 +1,91 @@
+import os
+import inspect
+import logging
+
+from django.conf import settings
+
+from .checks import check_bsdd
+from .checks.bsdd_snapshot import SnapshotWriter, get_info
+
+logger = logging.getLogger(__name__)
+
+# IMPORTANT
+#
+# Builds the local bSDD snapshot used by check_bsdd.py (see checks/bsdd_snapshot.py): all dictionaries, plus the
+# classes and properties of the dictionaries in BSDD_SNAPSHOT_DICTIONARIES - in full, same as the API returns them
+# one by one (eg. related IFC entities of classes, data types of properties), fetched concurrently.
+
+PAGE_SIZE = 1000
+
+
+def get_snapshot_path():
+
+    return getattr(settings, 'BSDD_SNAPSHOT_PATH', os.path.join(settings.MEDIA_ROOT, '_bsdd', 'snapshot.sqlite3'))
+
+
+def get_snapshot_dictionaries():
+
+    return getattr(settings, 'BSDD_SNAPSHOT_DICTIONARIES', [])
+
+
+def iterate_pages(path, params, items_key, total_key):
+
+    offset = 0
+    while True:
+        response = check_bsdd.bsdd_get(path, {**params, 'offset': offset, 'limit': PAGE_SIZE})
+        response.raise_for_status()
+        json = response.json()
+        items = json.get(items_key) or []
+        yield from items
+        offset += len(items)
+        if not items or offset >= (json.get(total_key) or 0):
+            break
+
+
+def get_details(lookup, items):
+
+    # the uncached lookup - a snapshot has the latest bSDD content
+    fetch = inspect.unwrap(lookup)
+    results = check_bsdd.resolve_all((fetch, item['uri']) for item in items)
+    return [results[(fetch, item['uri'])] for item in items if results.get((fetch, item['uri']))]
+
+
+def build_snapshot(path=None, dictionary_uris=None):
+
+    """
+    Downloads bSDD dictionaries, classes and properties into a new snapshot, replacing the existing one when complete.
+
+    Optional Args:
+       path: snapshot file, BSDD_SNAPSHOT_PATH by default
+       dictionary_uris: dictionaries to include classes and properties of, BSDD_SNAPSHOT_DICTIONARIES by default
+
+    Returns:
+       Number of entries per kind (dictionaries, classes, properties).
+    """
+
+    path = path or get_snapshot_path()
+    dictionary_uris = get_snapshot_dictionaries() if dictionary_uris is None else dictionary_uris
+
+    with SnapshotWriter(path) as writer:
+
+        for dictionary in iterate_pages('/api/Dictionary/v1', {'includeTestDictionaries': True}, 'dictionaries', 'totalCount'):
+            writer.add('dictionaries', dictionary)
+
+        for uri in dictionary_uris:
+
+            classes = list(iterate_pages('/api/Dictionary/v1/Classes', {'uri': uri}, 'classes', 'classesTotalCount'))
+            for class_ in get_details(check_bsdd.find_class_by_uri, classes):
+                writer.add('classes', class_)
+
+            properties = list(iterate_pages('/api/Dictionary/v1/Properties', {'uri': uri}, 'properties', 'propertiesTotalCount'))
+            for property in get_details(check_bsdd.find_property_by_uri, properties):
+                writer.add('properties', property)
+
+            logger.info(f"bSDD snapshot: {len(classes):,} classes and {len(properties):,} properties of dictionary '{uri}'")
+
+    return writer.counts
+
+
+def get_snapshot_info(path=None):
+
+    return get_info(path or get_snapshot_path())
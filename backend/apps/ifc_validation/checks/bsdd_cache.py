@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import atexit
+import sqlite3
+import logging
+import tempfile
+import threading
+import functools
+
+logger = logging.getLogger()
+
+# IMPORTANT
+#
+# Shared cache for bSDD API lookups (see check_bsdd.py), across check processes and worker nodes:
+#   - Redis if BSDD_CACHE_URL (or else REDIS_CACHE_URL) is a redis:// URL - shared across nodes
+#   - otherwise a SQLite file (BSDD_CACHE_URL, or bsdd_cache.sqlite3 in the temp folder) - shared across processes
+# Entries are fresh for BSDD_CACHE_TTL seconds, 'not found' results (negative caching) for BSDD_CACHE_NEGATIVE_TTL.
+# Expired entries are still served for BSDD_CACHE_STALE_TTL seconds while a single process refreshes them in the
+# background (stale-while-revalidate) - and kept as they are if that refresh fails.
+# The checks run as a subprocess and any output on stderr fails the task: cache errors are logged as debug only
+# and treated as misses.
+
+DEFAULT_TTL = 24 * 3600
+DEFAULT_NEGATIVE_TTL = 3600
+DEFAULT_STALE_TTL = 7 * 24 * 3600
+REVALIDATE_LOCK_TTL = 60
+REVALIDATE_EXIT_TIMEOUT = 10
+
+KEY_PREFIX = 'bsdd:'
+
+
+def get_ttl(name, default):
+
+    return int(os.environ.get(name, default))
+
+
+class SQLiteBackend:
+
+    def __init__(self, path):
+
+        self.path = path
+        with self.connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)")
+
+    def connect(self):
+
+        # a connection per call - revalidation runs in other threads
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, key):
+
+        with self.connect() as conn:
+            row = conn.execute("SELECT value FROM entries WHERE key = ? AND expires > ?", (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl):
+
+        with self.connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO entries (key, value, expires) VALUES (?, ?, ?)", (key, value, time.time() + ttl))
+
+    def add(self, key, value, ttl):
+
+        now = time.time()
+        with self.connect() as conn:
+            conn.execute("DELETE FROM entries WHERE key = ? AND expires <= ?", (key, now))
+            return conn.execute("INSERT OR IGNORE INTO entries (key, value, expires) VALUES (?, ?, ?)", (key, value, now + ttl)).rowcount == 1
+
+    def delete(self, key):
+
+        with self.connect() as conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+
+class RedisBackend:
+
+    def __init__(self, url):
+
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+
+        value = self.client.get(key)
+        return value.decode() if value is not None else None
+
+    def set(self, key, value, ttl):
+
+        self.client.set(key, value, ex=ttl)
+
+    def add(self, key, value, ttl):
+
+        return bool(self.client.set(key, value, ex=ttl, nx=True))
+
+    def delete(self, key):
+
+        self.client.delete(key)
+
+
+@functools.lru_cache(maxsize=1)
+def get_backend():
+
+    url = os.environ.get('BSDD_CACHE_URL') or os.environ.get('REDIS_CACHE_URL') or ''
+    if url.startswith(('redis://', 'rediss://')):
+        return RedisBackend(url)
+    return SQLiteBackend(url or os.path.join(tempfile.gettempdir(), 'bsdd_cache.sqlite3'))
+
+
+def get_key(name, args):
+
+    return KEY_PREFIX + name + ':' + json.dumps(args)
+
+
+def read(key):
+
+    try:
+        value = get_backend().get(key)
+        return json.loads(value) if value is not None else None
+    except Exception as err:
+        logger.debug(f'bSDD cache read failed for {key}: {err}')
+        return None
+
+
+def write(key, value):
+
+    """
+    Stores a value, fresh for BSDD_CACHE_TTL seconds (or BSDD_CACHE_NEGATIVE_TTL for None) and stale for another
+    BSDD_CACHE_STALE_TTL seconds.
+    """
+
+    ttl = get_ttl('BSDD_CACHE_NEGATIVE_TTL', DEFAULT_NEGATIVE_TTL) if value is None else get_ttl('BSDD_CACHE_TTL', DEFAULT_TTL)
+    try:
+        entry = {'value': value, 'fresh_until': time.time() + ttl}
+        get_backend().set(key, json.dumps(entry), ttl + get_ttl('BSDD_CACHE_STALE_TTL', DEFAULT_STALE_TTL))
+    except Exception as err:
+        logger.debug(f'bSDD cache write failed for {key}: {err}')
+
+
+_revalidations = []
+
+
+@atexit.register
+def wait_for_revalidations():
+
+    # checks exit as soon as they're done - give pending refreshes a chance to complete
+    deadline = time.monotonic() + REVALIDATE_EXIT_TIMEOUT
+    for thread in _revalidations:
+        thread.join(max(0, deadline - time.monotonic()))
+
+
+def revalidate(key, fetch, args):
+
+    try:
+        if not get_backend().add(key + ':lock', '1', REVALIDATE_LOCK_TTL):
+            return  # another process is on it
+    except Exception as err:
+        logger.debug(f'bSDD cache lock failed for {key}: {err}')
+        return
+
+    def refresh():
+        try:
+            write(key, fetch(*args))
+            logger.debug(f'bSDD cache refreshed {key}')
+        except Exception as err:
+            logger.debug(f'bSDD cache refresh failed for {key}: {err}')
+        finally:
+            try:
+                get_backend().delete(key + ':lock')
+            except Exception:
+                pass
+
+    thread = threading.Thread(target=refresh, daemon=True)
+    _revalidations.append(thread)
+    thread.start()
+
+
+def cached(name):
+
+    """
+    Caches the results of a bSDD lookup in the shared cache (None is cached as 'not found').
+
+    Mandatory Args:
+        name: name of the lookup, part of the cache key (together with the - JSON serializable - arguments)
+    """
+
+    def decorator(fetch):
+
+        @functools.wraps(fetch)
+        def wrapper(*args):
+
+            key = get_key(name, args)
+            entry = read(key)
+
+            if entry is not None and entry['fresh_until'] > time.time():
+                return entry['value']
+
+            if entry is not None:
+                # stale: serve it, refresh in the background
+                revalidate(key, fetch, args)
+                return entry['value']
+
+            value = fetch(*args)
+            write(key, value)
+            return value
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+import functools
+
+logger = logging.getLogger()
+
+# IMPORTANT
+#
+# Local (offline) snapshot of bSDD dictionaries, classes and properties, for check_bsdd.py: a SQLite file with one
+# entry per uri (same JSON as the bSDD API returns for it), indexed on kind + uri and kind + name.
+# Snapshots are built by the build_bsdd_snapshot management command (and refreshed on a schedule, see
+# CELERY_BEAT_SCHEDULE) into a temporary file that replaces the previous snapshot at once.
+# With BSDD_MODE=snapshot, lookups are resolved from the snapshot at BSDD_SNAPSHOT_PATH first and fall back to the
+# API (and its cache, see bsdd_cache.py) on a miss - or when there is no snapshot (yet).
+
+SNAPSHOT_FORMAT = 1
+
+KINDS = ('dictionaries', 'classes', 'properties')
+
+SCHEMA = [
+    "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+    "CREATE TABLE entries (kind TEXT NOT NULL, uri TEXT NOT NULL, name TEXT, data TEXT NOT NULL, PRIMARY KEY (kind, uri))",
+    "CREATE INDEX entries_name ON entries (kind, name)",
+]
+
+
+def is_enabled():
+
+    return os.environ.get('BSDD_MODE', 'api') == 'snapshot'
+
+
+def get_path():
+
+    return os.environ.get('BSDD_SNAPSHOT_PATH', '')
+
+
+_local = threading.local()
+
+
+def connect():
+
+    """
+    Returns a read-only connection to the snapshot (one per thread, lookups run concurrently), or None if there is none.
+    """
+
+    path = get_path()
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.path == path:
+        return conn
+
+    conn = None
+    if path and os.path.exists(path):
+        try:
+            conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+            conn.execute("SELECT value FROM meta WHERE key = 'format'").fetchone()
+        except sqlite3.Error as err:
+            logger.debug(f'bSDD snapshot {path} is unavailable: {err}')
+            conn = None
+    _local.conn, _local.path = conn, path
+    return conn
+
+
+def find(kind, uri):
+
+    """
+    Returns the entry (JSON object) of a dictionary, class or property by uri, or None if it is not in the snapshot.
+    """
+
+    conn = connect()
+    if conn is None:
+        return None
+    row = conn.execute("SELECT data FROM entries WHERE kind = ? AND uri = ?", (kind, uri)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def find_by_name(kind, name):
+
+    conn = connect()
+    if conn is None:
+        return []
+    return [json.loads(data) for data, in conn.execute("SELECT data FROM entries WHERE kind = ? AND name = ?", (kind, name))]
+
+
+def find_all(kind):
+
+    """
+    Returns all entries of a kind, or None if there is no snapshot.
+    """
+
+    conn = connect()
+    if conn is None:
+        return None
+    return [json.loads(data) for data, in conn.execute("SELECT data FROM entries WHERE kind = ? ORDER BY uri", (kind,))]
+
+
+def local(kind):
+
+    """
+    Resolves a bSDD lookup from the snapshot first (BSDD_MODE=snapshot), calling through on a miss.
+    Lookups without arguments return all entries of the kind.
+    """
+
+    def decorator(lookup):
+
+        @functools.wraps(lookup)
+        def wrapper(*args):
+
+            if is_enabled():
+                value = find(kind, *args) if args else find_all(kind)
+                if value:
+                    return value
+            return lookup(*args)
+
+        return wrapper
+
+    return decorator
+
+
+class SnapshotWriter:
+
+    """
+    Writes a new snapshot to a temporary file, which replaces the snapshot at 'path' when closed without errors.
+    """
+
+    BATCH_SIZE = 1000
+
+    def __init__(self, path):
+
+        self.path = path
+        self.tmp_path = f'{path}.{os.getpid()}.tmp'
+        self.counts = dict.fromkeys(KINDS, 0)
+        self.batch = []
+
+    def __enter__(self):
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+        self.conn = sqlite3.connect(self.tmp_path)
+        for statement in SCHEMA:
+            self.conn.execute(statement)
+        return self
+
+    def add(self, kind, entry):
+
+        self.batch.append((kind, entry['uri'], entry.get('name'), json.dumps(entry)))
+        self.counts[kind] += 1
+        if len(self.batch) >= self.BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+
+        # same uri listed twice (eg. in several pages): last one wins
+        self.conn.executemany("INSERT OR REPLACE INTO entries (kind, uri, name, data) VALUES (?, ?, ?, ?)", self.batch)
+        self.batch = []
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        try:
+            if exc_type is None:
+                self.flush()
+                meta = {'format': SNAPSHOT_FORMAT, 'created': time.time(), **{f'count:{kind}': count for kind, count in self.counts.items()}}
+                self.conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [(key, json.dumps(value)) for key, value in meta.items()])
+                self.conn.commit()
+                self.conn.execute("VACUUM")
+            self.conn.close()
+            if exc_type is None:
+                os.replace(self.tmp_path, self.path)
+        finally:
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+
+
+def get_info(path):
+
+    """
+    Returns the metadata of a snapshot (format, created and counts per kind), or None if there is none.
+    """
+
+    if not os.path.exists(path):
+        return None
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        return {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM meta")}
+    finally:
+        conn.close()
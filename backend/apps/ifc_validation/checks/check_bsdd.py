@@ -1,16 +1,83 @@
 import ifcopenshell
 import logging
+import os
 import sys
 import requests
 import json
 import argparse
 import functools
+import concurrent.futures
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+try:
+    import bsdd_cache  # run-time
+    import bsdd_snapshot
+except:
+    import apps.ifc_validation.checks.bsdd_cache as bsdd_cache  # tests
+    import apps.ifc_validation.checks.bsdd_snapshot as bsdd_snapshot
 
 logger = logging.getLogger()
 
+BSDD_API_URL = os.environ.get('BSDD_API_URL', 'https://api.bsdd.buildingsmart.org').rstrip('/')
+BSDD_MAX_CONCURRENCY = int(os.environ.get('BSDD_MAX_CONCURRENCY', 16))
+BSDD_RETRIES = int(os.environ.get('BSDD_RETRIES', 3))
+BSDD_TIMEOUT = int(os.environ.get('BSDD_TIMEOUT', 30))
 
-@functools.lru_cache(maxsize=128)
+
+@functools.lru_cache(maxsize=1)
+def get_session():
+
+    """
+    Returns the HTTP session shared by all bSDD lookups: a keep-alive connection pool of BSDD_MAX_CONCURRENCY connections,
+    retrying (with backoff) on connection errors, throttling (429) and server errors.
+    """
+
+    retry = Retry(
+        total=BSDD_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=('GET',),
+        raise_on_status=False,
+        respect_retry_after_header=True
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=BSDD_MAX_CONCURRENCY, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def bsdd_get(path, params=None):
+
+    return get_session().get(BSDD_API_URL + path, params=params, timeout=BSDD_TIMEOUT)
+
+
+def resolve_all(lookups):
+
+    """
+    Resolves bSDD lookups concurrently (at most BSDD_MAX_CONCURRENCY at a time), warming their caches.
+
+    Mandatory Args:
+        lookups: (lookup function, uri) pairs - duplicates and empty uris are skipped.
+
+    Returns:
+        Dictionary of results, by (lookup function, uri).
+    """
+
+    lookups = list(dict.fromkeys((lookup, uri) for lookup, uri in lookups if uri))
+    if not lookups:
+        return {}
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(BSDD_MAX_CONCURRENCY, len(lookups))) as executor:
+        futures = {(lookup, uri): executor.submit(lookup, uri) for lookup, uri in lookups}
+        return {key: future.result() for key, future in futures.items()}
+
+
+@functools.lru_cache(maxsize=None)
+@bsdd_snapshot.local('dictionaries')
+@bsdd_cache.cached('dictionary')
 def find_dictionary_by_uri(uri):
 
     """
@@ -29,9 +96,7 @@ def find_dictionary_by_uri(uri):
         https://app.swaggerhub.com/apis/buildingSMART/Dictionaries/v1
     """
 
-    url = "https://api.bsdd.buildingsmart.org/api/Dictionary/v1"
-
-    response = requests.get(url, {'uri': uri })
+    response = bsdd_get('/api/Dictionary/v1', {'uri': uri })
     logger.debug(f'GET {response.url} returned HTTP {response.status_code}')
 
     if response.status_code == 200:
@@ -44,7 +109,9 @@ def find_dictionary_by_uri(uri):
         return None
     
 
-@functools.lru_cache(maxsize=128)
+@functools.lru_cache(maxsize=None)
+@bsdd_snapshot.local('dictionaries')
+@bsdd_cache.cached('dictionaries')
 def get_all_dictionaries():
     
     """
@@ -60,14 +127,13 @@ def get_all_dictionaries():
         https://app.swaggerhub.com/apis/buildingSMART/Dictionaries/v1
     """
 
-    url = "https://api.bsdd.buildingsmart.org/api/Dictionary/v1?includeTestDictionaries=True"
     
     dictionaries = []
     count = 0
     total_count = 1000
     
     while count < total_count:
-        response = requests.get(url + f'&offset={count}&limit=250')
+        response = bsdd_get('/api/Dictionary/v1', {'includeTestDictionaries': True, 'offset': count, 'limit': 250})
         logger.debug(f'GET {response.url} returned HTTP {response.status_code}')
         response.raise_for_status()
 
@@ -101,12 +167,14 @@ def find_dictionary_by_name(name, edition = None):
         https://app.swaggerhub.com/apis/buildingSMART/Dictionaries/v1
     """
 
-    all_dictionaries = get_all_dictionaries()
+    all_dictionaries = (bsdd_snapshot.is_enabled() and bsdd_snapshot.find_by_name('dictionaries', name)) or get_all_dictionaries()
     dict_filter = lambda x: x['name'] == name and (edition is None or x['version'] == edition)
     return next((d for d in all_dictionaries if dict_filter(d)), None)
 
 
-@functools.lru_cache(maxsize=128)
+@functools.lru_cache(maxsize=None)
+@bsdd_snapshot.local('classes')
+@bsdd_cache.cached('class')
 def find_class_by_uri(uri):
 
     """
@@ -125,9 +193,7 @@ def find_class_by_uri(uri):
         https://app.swaggerhub.com/apis/buildingSMART/Dictionaries/v1#/Class/get_api_Class_v1
     """
 
-    url = "https://api.bsdd.buildingsmart.org/api/Class/v1"
-
-    response = requests.get(url, {'uri':uri})
+    response = bsdd_get('/api/Class/v1', {'uri': uri})
     logger.debug(f'GET {response.url} returned HTTP {response.status_code}')
 
     if response.status_code == 200:
@@ -139,7 +205,9 @@ def find_class_by_uri(uri):
         return None
 
 
-@functools.lru_cache(maxsize=128)
+@functools.lru_cache(maxsize=None)
+@bsdd_snapshot.local('properties')
+@bsdd_cache.cached('property')
 def find_property_by_uri(uri):
 
     """
@@ -158,9 +226,7 @@ def find_property_by_uri(uri):
         https://app.swaggerhub.com/apis/buildingSMART/Dictionaries/v1#/Property/get_api_Property_v4
     """
 
-    url = "https://api.bsdd.buildingsmart.org/api/Property/v4"
-
-    response = requests.get(url, {'uri': uri})
+    response = bsdd_get('/api/Property/v4', {'uri': uri})
     logger.debug(f'GET {response.url} returned HTTP {response.status_code}')
 
     if response.status_code == 200:
@@ -229,6 +295,13 @@ def perform(file_name, task_id, verbose=False):
     ifc_file_materials = ifc_file.by_type("IfcMaterial")
     #ifc_file_rel_associates_material = ifc_file.by_type("IfcRelAssociatesMaterial")
 
+    # resolve all distinct dictionary, class and property uris at once (concurrently) - the checks below hit the cache
+    resolve_all(
+        [(find_dictionary_by_uri, first_available_attr(ic, ['Specification', 'Location', 'Source'])) for ic in ifc_file_classifications]
+        + [(find_class_by_uri, icr.Location) for icr in ifc_file_classification_references]
+        + [(find_property_by_uri, first_available_attr(prop, ['Specification', 'Description'])) for prop in ifc_file_properties]
+    )
+
     # bSDD dictionary (former name: domain)
     # https://github.com/buildingSMART/bSDD/blob/master/Documentation/bSDD-IFC%20documentation.md#1-bsdd-dictionary
     if len(ifc_file_classifications):
@@ -0,0 +1,81 @@
+import hashlib
+import collections
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+# IMPORTANT
+#
+# Conditional GET for endpoints that are polled (status, dashboard, reports).
+# Validators are derived from the `updated` timestamps of the Validation Request(s), their Model and
+# (optionally) their Validation Tasks, using a single aggregate query that runs *before* the heavy
+# queries/serialization - unchanged resources are answered with 304 Not Modified.
+# Note: bulk updates (queryset.update()) bypass auto_now and must set `updated` explicitly.
+
+
+Validators = collections.namedtuple('Validators', ['etag', 'last_modified'])
+
+
+def get_validators(queryset, *parts, with_tasks=False):
+
+    """
+    Computes the ETag and Last-Modified validators of one or more Validation Requests.
+
+    Mandatory Args:
+       queryset: Validation Requests the response is built from (eg. all requests of a user)
+       parts: anything else the response depends on (eg. report type, page)
+
+    Optional Args:
+       with_tasks: also take the Validation Tasks (and hence their outcomes) into account
+
+    Returns:
+       Validators instance, or None if the queryset is empty.
+    """
+
+    aggregates = {
+        'count': Count('id', distinct=with_tasks),
+        'created': Max('created'),
+        'updated': Max('updated'),
+        'model_updated': Max('model__updated'),
+    }
+    if with_tasks:
+        aggregates['task_updated'] = Max('tasks__updated')
+
+    values = queryset.order_by().aggregate(**aggregates)
+    if not values['count']:
+        return None
+
+    timestamps = [value for key, value in values.items() if key != 'count' and value is not None]
+    version = '|'.join([str(values['count'])] + [value.isoformat() for value in timestamps] + [str(part) for part in parts])
+
+    return Validators(
+        etag=quote_etag(hashlib.md5(version.encode('utf-8')).hexdigest()),
+        last_modified=int(max(timestamps).timestamp())
+    )
+
+
+def get_not_modified_response(request, validators):
+
+    """
+    Returns a 304 Not Modified response if the client's copy is still valid, None otherwise.
+    """
+
+    if validators is None:
+        return None
+
+    response = get_conditional_response(request, etag=validators.etag, last_modified=validators.last_modified)
+    return None if response is None else set_validators(response, validators)
+
+
+def set_validators(response, validators):
+
+    """
+    Sets the ETag/Last-Modified headers on a response (if any); clients have to revalidate before reusing it.
+    """
+
+    if validators is not None:
+        response['ETag'] = validators.etag
+        response['Last-Modified'] = http_date(validators.last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,115 @@
+import django_filters as filters
+
+from apps.ifc_validation_models.models import ValidationRequest, ValidationTask, ValidationOutcome, AuthoringTool
+
+from .search import search_outcomes
+
+# IMPORTANT
+#
+# Filters of the (paginated) list endpoints - every filter maps onto an indexed column (see migration 0003).
+# Ids are public ids (eg. 'r123...'), as returned by the API; multiple values are comma-separated.
+# The text filters of the search endpoint use trigram indexes instead (see migration 0010 and search.py).
+
+
+class CharInFilter(filters.BaseInFilter, filters.CharFilter):
+    pass
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
+
+
+class PublicIdFilter(filters.CharFilter):
+
+    """
+    Filters on the private id of a related object, given its public id.
+    """
+
+    def __init__(self, *args, model=None, **kwargs):
+
+        self.model = model
+        super().__init__(*args, **kwargs)
+
+    def filter(self, qs, value):
+
+        if value in ([], (), {}, "", None):
+            return qs
+        try:
+            private_id = self.model.to_private_id(value)
+        except (ValueError, TypeError):
+            return qs.none()
+        return super().filter(qs, private_id)
+
+
+class SeverityFilter(CharInFilter):
+
+    """
+    Filters on one or more outcome severities, either by value (eg. '4') or by name (eg. 'ERROR').
+    """
+
+    def filter(self, qs, value):
+
+        if not value:
+            return qs
+        severities = []
+        for severity in value:
+            if severity.isdigit():
+                severities.append(int(severity))
+            elif severity.upper() in ValidationOutcome.OutcomeSeverity.names:
+                severities.append(ValidationOutcome.OutcomeSeverity[severity.upper()].value)
+            else:
+                return qs.none()
+        return qs.filter(**{f'{self.field_name}__in': severities})
+
+
+class ValidationRequestFilter(filters.FilterSet):
+
+    status = CharInFilter(field_name='status')
+    created = filters.IsoDateTimeFromToRangeFilter(field_name='created')  # created_after / created_before
+
+    class Meta:
+        model = ValidationRequest
+        fields = ['status', 'created']
+
+
+class ValidationTaskFilter(filters.FilterSet):
+
+    request = PublicIdFilter(field_name='request_id', model=ValidationRequest)
+    type = CharInFilter(field_name='type')
+    status = CharInFilter(field_name='status')
+    created = filters.IsoDateTimeFromToRangeFilter(field_name='created')
+
+    class Meta:
+        model = ValidationTask
+        fields = ['request', 'type', 'status', 'created']
+
+
+class ValidationOutcomeFilter(filters.FilterSet):
+
+    request = PublicIdFilter(field_name='validation_task__request_id', model=ValidationRequest)
+    validation_task = PublicIdFilter(field_name='validation_task_id', model=ValidationTask)
+    task_type = CharInFilter(field_name='validation_task__type')
+    severity = SeverityFilter(field_name='severity')
+    outcome_code = CharInFilter(field_name='outcome_code')
+    created = filters.IsoDateTimeFromToRangeFilter(field_name='created')
+
+    class Meta:
+        model = ValidationOutcome
+        fields = ['request', 'validation_task', 'task_type', 'severity', 'outcome_code', 'created']
+
+
+class ValidationOutcomeSearchFilter(ValidationOutcomeFilter):
+
+    q = filters.CharFilter(method='filter_search')
+    feature = filters.CharFilter(field_name='feature', lookup_expr='icontains')
+    feature_version = NumberInFilter(field_name='feature_version')
+    authoring_tool = PublicIdFilter(field_name='validation_task__request__model__produced_by_id', model=AuthoringTool)
+    authoring_tool_name = filters.CharFilter(field_name='validation_task__request__model__produced_by__name', lookup_expr='icontains')
+
+    class Meta:
+        model = ValidationOutcome
+        fields = ValidationOutcomeFilter.Meta.fields + ['q', 'feature', 'feature_version', 'authoring_tool', 'authoring_tool_name']
+
+    def filter_search(self, queryset, name, value):
+
+        return search_outcomes(queryset, value)
@@ -0,0 +1,345 @@
+import os
+import re
+import uuid
+import hashlib
+import logging
+import functools
+
+from django.db import transaction
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers
+
+from apps.ifc_validation_models.models import ValidationRequest
+
+from .models import IngestedFile
+
+logger = logging.getLogger(__name__)
+
+STEP_MAGIC = 'ISO-10303-21;'
+HEADER_SNIFF_LIMIT = 64 * 1024  # header section is expected within the first 64 KB
+
+# string literals and comments are matched as a whole - a ');' or '/*' inside a string does not end an entity
+_HEADER_TOKEN_PATTERN = re.compile(r"'((?:[^']|'')*)'|/\*.*?\*/|([A-Za-z_][A-Za-z0-9_]*)|(;)", re.DOTALL)
+
+
+def _header_entities(section):
+
+    """
+    Returns the STEP string literals found in the parameters of each header entity (eg. FILE_SCHEMA), by keyword.
+    """
+
+    entities = {}
+    keyword, strings = None, []
+    for match in _HEADER_TOKEN_PATTERN.finditer(section):
+        string, name, end = match.groups()
+        if end:
+            if keyword:
+                entities.setdefault(keyword, strings)
+            keyword, strings = None, []
+        elif name:
+            keyword = keyword or name.upper()
+        elif string is not None and keyword:
+            strings.append(string.replace("''", "'"))
+    return entities
+
+
+def parse_step_header(data):
+
+    """
+    Parses the HEADER section of a STEP Physical File (ISO 10303-21) without loading the full file.
+
+    Mandatory Args:
+       data: first bytes of the file, ideally up to and including the first ENDSEC;
+
+    Returns:
+       Dictionary with 'is_step', 'schema', 'time_stamp', 'mvd' and 'complete' keys.
+    """
+
+    text = data.decode('latin-1') if isinstance(data, (bytes, bytearray)) else data
+    text = text.lstrip('\xef\xbb\xbf \t\r\n')  # UTF-8 BOM, whitespace
+
+    header = {
+        'is_step': text.startswith(STEP_MAGIC),
+        'schema': None,
+        'time_stamp': None,
+        'mvd': None,
+        'complete': False
+    }
+    if not header['is_step']:
+        return header
+
+    end = text.find('ENDSEC;')
+    header['complete'] = end != -1
+    entities = _header_entities(text[:end] if end != -1 else text)
+
+    # FILE_SCHEMA(('IFC4'));
+    schemas = entities.get('FILE_SCHEMA', [])
+    header['schema'] = schemas[0].upper() if schemas and schemas[0] else None
+
+    # FILE_NAME('name','2022-05-04T08:08:30',(...),(...),'preprocessor','originating system','authorization');
+    names = entities.get('FILE_NAME', [])
+    header['time_stamp'] = names[1] if len(names) > 1 and names[1] else None
+
+    # FILE_DESCRIPTION(('ViewDefinition [CoordinationView]'),'2;1');
+    descriptions = entities.get('FILE_DESCRIPTION', [])
+    if descriptions:
+        mvd = re.search(r"\[(.*?)\]", descriptions[0])
+        header['mvd'] = mvd.group(1) if mvd else None
+
+    return header
+
+
+class StepHeaderSniffer:
+
+    """
+    Buffers the first bytes of a stream until the STEP HEADER section is complete (or a size limit is reached).
+    """
+
+    def __init__(self, limit=HEADER_SNIFF_LIMIT):
+
+        self.limit = limit
+        self.buffer = bytearray()
+        self.done = False
+
+    def feed(self, chunk):
+
+        if self.done:
+            return
+        self.buffer += chunk[:self.limit - len(self.buffer)]
+        self.done = len(self.buffer) >= self.limit or b'ENDSEC;' in self.buffer
+
+    def result(self):
+
+        return parse_step_header(bytes(self.buffer))
+
+
+class IngestedUploadedFile(UploadedFile):
+
+    """
+    An uploaded file that was streamed to a temporary file next to its final storage location.
+    Carries the metrics (hash, size, line count and STEP header) collected while it was written.
+    The temporary file is moved into place once the Validation Request is committed (see store_ingestion_results),
+    and removed when the request is done with it otherwise - closing an unclaimed file deletes it.
+    """
+
+    def __init__(self, file, name, stored_name, content_type, size, charset, sha256, line_count, header, content_type_extra=None):
+
+        super().__init__(file, name, content_type, size, charset, content_type_extra)
+        self.stored_name = stored_name
+        self.sha256 = sha256
+        self.line_count = line_count
+        self.header = header
+        self.claimed = False
+
+    def temporary_path(self):
+
+        return self.file.name
+
+    def close(self):
+
+        try:
+            return self.file.close()
+        finally:
+            if not self.claimed:
+                remove_file(self.temporary_path())
+
+
+def remove_file(path):
+
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def is_authenticated_upload(request):
+
+    # same as the views: OAuth session (BFF), Django session or DRF basic/token authentication (verified by the view)
+    if request is None:
+        return False
+    if hasattr(request, 'session') and request.session.get('user'):
+        return True
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return True
+    return 'HTTP_AUTHORIZATION' in request.META
+
+
+class IngestionUploadHandler(FileUploadHandler):
+
+    """
+    Upload handler that writes uploaded IFC files to a temporary file in the storage folder of ValidationRequest.file,
+    computing SHA-256, byte/line counts and parsing the STEP header in the same pass.
+    Anonymous uploads, and files that can't be written to a local path, are left to the next (default) upload handler.
+    """
+
+    def new_file(self, *args, **kwargs):
+
+        super().new_file(*args, **kwargs)
+
+        self.activated = False
+        if not self.field_name.startswith('file') or not is_authenticated_upload(self.request):
+            return
+
+        field = ValidationRequest._meta.get_field('file')
+        try:
+            self.stored_name = field.generate_filename(None, self.file_name)
+            self.destination = self._open_temporary_file(field.storage.path(self.stored_name))
+        except (NotImplementedError, OSError) as err:
+            logger.warning(f"Unable to stream upload '{self.file_name}' to storage, falling back to default handlers ({err})")
+            return
+
+        self.activated = True
+        self.sha256 = hashlib.sha256()
+        self.line_count = 0
+        self.sniffer = StepHeaderSniffer()
+        raise StopFutureHandlers()
+
+    def _open_temporary_file(self, path):
+
+        # hidden file in the same folder, so it can be moved into place atomically
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+        return open(os.path.join(folder, f'.{uuid.uuid4().hex}.upload'), 'xb')
+
+    def receive_data_chunk(self, raw_data, start):
+
+        if not self.activated:
+            return raw_data
+
+        self.destination.write(raw_data)
+        self.sha256.update(raw_data)
+        self.line_count += raw_data.count(b'\n')
+        self.sniffer.feed(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+
+        if not self.activated:
+            return None
+
+        self.destination.close()
+        header = self.sniffer.result()
+        logger.info(f"Ingested upload '{self.file_name}' for '{self.stored_name}' - size: {file_size:,} bytes, lines: {self.line_count:,}, schema: {header['schema']}")
+
+        return IngestedUploadedFile(
+            file=open(self.destination.name, 'rb'),
+            name=self.file_name,
+            stored_name=self.stored_name,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            sha256=self.sha256.hexdigest(),
+            line_count=self.line_count,
+            header=header,
+            content_type_extra=self.content_type_extra
+        )
+
+    def upload_interrupted(self):
+
+        if getattr(self, 'activated', False):
+            self.destination.close()
+            remove_file(self.destination.name)
+
+
+def move_exclusive(source, destination):
+
+    """
+    Moves a file without ever replacing an existing one (raises FileExistsError instead).
+    """
+
+    try:
+        os.link(source, destination)
+    except FileExistsError:
+        raise
+    except OSError:
+        # no hard links on this file system - not atomic, but only a concurrent upload of the same name can race
+        if os.path.exists(destination):
+            raise FileExistsError(destination)
+        os.rename(source, destination)
+        return
+    os.remove(source)
+
+
+def claim_uploaded_file(request_id, uploaded_file, max_attempts=10):
+
+    """
+    Moves an ingested upload into its storage location - under another available name if that one was taken
+    in the meantime (the Validation Request is updated accordingly).
+    """
+
+    field = ValidationRequest._meta.get_field('file')
+    name = uploaded_file.stored_name
+    for _ in range(max_attempts):
+        name = field.storage.get_available_name(name, max_length=field.max_length)
+        try:
+            move_exclusive(uploaded_file.temporary_path(), field.storage.path(name))
+            break
+        except FileExistsError:
+            continue
+    else:
+        logger.error(f"Could not claim a storage name for '{uploaded_file.name}' of Validation Request id: {request_id}")
+        return None
+
+    uploaded_file.claimed = True
+    if name != uploaded_file.stored_name:
+        ValidationRequest.objects.filter(id=request_id).update(file=name)
+        uploaded_file.stored_name = name
+    return name
+
+
+def stored_file_or_upload(uploaded_file):
+
+    """
+    Returns the value to assign to ValidationRequest.file: the storage name of an ingested upload
+    (so Django doesn't copy it a second time) or the uploaded file itself.
+    """
+
+    return uploaded_file.stored_name if isinstance(uploaded_file, IngestedUploadedFile) else uploaded_file
+
+
+def get_stored_header(request):
+
+    """
+    Returns the STEP header of a Validation Request's file as collected during ingestion, without reading the file.
+
+    Returns:
+       Dictionary with 'is_step', 'schema', 'time_stamp' and 'mvd' keys, or None if the file was not ingested.
+    """
+
+    ingested = IngestedFile.objects.filter(request=request).first()
+    if ingested is None:
+        return None
+
+    return {
+        'is_step': ingested.is_step,
+        'schema': ingested.header_schema,
+        'time_stamp': ingested.header_time_stamp,
+        'mvd': ingested.header_mvd
+    }
+
+
+def store_ingestion_results(request, uploaded_file):
+
+    """
+    Persists the hash, size, line count and STEP header collected during ingestion for a Validation Request,
+    and moves the ingested file into place once the request is committed (queue the workflow after this).
+
+    Returns:
+       IngestedFile instance, or None if the file was not ingested via IngestionUploadHandler.
+    """
+
+    if not isinstance(uploaded_file, IngestedUploadedFile):
+        return None
+
+    transaction.on_commit(functools.partial(claim_uploaded_file, request.id, uploaded_file))
+    return IngestedFile.objects.create(
+        request=request,
+        sha256=uploaded_file.sha256,
+        size=uploaded_file.size,
+        line_count=uploaded_file.line_count,
+        is_step=uploaded_file.header['is_step'],
+        header_schema=uploaded_file.header['schema'],
+        header_time_stamp=uploaded_file.header['time_stamp'],
+        header_mvd=uploaded_file.header['mvd']
+    )
@@ -0,0 +1,97 @@
+import statistics
+import threading
+import time
+
+from django.core import signals
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from apps.ifc_validation_models.models import ValidationRequest
+
+
+class Command(BaseCommand):
+
+    help = "Compares request latency and connections opened with and without persistent database connections (concurrent simulated requests)."
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--concurrency', type=int, default=20, help='Number of concurrent clients (threads)')
+        parser.add_argument('--requests', type=int, default=50, help='Number of requests per client')
+        parser.add_argument('--conn-max-age', type=int, default=300, help='CONN_MAX_AGE (seconds) of persistent connections')
+
+    def simulate_request(self):
+
+        # same as a web request: Django closes (or keeps) the connection on request_started/request_finished
+        signals.request_started.send(sender=self.__class__)
+        try:
+            list(ValidationRequest.objects.order_by('-id').values_list('id', flat=True)[:10])
+        finally:
+            signals.request_finished.send(sender=self.__class__)
+
+    def run(self, conn_max_age, concurrency, requests):
+
+        connections.settings['default']['CONN_MAX_AGE'] = conn_max_age
+        connections['default'].close()
+
+        lock = threading.Lock()
+        latencies = []
+        opened = [0]
+
+        def on_connection_created(sender, connection, **kwargs):
+            with lock:
+                opened[0] += 1
+
+        def client():
+            timings = []
+            try:
+                for _ in range(requests):
+                    started = time.perf_counter()
+                    self.simulate_request()
+                    timings.append(time.perf_counter() - started)
+            finally:
+                connections.close_all()
+            with lock:
+                latencies.extend(timings)
+
+        connection_created.connect(on_connection_created)
+        try:
+            threads = [threading.Thread(target=client) for _ in range(concurrency)]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            connection_created.disconnect(on_connection_created)
+
+        percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        return {
+            'p50': percentiles[49] * 1000,
+            'p95': percentiles[94] * 1000,
+            'p99': percentiles[98] * 1000,
+            'throughput': len(latencies) / elapsed,
+            'connections': opened[0],
+        }
+
+    def handle(self, *args, **options):
+
+        concurrency, requests = options['concurrency'], options['requests']
+        original = connections.settings['default']['CONN_MAX_AGE']
+
+        try:
+            results = [
+                ('Connection per request (CONN_MAX_AGE=0)', self.run(0, concurrency, requests)),
+                (f"Persistent (CONN_MAX_AGE={options['conn_max_age']})", self.run(options['conn_max_age'], concurrency, requests)),
+            ]
+        finally:
+            connections.settings['default']['CONN_MAX_AGE'] = original
+
+        self.stdout.write(f"{concurrency} clients x {requests} requests ({connections['default'].vendor})")
+        self.stdout.write(f"{'':<40} {'p50':>9} {'p95':>9} {'p99':>9} {'req/s':>9} {'connections':>12}")
+        for label, result in results:
+            self.stdout.write(
+                f"{label:<40} {result['p50']:>6.2f} ms {result['p95']:>6.2f} ms {result['p99']:>6.2f} ms "
+                f"{result['throughput']:>9.0f} {result['connections']:>12,}"
+            )
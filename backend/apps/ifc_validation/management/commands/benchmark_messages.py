@@ -0,0 +1,89 @@
+import json
+import random
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.ifc_validation_models.decorators import requires_django_user_context
+from apps.ifc_validation_models.models import ValidationRequest, ValidationTask, ValidationOutcome
+
+from apps.ifc_validation.models import MessageTemplate
+from apps.ifc_validation.messages import intern_queryset, clear_templates
+from apps.ifc_validation_bff.reports import iterate_outcomes, map_schema_outcome
+
+# typical 'ifcopenshell.validate' messages
+MESSAGES = [
+    "For instance:\n    #{id}=IfcWallStandardCase('{guid}',#2,'Basic Wall:Generic - 200mm:{n}',$,'Basic Wall:Generic - 200mm',#{a},#{b},'{n}')\n"
+    "  Rule IfcWallStandardCase.ExtrudedAreaSolidPlacement violated: not all items of the extrusion are in the XY plane",
+    "Attribute <attribute IfcProduct.Representation: <entity IfcProductRepresentation>> on <entity IfcBuildingElementProxy> has invalid value "
+    "#{a}=IfcProductDefinitionShape($,$,(#{b},#{id})) for instance #{id}=IfcBuildingElementProxy('{guid}',#2,'Proxy:{n}',$,$,#{a},#{b},'{n}',.NOTDEFINED.)",
+    "Type <type IfcPositiveLengthMeasure: <real>> of attribute <attribute IfcCircleProfileDef.Radius> has invalid value {x} "
+    "for instance #{id}=IfcCircleProfileDef(.AREA.,$,#{a},{x})",
+]
+
+
+class Command(BaseCommand):
+
+    help = "Compares stored size and report latency of outcome messages, in full and interned (generated data, rolled back afterwards)."
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--outcomes', type=int, default=10_000, help='Number of generated Validation Outcomes')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of timed runs; the fastest is reported')
+
+    def measure(self, label, func, repeat):
+
+        best = min(timeit.repeat(func, number=1, repeat=repeat))
+        self.stdout.write(f"{label:<52} {best * 1000:>10.1f} ms")
+        return best
+
+    def get_stored_size(self, task):
+
+        # size of the JSON documents stored in observed, plus the templates they refer to
+        size = sum(len(json.dumps(value)) for value in ValidationOutcome.objects.filter(validation_task=task).values_list('observed', flat=True).iterator())
+        return size + sum(len(text) for text in MessageTemplate.objects.values_list('text', flat=True))
+
+    @requires_django_user_context
+    def handle(self, *args, **options):
+
+        n, repeat = options['outcomes'], options['repeat']
+        rng = random.Random(42)
+
+        with transaction.atomic():
+
+            request = ValidationRequest.objects.create(file_name='benchmark.ifc', file='benchmark.ifc', size=0)
+            task = ValidationTask.objects.create(request=request, type=ValidationTask.Type.SCHEMA)
+            ValidationOutcome.objects.bulk_create([ValidationOutcome(
+                validation_task=task,
+                severity=ValidationOutcome.OutcomeSeverity.ERROR,
+                outcome_code=ValidationOutcome.ValidationOutcomeCode.SCHEMA_ERROR,
+                feature=json.dumps({'type': 'entity_rule', 'attribute': 'IfcWallStandardCase.ExtrudedAreaSolidPlacement'}),
+                observed=rng.choice(MESSAGES).format(
+                    id=rng.randint(1, 10**6), a=rng.randint(1, 10**6), b=rng.randint(1, 10**6), n=rng.randint(1, 10**6),
+                    guid=''.join(rng.choice('0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_$') for _ in range(22)),
+                    x=round(rng.uniform(-10, 0), 3)),
+            ) for i in range(n)], batch_size=1000)
+
+            def build_report():
+                return [map_schema_outcome(outcome) for outcome in iterate_outcomes(task)]
+
+            # messages in full
+            size_before = self.get_stored_size(task)
+            expected = build_report()
+            before = self.measure('Report - messages in full', build_report, repeat)
+
+            # interned messages
+            self.measure('Interning (batched update)', lambda: intern_queryset(ValidationOutcome.objects.filter(validation_task=task)), 1)
+            size_after = self.get_stored_size(task)
+            clear_templates()
+            cold = self.measure('Report - interned messages (cold template cache)', build_report, 1)
+            after = self.measure('Report - interned messages', build_report, repeat)
+
+            # sanity check: reports must be identical
+            assert build_report() == expected
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS(f"{n:,} outcomes: observed messages {size_before:,} > {size_after:,} bytes ({size_after / size_before:.0%})"))
+        self.stdout.write(self.style.SUCCESS(f"{n:,} outcomes: report {before * 1000:.1f} > {after * 1000:.1f} ms ({cold * 1000:.1f} ms with a cold template cache)"))
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.ifc_validation.bsdd import build_snapshot, get_snapshot_path, get_snapshot_info
+
+
+class Command(BaseCommand):
+
+    help = "Downloads bSDD dictionaries, classes and properties into the local snapshot used with BSDD_MODE = 'snapshot'."
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--path', type=str, default=None, help='Snapshot file (BSDD_SNAPSHOT_PATH by default)')
+        parser.add_argument('--dictionary', type=str, action='append', dest='dictionaries', help='Uri of a dictionary to include classes and properties of (BSDD_SNAPSHOT_DICTIONARIES by default) - repeatable')
+        parser.add_argument('--info', action='store_true', help='Shows the current snapshot instead')
+
+    def handle(self, *args, **options):
+
+        path = options['path'] or get_snapshot_path()
+
+        if options['info']:
+            info = get_snapshot_info(path)
+            if info is None:
+                self.stdout.write(f"No bSDD snapshot at '{path}'.")
+            else:
+                created = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(info['created']))
+                self.stdout.write(f"bSDD snapshot '{path}' created {created}: {info['count:dictionaries']:,} dictionaries, {info['count:classes']:,} classes, {info['count:properties']:,} properties")
+            return
+
+        started = time.perf_counter()
+        counts = build_snapshot(path, options['dictionaries'])
+        self.stdout.write(self.style.SUCCESS(
+            f"bSDD snapshot '{path}': {counts['dictionaries']:,} dictionaries, {counts['classes']:,} classes, {counts['properties']:,} properties "
+            f"in {time.perf_counter() - started:.1f} s"
+        ))
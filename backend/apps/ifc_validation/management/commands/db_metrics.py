@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.db import get_metrics, reset_metrics, get_server_connections
+
+
+class Command(BaseCommand):
+
+    help = "Shows database connection metrics: connections opened and connect time per process type, open connections and pgbouncer pools."
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--reset', action='store_true', help='Resets the connection counters afterwards')
+
+    def get_pgbouncer_pools(self):
+
+        import psycopg2
+
+        # the pgbouncer admin console only supports the simple query protocol, hence a separate (autocommit) connection
+        params = settings.DATABASES['default']
+        conn = psycopg2.connect(
+            host=params['HOST'], port=params['PORT'], user=params['USER'], password=params['PASSWORD'], dbname='pgbouncer'
+        )
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute('SHOW POOLS')
+                columns = [column.name for column in cursor.description]
+                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    def handle(self, *args, **options):
+
+        self.stdout.write(f"Pool mode: {getattr(settings, 'POSTGRES_POOL_MODE', 'none')}")
+
+        for process_type, metrics in get_metrics().items():
+            avg = f"{metrics['avg_connect_ms']:.1f} ms" if metrics['avg_connect_ms'] is not None else '-'
+            self.stdout.write(f"{process_type:<8} connections opened: {metrics['connections']:>8,}  avg connect time: {avg}")
+            self.stdout.write('         ' + '  '.join(f"{label}: {count:,}" for label, count in metrics['histogram'].items()))
+
+        if connection.vendor == 'postgresql':
+            self.stdout.write('Open connections (application, state):')
+            for application_name, state, count in get_server_connections():
+                self.stdout.write(f"  {application_name or '-':<24} {state or '-':<24} {count:>6,}")
+
+        if getattr(settings, 'POSTGRES_POOL_MODE', 'none') == 'pgbouncer':
+            self.stdout.write('pgbouncer pools (database, user, active/waiting clients, max wait):')
+            for pool in self.get_pgbouncer_pools():
+                maxwait = pool['maxwait'] + pool.get('maxwait_us', 0) / 1_000_000
+                self.stdout.write(f"  {pool['database']:<16} {pool['user']:<16} {pool['cl_active']:>6} {pool['cl_waiting']:>6} {maxwait:>8.3f} s")
+
+        if options['reset']:
+            reset_metrics()
+            self.stdout.write(self.style.SUCCESS('Connection counters reset.'))
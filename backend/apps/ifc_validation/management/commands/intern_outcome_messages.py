@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.ifc_validation_models.models import ValidationOutcome
+
+from apps.ifc_validation.messages import intern_queryset, render_queryset, is_interning_enabled
+
+
+class Command(BaseCommand):
+
+    help = "Interns the messages of existing Validation Outcomes (OUTCOME_MESSAGE_INTERNING), or renders them back to plain text."
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--render', action='store_true', help='Renders interned messages back to plain text (eg. after turning interning off)')
+
+    def handle(self, *args, **options):
+
+        # in batches, each committed on its own - the table is not locked as a whole
+        if options['render']:
+            count = render_queryset(ValidationOutcome.objects.all())
+            self.stdout.write(self.style.SUCCESS(f"Rendered the messages of {count:,} outcome(s) to plain text."))
+            return
+
+        if not is_interning_enabled():
+            raise CommandError("Message interning is off - set OUTCOME_MESSAGE_INTERNING first.")
+
+        count = intern_queryset(ValidationOutcome.objects.all())
+        self.stdout.write(self.style.SUCCESS(f"Interned the messages of {count:,} outcome(s)."))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.ifc_validation_models.models import ValidationTask
+
+from apps.ifc_validation.outcomes import rebuild_outcome_summary
+
+
+class Command(BaseCommand):
+
+    help = "(Re)builds the per-task outcome summaries, eg. for tasks processed before summaries were maintained."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--all', action='store_true', help='Rebuilds all summaries (default: only tasks without a summary)')
+
+    def handle(self, *args, **options):
+
+        tasks = ValidationTask.objects.order_by('id')
+        if not options['all']:
+            tasks = tasks.filter(outcome_summaries__isnull=True)
+
+        count = 0
+        for task in tasks.only('id').iterator():
+            with transaction.atomic():
+                rebuild_outcome_summary(task)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt outcome summaries of {count:,} task(s)."))
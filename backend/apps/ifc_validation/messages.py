@@ -0,0 +1,238 @@
+import re
+import hashlib
+
+from django.conf import settings
+
+from .models import MessageTemplate
+
+# IMPORTANT
+#
+# Outcome messages (ValidationOutcome.observed/expected) repeat the same text with different ids and values, eg.
+#   "Attribute 'Name' of #12=IfcWall('x') has 2 items"
+# Long messages are stored as a compact payload instead: a reference to a deduplicated template plus its parameters
+#   {"$t": "<template hash>", "$p": ["'Name'", "#12", "'x'", "2"]}
+# and rendered back to the full text when read (reports, API). Templates are content-addressed (keyed on a hash of
+# their text), so a template hash always refers to the same text and can be cached for the lifetime of a process.
+# Templates are loaded in bulk for a chunk of outcomes or a page (see load_templates), not one query per message.
+#
+# Interning is opt-in (OUTCOME_MESSAGE_INTERNING): observed/expected belong to the shared data model, and only this
+# app (MessageField, render_message) reads the payloads - the Gherkin rules and other direct readers expect plain text.
+# Existing outcomes are interned (or rendered back to plain text) by the intern_outcome_messages command.
+
+TEMPLATE_KEY = '$t'
+PARAMETERS_KEY = '$p'
+
+# shorter messages are stored as is
+MESSAGE_INTERNING_MIN_LENGTH = 48
+
+MESSAGE_BATCH_SIZE = 1000
+TEMPLATE_CACHE_SIZE = 4096
+UPDATE_BATCH_SIZE = 100  # bulk_update() builds a CASE WHEN per row and field - keep its statements small
+
+# parts of a message that differ between occurrences of the same rule (STEP ids, quoted values, numbers)
+MESSAGE_PARAMETER_PATTERN = re.compile(
+    r"(?P<id>#\d+)"
+    r"|(?P<value>'[^']*'|\"[^\"]*\")"
+    r"|(?P<n>(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)"
+)
+
+
+def is_interning_enabled():
+
+    return getattr(settings, 'OUTCOME_MESSAGE_INTERNING', False)
+
+
+def get_template_hash(text):
+
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+def escape(text):
+
+    return text.replace('{', '{{').replace('}', '}}')
+
+
+def split_message(text):
+
+    """
+    Splits a message into a (format-style) template and its parameters, eg.
+    "#12=IfcWall has 2 items" > ("{}=IfcWall has {} items", ["#12", "2"]) - template.format(*parameters) == text.
+    """
+
+    parts, parameters, position = [], [], 0
+    for match in MESSAGE_PARAMETER_PATTERN.finditer(text):
+        parts.append(escape(text[position:match.start()]))
+        parts.append('{}')
+        parameters.append(match.group())
+        position = match.end()
+    parts.append(escape(text[position:]))
+
+    return ''.join(parts), parameters
+
+
+def intern_message(value):
+
+    """
+    Returns the compact payload of a message and its template, or the value as is (and None) if it is not worth interning.
+
+    Returns:
+       (value or payload, (template hash, template text) or None) tuple
+    """
+
+    if not isinstance(value, str) or len(value) < MESSAGE_INTERNING_MIN_LENGTH:
+        return value, None
+
+    template, parameters = split_message(value)
+    template_hash = get_template_hash(template)
+    payload = {TEMPLATE_KEY: template_hash}
+    if parameters:
+        payload[PARAMETERS_KEY] = parameters
+    return payload, (template_hash, template)
+
+
+def is_interned(value):
+
+    return isinstance(value, dict) and TEMPLATE_KEY in value
+
+
+def save_templates(templates):
+
+    """
+    Stores message templates (existing ones are left untouched).
+
+    Mandatory Args:
+       templates: mapping of template hash > template text
+    """
+
+    if templates:
+        MessageTemplate.objects.bulk_create([MessageTemplate(hash=h, text=text) for h, text in templates.items()], batch_size=MESSAGE_BATCH_SIZE, ignore_conflicts=True)
+
+
+def intern_outcomes(outcomes):
+
+    """
+    Replaces long observed/expected messages of (unsaved) Validation Outcomes by their compact payload and stores the templates.
+    """
+
+    templates = {}
+    for outcome in outcomes:
+        for field in ('observed', 'expected'):
+            value, template = intern_message(getattr(outcome, field))
+            if template:
+                setattr(outcome, field, value)
+                templates[template[0]] = template[1]
+    save_templates(templates)
+
+
+def intern_queryset(queryset):
+
+    """
+    Interns the messages of Validation Outcomes already written (eg. by the Gherkin rules, or before interning was enabled), in batches.
+
+    Mandatory Args:
+       queryset: Validation Outcomes
+
+    Returns:
+       Number of outcomes updated.
+    """
+
+    model = queryset.model
+    updated, last_id = 0, 0
+    while True:
+        rows = list(queryset.filter(id__gt=last_id).order_by('id').values_list('id', 'observed', 'expected')[:MESSAGE_BATCH_SIZE])
+        if not rows:
+            return updated
+
+        templates, outcomes = {}, {'observed': [], 'expected': []}
+        for id, observed, expected in rows:
+            for field, value in (('observed', observed), ('expected', expected)):
+                interned, template = intern_message(value)
+                if template:
+                    templates[template[0]] = template[1]
+                    outcomes[field].append(model(id=id, **{field: interned}))
+
+        save_templates(templates)
+        for field, changed in outcomes.items():
+            model.objects.bulk_update(changed, [field], batch_size=UPDATE_BATCH_SIZE)
+        updated += len({outcome.id for changed in outcomes.values() for outcome in changed})
+        last_id = rows[-1][0]
+
+
+_template_texts = {}
+
+
+def load_templates(values):
+
+    """
+    Loads the templates of interned messages that are not cached yet, in a single query.
+
+    Mandatory Args:
+       values: observed/expected values (eg. of a chunk of outcomes), interned or not
+    """
+
+    hashes = list({value[TEMPLATE_KEY] for value in values if is_interned(value)} - _template_texts.keys())
+    if not hashes:
+        return
+
+    if len(_template_texts) + len(hashes) > TEMPLATE_CACHE_SIZE:
+        _template_texts.clear()
+    for i in range(0, len(hashes), MESSAGE_BATCH_SIZE):
+        _template_texts.update(MessageTemplate.objects.filter(hash__in=hashes[i:i + MESSAGE_BATCH_SIZE]).values_list('hash', 'text'))
+
+
+def clear_templates():
+
+    _template_texts.clear()
+
+
+def get_template_text(template_hash):
+
+    if template_hash not in _template_texts:
+        load_templates([{TEMPLATE_KEY: template_hash}])
+    try:
+        return _template_texts[template_hash]
+    except KeyError:
+        raise MessageTemplate.DoesNotExist(f"Message template '{template_hash}' does not exist.")
+
+
+def render_message(value):
+
+    """
+    Returns the full text of an interned message; other values are returned as is.
+    """
+
+    if not is_interned(value):
+        return value
+    return get_template_text(value[TEMPLATE_KEY]).format(*value.get(PARAMETERS_KEY, ()))
+
+
+def render_queryset(queryset):
+
+    """
+    Replaces the interned messages of Validation Outcomes by their full text again (eg. after turning interning off), in batches.
+
+    Mandatory Args:
+       queryset: Validation Outcomes
+
+    Returns:
+       Number of outcomes updated.
+    """
+
+    model = queryset.model
+    updated, last_id = 0, 0
+    while True:
+        rows = list(queryset.filter(id__gt=last_id).order_by('id').values_list('id', 'observed', 'expected')[:MESSAGE_BATCH_SIZE])
+        if not rows:
+            return updated
+
+        load_templates(value for _, observed, expected in rows for value in (observed, expected))
+        outcomes = {'observed': [], 'expected': []}
+        for id, observed, expected in rows:
+            for field, value in (('observed', observed), ('expected', expected)):
+                if is_interned(value):
+                    outcomes[field].append(model(id=id, **{field: render_message(value)}))
+
+        for field, changed in outcomes.items():
+            model.objects.bulk_update(changed, [field], batch_size=UPDATE_BATCH_SIZE)
+        updated += len({outcome.id for changed in outcomes.values() for outcome in changed})
+        last_id = rows[-1][0]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('ifc_validation_models', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestedFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(db_index=True, help_text='SHA-256 hash (hex) of the uploaded file.', max_length=64)),
+                ('size', models.BigIntegerField(help_text='Size of the uploaded file (bytes).')),
+                ('line_count', models.BigIntegerField(help_text='Number of lines in the uploaded file.')),
+                ('is_step', models.BooleanField(default=False, help_text='Whether the file starts with the ISO-10303-21 magic.')),
+                ('header_schema', models.CharField(blank=True, help_text='FILE_SCHEMA as declared in the STEP header.', max_length=64, null=True)),
+                ('header_time_stamp', models.CharField(blank=True, help_text='FILE_NAME time stamp as declared in the STEP header.', max_length=64, null=True)),
+                ('header_mvd', models.CharField(blank=True, help_text='Model View Definition from FILE_DESCRIPTION in the STEP header.', max_length=255, null=True)),
+                ('created', models.DateTimeField(auto_now_add=True, help_text='Timestamp the file was ingested.')),
+                ('request', models.OneToOneField(help_text='Validation Request the uploaded file belongs to.', on_delete=django.db.models.deletion.CASCADE, related_name='ingested_file', to='ifc_validation_models.validationrequest')),
+            ],
+            options={
+                'verbose_name': 'Ingested File',
+                'verbose_name_plural': 'Ingested Files',
+                'db_table': 'ifc_ingested_file',
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+INDEX_NAME = 'ifc_validation_request_dashboard_idx'
+
+
+def create_dashboard_index(apps, schema_editor):
+
+    # ValidationRequest is owned by the data model package, hence the index is created by name here
+    ValidationRequest = apps.get_model('ifc_validation_models', 'ValidationRequest')
+    meta = ValidationRequest._meta
+    quote = schema_editor.quote_name
+
+    # built concurrently on PostgreSQL, the request table is not locked for writes meanwhile
+    concurrently = 'CONCURRENTLY ' if schema_editor.connection.vendor == 'postgresql' else ''
+
+    schema_editor.execute(
+        f"CREATE INDEX {concurrently}IF NOT EXISTS {quote(INDEX_NAME)} ON {quote(meta.db_table)} "
+        f"({quote(meta.get_field('created_by').column)}, {quote(meta.get_field('created').column)} DESC, {quote(meta.pk.column)} DESC) "
+        f"WHERE {quote(meta.get_field('deleted').column)} = false"
+    )
+
+
+def drop_dashboard_index(apps, schema_editor):
+
+    concurrently = 'CONCURRENTLY ' if schema_editor.connection.vendor == 'postgresql' else ''
+    schema_editor.execute(f"DROP INDEX {concurrently}IF EXISTS {schema_editor.quote_name(INDEX_NAME)}")
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('ifc_validation', '0001_initial'),
+        ('ifc_validation_models', '0001_initial'),
+    ]
+
+    operations = [
+        # keyset pagination of the dashboard: WHERE created_by_id = ? AND deleted = false ORDER BY created DESC, id DESC
+        migrations.RunPython(create_dashboard_index, drop_dashboard_index),
+    ]
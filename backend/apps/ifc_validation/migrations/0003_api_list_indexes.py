@@ -0,0 +1,46 @@
+from django.db import migrations
+
+# (index name, model, columns) - see apps.ifc_validation.filters and apps.ifc_validation.pagination
+INDEXES = [
+    # tasks of a request, optionally by type
+    ('ifc_validation_task_request_type_idx', 'ValidationTask', ['request', 'type']),
+    # cursor pages of the outcomes of a task: WHERE validation_task_id = ? AND id > ? ORDER BY id
+    ('ifc_validation_outcome_task_id_idx', 'ValidationOutcome', ['validation_task', 'id']),
+    # outcomes of a task by severity and/or outcome code
+    ('ifc_validation_outcome_task_severity_idx', 'ValidationOutcome', ['validation_task', 'severity', 'outcome_code']),
+    # outcomes by date range
+    ('ifc_validation_outcome_created_idx', 'ValidationOutcome', ['created']),
+]
+
+
+def create_list_indexes(apps, schema_editor):
+
+    # the tables are owned by the data model package, hence the indexes are created by name here;
+    # built concurrently on PostgreSQL, the outcome table is too large to be locked for writes meanwhile
+    quote = schema_editor.quote_name
+    concurrently = 'CONCURRENTLY ' if schema_editor.connection.vendor == 'postgresql' else ''
+    for name, model_name, fields in INDEXES:
+        meta = apps.get_model('ifc_validation_models', model_name)._meta
+        columns = ', '.join(quote(meta.get_field(field).column) for field in fields)
+        schema_editor.execute(f"CREATE INDEX {concurrently}IF NOT EXISTS {quote(name)} ON {quote(meta.db_table)} ({columns})")
+
+
+def drop_list_indexes(apps, schema_editor):
+
+    concurrently = 'CONCURRENTLY ' if schema_editor.connection.vendor == 'postgresql' else ''
+    for name, _, _ in INDEXES:
+        schema_editor.execute(f"DROP INDEX {concurrently}IF EXISTS {schema_editor.quote_name(name)}")
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('ifc_validation', '0002_validation_request_dashboard_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_list_indexes, drop_list_indexes),
+    ]
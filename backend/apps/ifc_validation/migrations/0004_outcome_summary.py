@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ifc_validation', '0003_api_list_indexes'),
+        ('ifc_validation_models', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutcomeSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('severity', models.PositiveSmallIntegerField(help_text='Severity of the outcomes.')),
+                ('outcome_code', models.CharField(help_text='Outcome code of the outcomes.', max_length=10)),
+                ('count', models.PositiveIntegerField(default=0, help_text='Number of outcomes with this severity and outcome code.')),
+                ('task', models.ForeignKey(help_text='Validation Task the outcomes belong to.', on_delete=django.db.models.deletion.CASCADE, related_name='outcome_summaries', to='ifc_validation_models.validationtask')),
+            ],
+            options={
+                'verbose_name': 'Outcome Summary',
+                'verbose_name_plural': 'Outcome Summaries',
+                'db_table': 'ifc_outcome_summary',
+                'constraints': [models.UniqueConstraint(fields=('task', 'severity', 'outcome_code'), name='unique_outcome_summary')],
+            },
+        ),
+    ]
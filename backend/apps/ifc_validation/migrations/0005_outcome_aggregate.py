@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ifc_validation', '0004_outcome_summary'),
+        ('ifc_validation_models', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutcomeAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(help_text='Number of occurrences represented by the aggregated outcome.')),
+                ('instance_ids', models.BinaryField(help_text='Compressed STEP ids (#) of the instances involved (see outcomes.decode_instance_ids).', null=True)),
+                ('outcome', models.OneToOneField(help_text='Aggregated Validation Outcome.', on_delete=django.db.models.deletion.CASCADE, related_name='aggregate', to='ifc_validation_models.validationoutcome')),
+            ],
+            options={
+                'verbose_name': 'Outcome Aggregate',
+                'verbose_name_plural': 'Outcome Aggregates',
+                'db_table': 'ifc_outcome_aggregate',
+            },
+        ),
+    ]
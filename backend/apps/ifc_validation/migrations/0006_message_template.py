@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ifc_validation', '0005_outcome_aggregate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageTemplate',
+            fields=[
+                ('hash', models.CharField(help_text='Hash of the template text.', max_length=16, primary_key=True, serialize=False)),
+                ('text', models.TextField(help_text='Template text, with {} placeholders for the parameters of a message.')),
+            ],
+            options={
+                'verbose_name': 'Message Template',
+                'verbose_name_plural': 'Message Templates',
+                'db_table': 'ifc_message_template',
+            },
+        ),
+    ]
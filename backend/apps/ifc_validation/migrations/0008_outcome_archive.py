@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ifc_validation', '0006_message_template'),
+        ('ifc_validation_models', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutcomeArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.CharField(help_text='Path of the archive file (gzipped NDJSON), relative to OUTCOME_ARCHIVE_ROOT.', max_length=255)),
+                ('outcome_count', models.PositiveIntegerField(default=0, help_text='Number of archived outcomes.')),
+                ('instance_count', models.PositiveIntegerField(default=0, help_text='Number of archived model instances.')),
+                ('archived', models.DateTimeField(help_text='Timestamp the outcomes were (last) archived.', null=True)),
+                ('restored', models.DateTimeField(help_text='Timestamp the outcomes were restored (NULL while archived).', null=True)),
+                ('request', models.OneToOneField(help_text='Validation Request the archived outcomes belong to.', on_delete=django.db.models.deletion.CASCADE, related_name='outcome_archive', to='ifc_validation_models.validationrequest')),
+            ],
+            options={
+                'verbose_name': 'Outcome Archive',
+                'verbose_name_plural': 'Outcome Archives',
+                'db_table': 'ifc_outcome_archive',
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ifc_validation', '0008_outcome_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurgeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], db_index=True, default='PENDING', help_text='Status of the purge job.', max_length=16)),
+                ('reason', models.CharField(choices=[('ADMIN', 'Admin'), ('RETENTION', 'Retention')], default='ADMIN', help_text='Why the Validation Requests are purged (admin action or retention policy).', max_length=16)),
+                ('request_ids', models.JSONField(default=list, help_text='Ids of the Validation Requests to purge.')),
+                ('total', models.PositiveIntegerField(default=0, help_text='Number of Validation Requests to purge.')),
+                ('processed', models.PositiveIntegerField(default=0, help_text='Number of Validation Requests purged so far.')),
+                ('rows_deleted', models.PositiveBigIntegerField(default=0, help_text='Number of rows deleted so far (requests, tasks, outcomes, instances, ...).')),
+                ('files_deleted', models.PositiveIntegerField(default=0, help_text='Number of files removed so far (uploads, archives).')),
+                ('error', models.TextField(blank=True, help_text='Error of a failed purge job.', null=True)),
+                ('created', models.DateTimeField(auto_now_add=True, help_text='Timestamp the purge job was scheduled.')),
+                ('started', models.DateTimeField(help_text='Timestamp the purge job started.', null=True)),
+                ('ended', models.DateTimeField(help_text='Timestamp the purge job ended.', null=True)),
+                ('created_by', models.ForeignKey(blank=True, help_text='User who scheduled the purge job (NULL for the retention policy).', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Purge Job',
+                'verbose_name_plural': 'Purge Jobs',
+                'db_table': 'ifc_purge_job',
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+from django.db import migrations
+
+from apps.ifc_validation.messages import TEMPLATE_KEY
+
+# (index name, app label, model, column) - trigram (GIN) indexes for the admin searches, see apps.ifc_validation.admin;
+# the expression matches the SQL of an 'icontains' lookup on PostgreSQL: UPPER(<column>::text) LIKE UPPER('%term%')
+TRIGRAM_INDEXES = [
+    ('ifc_validation_outcome_feature_trgm_idx', 'ifc_validation_models', 'ValidationOutcome', 'feature'),
+    ('ifc_validation_outcome_observed_trgm_idx', 'ifc_validation_models', 'ValidationOutcome', 'observed'),
+    ('ifc_validation_outcome_expected_trgm_idx', 'ifc_validation_models', 'ValidationOutcome', 'expected'),
+    ('ifc_validation_instance_ifc_type_trgm_idx', 'ifc_validation_models', 'ModelInstance', 'ifc_type'),
+    ('ifc_message_template_text_trgm_idx', 'ifc_validation', 'MessageTemplate', 'text'),
+]
+
+# (index name, column) - template hash of interned messages, see apps.ifc_validation.messages
+TEMPLATE_INDEXES = [
+    ('ifc_validation_outcome_observed_template_idx', 'observed'),
+    ('ifc_validation_outcome_expected_template_idx', 'expected'),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+
+    # PostgreSQL only; built concurrently, the outcome table is too large to be locked for writes meanwhile
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    quote = schema_editor.quote_name
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    for name, app_label, model_name, field in TRIGRAM_INDEXES:
+        meta = apps.get_model(app_label, model_name)._meta
+        column = quote(meta.get_field(field).column)
+        schema_editor.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote(name)} ON {quote(meta.db_table)} USING gin (UPPER({column}::text) gin_trgm_ops)")
+
+    meta = apps.get_model('ifc_validation_models', 'ValidationOutcome')._meta
+    for name, field in TEMPLATE_INDEXES:
+        column = quote(meta.get_field(field).column)
+        schema_editor.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote(name)} ON {quote(meta.db_table)} (({column} -> '{TEMPLATE_KEY}'))")
+
+
+def drop_search_indexes(apps, schema_editor):
+
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for name, *_ in TRIGRAM_INDEXES + TEMPLATE_INDEXES:
+        schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {schema_editor.quote_name(name)}")
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('ifc_validation', '0009_purge_job'),
+        ('ifc_validation_models', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+# (index name, model, column) - trigram (GIN) indexes for the file name searches of the outcome and instance admin,
+# see apps.ifc_validation.search; same expression as an 'icontains' lookup on PostgreSQL (see migration 0010)
+TRIGRAM_INDEXES = [
+    ('ifc_validation_request_file_name_trgm_idx', 'ValidationRequest', 'file_name'),
+    ('ifc_model_file_name_trgm_idx', 'Model', 'file_name'),
+]
+
+
+def create_file_name_indexes(apps, schema_editor):
+
+    # PostgreSQL only; built concurrently, so uploads are not blocked meanwhile
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    quote = schema_editor.quote_name
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    for name, model_name, field in TRIGRAM_INDEXES:
+        meta = apps.get_model('ifc_validation_models', model_name)._meta
+        column = quote(meta.get_field(field).column)
+        schema_editor.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote(name)} ON {quote(meta.db_table)} USING gin (UPPER({column}::text) gin_trgm_ops)")
+
+
+def drop_file_name_indexes(apps, schema_editor):
+
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for name, *_ in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {schema_editor.quote_name(name)}")
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('ifc_validation', '0010_admin_search_indexes'),
+        ('ifc_validation_models', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_file_name_indexes, drop_file_name_indexes),
+    ]
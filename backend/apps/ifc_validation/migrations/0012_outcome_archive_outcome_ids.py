@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ifc_validation', '0011_file_name_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outcomearchive',
+            name='first_outcome_id',
+            field=models.BigIntegerField(help_text='Lowest id of the archived outcomes (to tell which archive may hold an outcome).', null=True),
+        ),
+        migrations.AddField(
+            model_name='outcomearchive',
+            name='last_outcome_id',
+            field=models.BigIntegerField(help_text='Highest id of the archived outcomes.', null=True),
+        ),
+    ]
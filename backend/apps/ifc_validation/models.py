@@ -0,0 +1,324 @@
+from django.db import models
+from django.contrib.auth.models import User
+
+from apps.ifc_validation_models.models import ValidationRequest, ValidationTask, ValidationOutcome
+
+
+class IngestedFile(models.Model):
+
+    """
+    Metrics of an uploaded file, collected while it was streamed to storage (see ingestion.py).
+    """
+
+    request = models.OneToOneField(
+        to=ValidationRequest,
+        on_delete=models.CASCADE,
+        related_name='ingested_file',
+        help_text="Validation Request the uploaded file belongs to."
+    )
+
+    sha256 = models.CharField(
+        max_length=64,
+        db_index=True,
+        help_text="SHA-256 hash (hex) of the uploaded file."
+    )
+
+    size = models.BigIntegerField(
+        help_text="Size of the uploaded file (bytes)."
+    )
+
+    line_count = models.BigIntegerField(
+        help_text="Number of lines in the uploaded file."
+    )
+
+    is_step = models.BooleanField(
+        default=False,
+        help_text="Whether the file starts with the ISO-10303-21 magic."
+    )
+
+    header_schema = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        help_text="FILE_SCHEMA as declared in the STEP header."
+    )
+
+    header_time_stamp = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        help_text="FILE_NAME time stamp as declared in the STEP header."
+    )
+
+    header_mvd = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        help_text="Model View Definition from FILE_DESCRIPTION in the STEP header."
+    )
+
+    created = models.DateTimeField(
+        auto_now_add=True,
+        help_text="Timestamp the file was ingested."
+    )
+
+    class Meta:
+        db_table = "ifc_ingested_file"
+        verbose_name = "Ingested File"
+        verbose_name_plural = "Ingested Files"
+
+    def __str__(self):
+
+        return f'{self.request_id} - {self.sha256}'
+
+
+class OutcomeSummary(models.Model):
+
+    """
+    Number of Validation Outcomes of a task per severity and outcome code - maintained as outcomes are written (see outcomes.py).
+    """
+
+    task = models.ForeignKey(
+        to=ValidationTask,
+        on_delete=models.CASCADE,
+        related_name='outcome_summaries',
+        help_text="Validation Task the outcomes belong to."
+    )
+
+    severity = models.PositiveSmallIntegerField(
+        help_text="Severity of the outcomes."
+    )
+
+    outcome_code = models.CharField(
+        max_length=10,
+        help_text="Outcome code of the outcomes."
+    )
+
+    count = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of outcomes with this severity and outcome code."
+    )
+
+    class Meta:
+        db_table = "ifc_outcome_summary"
+        verbose_name = "Outcome Summary"
+        verbose_name_plural = "Outcome Summaries"
+        constraints = [
+            models.UniqueConstraint(fields=['task', 'severity', 'outcome_code'], name='unique_outcome_summary')
+        ]
+
+    def __str__(self):
+
+        return f'{self.task_id} - {self.severity}/{self.outcome_code}: {self.count}'
+
+
+class OutcomeAggregate(models.Model):
+
+    """
+    Occurrences of a rule/message beyond the compaction limit, represented by a single (aggregated) Validation Outcome (see outcomes.py).
+    """
+
+    outcome = models.OneToOneField(
+        to=ValidationOutcome,
+        on_delete=models.CASCADE,
+        related_name='aggregate',
+        help_text="Aggregated Validation Outcome."
+    )
+
+    count = models.PositiveIntegerField(
+        help_text="Number of occurrences represented by the aggregated outcome."
+    )
+
+    instance_ids = models.BinaryField(
+        null=True,
+        help_text="Compressed STEP ids (#) of the instances involved (see outcomes.decode_instance_ids)."
+    )
+
+    class Meta:
+        db_table = "ifc_outcome_aggregate"
+        verbose_name = "Outcome Aggregate"
+        verbose_name_plural = "Outcome Aggregates"
+
+    def __str__(self):
+
+        return f'{self.outcome_id}: {self.count}'
+
+
+class MessageTemplate(models.Model):
+
+    """
+    Deduplicated template of outcome messages, keyed on a hash of its text (see messages.py).
+    """
+
+    hash = models.CharField(
+        max_length=16,
+        primary_key=True,
+        help_text="Hash of the template text."
+    )
+
+    text = models.TextField(
+        help_text="Template text, with {} placeholders for the parameters of a message."
+    )
+
+    class Meta:
+        db_table = "ifc_message_template"
+        verbose_name = "Message Template"
+        verbose_name_plural = "Message Templates"
+
+    def __str__(self):
+
+        return self.text
+
+
+class OutcomeArchive(models.Model):
+
+    """
+    Archive file holding the outcomes (and model instances) of a Validation Request, moved out of the hot tables (see archival.py).
+    """
+
+    request = models.OneToOneField(
+        to=ValidationRequest,
+        on_delete=models.CASCADE,
+        related_name='outcome_archive',
+        help_text="Validation Request the archived outcomes belong to."
+    )
+
+    file = models.CharField(
+        max_length=255,
+        help_text="Path of the archive file (gzipped NDJSON), relative to OUTCOME_ARCHIVE_ROOT."
+    )
+
+    outcome_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of archived outcomes."
+    )
+
+    instance_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of archived model instances."
+    )
+
+    first_outcome_id = models.BigIntegerField(
+        null=True,
+        help_text="Lowest id of the archived outcomes (to tell which archive may hold an outcome)."
+    )
+
+    last_outcome_id = models.BigIntegerField(
+        null=True,
+        help_text="Highest id of the archived outcomes."
+    )
+
+    archived = models.DateTimeField(
+        null=True,
+        help_text="Timestamp the outcomes were (last) archived."
+    )
+
+    restored = models.DateTimeField(
+        null=True,
+        help_text="Timestamp the outcomes were restored (NULL while archived)."
+    )
+
+    class Meta:
+        db_table = "ifc_outcome_archive"
+        verbose_name = "Outcome Archive"
+        verbose_name_plural = "Outcome Archives"
+
+    def __str__(self):
+
+        return self.file
+
+
+class PurgeJob(models.Model):
+
+    """
+    Background job permanently deleting Validation Requests and everything they own, in batches (see purge.py).
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        RUNNING = 'RUNNING', 'Running'
+        COMPLETED = 'COMPLETED', 'Completed'
+        FAILED = 'FAILED', 'Failed'
+
+    class Reason(models.TextChoices):
+        ADMIN = 'ADMIN', 'Admin'
+        RETENTION = 'RETENTION', 'Retention'
+
+    status = models.CharField(
+        max_length=16,
+        choices=Status.choices,
+        default=Status.PENDING,
+        db_index=True,
+        help_text="Status of the purge job."
+    )
+
+    reason = models.CharField(
+        max_length=16,
+        choices=Reason.choices,
+        default=Reason.ADMIN,
+        help_text="Why the Validation Requests are purged (admin action or retention policy)."
+    )
+
+    request_ids = models.JSONField(
+        default=list,
+        help_text="Ids of the Validation Requests to purge."
+    )
+
+    total = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of Validation Requests to purge."
+    )
+
+    processed = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of Validation Requests purged so far."
+    )
+
+    rows_deleted = models.PositiveBigIntegerField(
+        default=0,
+        help_text="Number of rows deleted so far (requests, tasks, outcomes, instances, ...)."
+    )
+
+    files_deleted = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of files removed so far (uploads, archives)."
+    )
+
+    error = models.TextField(
+        null=True,
+        blank=True,
+        help_text="Error of a failed purge job."
+    )
+
+    created_by = models.ForeignKey(
+        to=User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text="User who scheduled the purge job (NULL for the retention policy)."
+    )
+
+    created = models.DateTimeField(
+        auto_now_add=True,
+        help_text="Timestamp the purge job was scheduled."
+    )
+
+    started = models.DateTimeField(
+        null=True,
+        help_text="Timestamp the purge job started."
+    )
+
+    ended = models.DateTimeField(
+        null=True,
+        help_text="Timestamp the purge job ended."
+    )
+
+    class Meta:
+        db_table = "ifc_purge_job"
+        verbose_name = "Purge Job"
+        verbose_name_plural = "Purge Jobs"
+
+    def __str__(self):
+
+        return f'Purge Job #{self.id} ({self.processed}/{self.total})'
@@ -0,0 +1,358 @@
+import zlib
+import collections
+
+from django.conf import settings
+from django.db.models import Count, F, Sum
+
+from apps.ifc_validation_models.models import Model, ValidationOutcome
+
+from .models import OutcomeSummary, OutcomeAggregate
+from .messages import MESSAGE_PARAMETER_PATTERN, intern_outcomes, is_interning_enabled, render_message
+
+# IMPORTANT
+#
+# Validation Outcomes of the in-process checks (syntax, schema, bSDD) are written in batches, and the
+# per-task outcome summary (task x severity x outcome code counts) is incremented in the same write.
+# Outcomes written by external checks (Gherkin rules) are summarized once, with a single grouped query.
+# The aggregate status of a task is then derived from its summary, without scanning its outcomes.
+#
+# Compaction: a single rule can be violated by hundreds of thousands of instances. Only the first N occurrences
+# per (rule, message template) are stored in full; the others are represented by one aggregated outcome, with
+# their count and (compressed) STEP ids kept in an OutcomeAggregate. Summaries count occurrences, not rows.
+
+OUTCOME_BATCH_SIZE = 1000
+DELETE_BATCH_SIZE = 10000
+
+# placeholders for the parameters of a message (see messages.MESSAGE_PARAMETER_PATTERN)
+MESSAGE_PLACEHOLDERS = {'id': '#<id>', 'value': "'<value>'", 'n': '<n>'}
+
+# highest severity present > aggregate status (same as ValidationTask.determine_aggregate_status)
+AGGREGATE_STATUS = {
+    ValidationOutcome.OutcomeSeverity.ERROR: Model.Status.INVALID,
+    ValidationOutcome.OutcomeSeverity.WARNING: Model.Status.WARNING,
+    ValidationOutcome.OutcomeSeverity.PASSED: Model.Status.VALID,
+    ValidationOutcome.OutcomeSeverity.EXECUTED: Model.Status.VALID,
+    ValidationOutcome.OutcomeSeverity.NOT_APPLICABLE: Model.Status.NOT_APPLICABLE,
+}
+
+
+def get_compaction_limit():
+
+    return getattr(settings, 'OUTCOME_COMPACTION_LIMIT', 0)
+
+
+def get_message_template(message):
+
+    """
+    Returns the template of an observed message, eg. "#12=IfcWall has 3 items" > "#<id>=IfcWall has <n> items".
+    """
+
+    if message is None:
+        return None
+    return MESSAGE_PARAMETER_PATTERN.sub(lambda match: MESSAGE_PLACEHOLDERS[match.lastgroup], str(render_message(message)))
+
+
+def get_compaction_key(severity, outcome_code, feature, observed):
+
+    return severity, outcome_code, feature, get_message_template(observed)
+
+
+def encode_instance_ids(ids):
+
+    """
+    Compresses a list of STEP ids (sorted, delta-encoded, zlib).
+    """
+
+    ids = sorted(set(ids))
+    deltas = [b - a for a, b in zip([0] + ids, ids)]
+    return zlib.compress(','.join(map(str, deltas)).encode())
+
+
+def decode_instance_ids(data):
+
+    """
+    Returns the (sorted) STEP ids compressed by encode_instance_ids.
+    """
+
+    if not data:
+        return []
+    ids, current = [], 0
+    for delta in zlib.decompress(bytes(data)).decode().split(','):
+        current += int(delta)
+        ids.append(current)
+    return ids
+
+
+def set_audit_fields(task, outcomes):
+
+    # bulk_create() does not run save() - audit fields follow the task, as for outcomes created one by one
+    if hasattr(ValidationOutcome, 'created_by_id') and hasattr(task, 'created_by_id'):
+        for outcome in outcomes:
+            outcome.created_by_id = outcome.created_by_id or task.created_by_id
+
+
+def get_aggregated_message(template, count):
+
+    # outcomes without a message (eg. passed or executed Gherkin rules) are only counted
+    if template is None:
+        return f"{count:,} more occurrence(s)"
+    return f"{count:,} more occurrence(s) of: {template}"
+
+
+class OutcomeWriter:
+
+    """
+    Collects Validation Outcomes of a task and writes them in batches (bulk insert + summary increment).
+    Use it within the transaction of the task, as a context manager - pending outcomes and aggregates are written on exit.
+
+    Mandatory Args:
+       task: Validation Task the outcomes belong to
+
+    Optional Args:
+       batch_size: number of outcomes per bulk insert
+       compaction_limit: number of occurrences per (rule, message template) stored in full (0 or None = no compaction)
+       interning: whether long messages are interned (default: OUTCOME_MESSAGE_INTERNING setting, see messages.py)
+    """
+
+    def __init__(self, task, batch_size=OUTCOME_BATCH_SIZE, compaction_limit=None, interning=None):
+
+        self.task = task
+        self.batch_size = batch_size
+        self.compaction_limit = compaction_limit
+        self.interning = is_interning_enabled() if interning is None else interning
+        self.pending = []
+        self.count = 0
+        self.occurrences = collections.Counter()
+        self.compacted = {}
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        if exc_type is None:
+            self.close()
+
+    def add(self, instance=None, stepfile_id=None, **fields):
+
+        """
+        Adds an outcome (same fields as ValidationOutcome, eg. severity, outcome_code, observed).
+
+        Optional Args:
+           instance: Model Instance, or a function returning it - only called if the outcome is stored in full
+           stepfile_id: STEP id of the instance, kept for compacted occurrences
+        """
+
+        if self.compaction_limit:
+            key = get_compaction_key(fields.get('severity'), fields.get('outcome_code'), fields.get('feature'), fields.get('observed'))
+            self.occurrences[key] += 1
+            if self.occurrences[key] > self.compaction_limit:
+                if stepfile_id is None and instance is not None and not callable(instance):
+                    stepfile_id = instance.stepfile_id
+                fields, instance_ids = self.compacted.setdefault(key, (fields, []))
+                if stepfile_id is not None:
+                    instance_ids.append(int(stepfile_id))
+                return
+
+        if callable(instance):
+            instance = instance()
+        self.pending.append(ValidationOutcome(validation_task=self.task, instance=instance, **fields))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+
+        if not self.pending:
+            return
+
+        set_audit_fields(self.task, self.pending)
+        if self.interning:
+            intern_outcomes(self.pending)
+        ValidationOutcome.objects.bulk_create(self.pending, batch_size=self.batch_size)
+        increment_outcome_summary(self.task, collections.Counter((o.severity, o.outcome_code) for o in self.pending))
+
+        self.count += len(self.pending)
+        self.pending = []
+
+    def close(self):
+
+        """
+        Writes pending outcomes and one aggregated outcome per compacted (rule, message template).
+        """
+
+        self.flush()
+
+        aggregates = []
+        for key, (fields, instance_ids) in self.compacted.items():
+            count = self.occurrences[key] - self.compaction_limit
+            aggregates.append((fields, count, instance_ids))
+        self.count += write_aggregates(self.task, aggregates, interning=self.interning)
+        self.compacted = {}
+
+
+def increment_outcome_summary(task, counts):
+
+    """
+    Adds outcome counts to the summary of a task.
+
+    Mandatory Args:
+       task: Validation Task
+       counts: mapping of (severity, outcome_code) > number of outcomes
+    """
+
+    existing = {
+        (summary.severity, summary.outcome_code): summary.id
+        for summary in OutcomeSummary.objects.select_for_update().filter(task=task)
+    }
+
+    new_summaries = []
+    for (severity, outcome_code), count in counts.items():
+        if (severity, outcome_code) in existing:
+            OutcomeSummary.objects.filter(id=existing[(severity, outcome_code)]).update(count=F('count') + count)
+        else:
+            new_summaries.append(OutcomeSummary(task=task, severity=severity, outcome_code=outcome_code, count=count))
+
+    OutcomeSummary.objects.bulk_create(new_summaries)
+
+
+def write_aggregates(task, aggregates, interning=None):
+
+    """
+    Writes aggregated outcomes (and increments the summary by the occurrences they represent).
+
+    Mandatory Args:
+       task: Validation Task
+       aggregates: list of (outcome fields, number of occurrences, STEP ids) tuples
+
+    Optional Args:
+       interning: whether long messages are interned (default: OUTCOME_MESSAGE_INTERNING setting)
+
+    Returns:
+       Number of occurrences written.
+    """
+
+    if not aggregates:
+        return 0
+
+    outcomes = []
+    for fields, count, _ in aggregates:
+        template = get_message_template(fields.get('observed'))
+        outcomes.append(ValidationOutcome(
+            validation_task=task,
+            severity=fields.get('severity'),
+            outcome_code=fields.get('outcome_code'),
+            feature=fields.get('feature'),
+            feature_version=fields.get('feature_version'),
+            observed=get_aggregated_message(template, count)
+        ))
+    set_audit_fields(task, outcomes)
+    if interning is None:
+        interning = is_interning_enabled()
+    if interning:
+        intern_outcomes(outcomes)
+    ValidationOutcome.objects.bulk_create(outcomes)
+
+    OutcomeAggregate.objects.bulk_create([
+        OutcomeAggregate(outcome=outcome, count=count, instance_ids=encode_instance_ids(instance_ids))
+        for outcome, (_, count, instance_ids) in zip(outcomes, aggregates)
+    ])
+
+    counts = collections.Counter()
+    for outcome, (_, count, _) in zip(outcomes, aggregates):
+        counts[(outcome.severity, outcome.outcome_code)] += count
+    increment_outcome_summary(task, counts)
+
+    return sum(counts.values())
+
+
+def compact_outcomes(task, limit=None):
+
+    """
+    Compacts outcomes already written (eg. by the Gherkin rules): keeps the first N occurrences per
+    (rule, message template) and replaces the others by one aggregated outcome. Call before rebuild_outcome_summary().
+
+    Mandatory Args:
+       task: Validation Task
+
+    Optional Args:
+       limit: number of occurrences stored in full (default: OUTCOME_COMPACTION_LIMIT setting, 0 = no compaction)
+
+    Returns:
+       Number of outcomes removed.
+    """
+
+    limit = get_compaction_limit() if limit is None else limit
+    if not limit or ValidationOutcome.objects.filter(validation_task=task).count() <= limit:
+        return 0
+
+    occurrences = collections.Counter()
+    compacted = {}
+    rows = ValidationOutcome.objects.filter(validation_task=task, aggregate__isnull=True).order_by('id').values_list(
+        'id', 'severity', 'outcome_code', 'feature', 'feature_version', 'observed', 'instance__stepfile_id')
+    for id, severity, outcome_code, feature, feature_version, observed, stepfile_id in rows.iterator(chunk_size=OUTCOME_BATCH_SIZE):
+        key = get_compaction_key(severity, outcome_code, feature, observed)
+        occurrences[key] += 1
+        if occurrences[key] > limit:
+            fields = {'severity': severity, 'outcome_code': outcome_code, 'feature': feature, 'feature_version': feature_version, 'observed': observed}
+            _, ids, instance_ids = compacted.setdefault(key, (fields, [], []))
+            ids.append(id)
+            if stepfile_id is not None:
+                instance_ids.append(stepfile_id)
+
+    removed = 0
+    for fields, ids, instance_ids in compacted.values():
+        for i in range(0, len(ids), DELETE_BATCH_SIZE):
+            removed += ValidationOutcome.objects.filter(id__in=ids[i:i + DELETE_BATCH_SIZE]).delete()[0]
+    write_aggregates(task, [(fields, len(ids), instance_ids) for fields, ids, instance_ids in compacted.values()])
+
+    return removed - len(compacted)
+
+
+def rebuild_outcome_summary(task):
+
+    """
+    (Re)builds the summary of a task from its outcomes, with a single grouped query - for outcomes written by external checks.
+    Aggregated outcomes count for the occurrences they represent.
+    """
+
+    counts = collections.Counter()
+    rows = ValidationOutcome.objects.filter(validation_task=task).order_by().values('severity', 'outcome_code').annotate(count=Count('id'))
+    for row in rows:
+        counts[(row['severity'], row['outcome_code'])] += row['count']
+
+    aggregates = OutcomeAggregate.objects.filter(outcome__validation_task=task).order_by().values('outcome__severity', 'outcome__outcome_code').annotate(count=Sum('count'), outcomes=Count('id'))
+    for row in aggregates:
+        counts[(row['outcome__severity'], row['outcome__outcome_code'])] += row['count'] - row['outcomes']
+
+    OutcomeSummary.objects.filter(task=task).delete()
+    OutcomeSummary.objects.bulk_create([
+        OutcomeSummary(task=task, severity=severity, outcome_code=outcome_code, count=count)
+        for (severity, outcome_code), count in counts.items()
+    ])
+
+
+def get_outcome_summary(task):
+
+    """
+    Returns the summary of a task as a mapping of (severity, outcome_code) > number of outcomes.
+    """
+
+    return {
+        (severity, outcome_code): count
+        for severity, outcome_code, count in OutcomeSummary.objects.filter(task=task, count__gt=0).values_list('severity', 'outcome_code', 'count')
+    }
+
+
+def get_aggregate_status(task):
+
+    """
+    Returns the aggregate status of a task (eg. Model.Status.INVALID if there is any error) from its outcome summary.
+    Tasks without a summary (eg. processed before summaries existed, or without outcomes) fall back to scanning their outcomes.
+    """
+
+    severities = {severity for severity, _ in get_outcome_summary(task)}
+    if not severities:
+        return task.determine_aggregate_status()
+
+    return AGGREGATE_STATUS[max(severities)]
@@ -0,0 +1,117 @@
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+
+from .projections import get_projection
+
+# below this (estimated) number of rows, counts are exact
+ESTIMATED_COUNT_THRESHOLD = 100_000
+
+
+class ValidationCursorPagination(CursorPagination):
+
+    """
+    Cursor (keyset) pagination for the list endpoints: no OFFSET and no COUNT(*), so pages stay cheap
+    and stable while new rows are being added. Use ?page_size= to change the number of rows per page.
+    """
+
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    ordering = 'id'
+
+
+class ValidationRequestCursorPagination(ValidationCursorPagination):
+
+    # newest first, same as the dashboard (and its index)
+    ordering = '-created'
+
+
+class ValidationOutcomeSearchCursorPagination(ValidationCursorPagination):
+
+    # most recent outcomes first
+    ordering = '-id'
+
+
+class PaginatedListMixin:
+
+    """
+    Filters, paginates and serializes a queryset in an APIView - the equivalent of a generic ListAPIView.
+    Rows are read as values() and serialized via the (precompiled) projection of serializer_class.
+    """
+
+    pagination_class = ValidationCursorPagination
+    filterset_class = None
+
+    def get_requested_fields(self, request):
+
+        fields = request.query_params.get('fields')
+        return tuple(field.strip() for field in fields.split(',') if field.strip()) if fields else None
+
+    def list_response(self, request, queryset):
+
+        """
+        Returns a paginated Response for a queryset, applying query parameter filters and sparse fieldsets (?fields=a,b).
+
+        Mandatory Args:
+           request: DRF request
+           queryset: all rows visible to the current user
+        """
+
+        filterset = self.filterset_class(request.query_params, queryset=queryset, request=request)
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+
+        plan = get_projection(self.serializer_class).get_plan(self.get_requested_fields(request))
+
+        # the cursor is built from the ordering column, hence it is always read
+        paginator = self.pagination_class()
+        columns = list(dict.fromkeys(plan.columns + [paginator.ordering.lstrip('-')]))
+        page = paginator.paginate_queryset(filterset.qs.values(*columns), request, view=self)
+        return paginator.get_paginated_response(plan.project_all(page))
+
+
+def get_estimated_count(queryset):
+
+    """
+    Returns the number of rows of a queryset as estimated by the PostgreSQL planner - pg_class.reltuples for
+    a whole table, the row estimate of EXPLAIN otherwise. Returns None if no estimate is available (eg. SQLite).
+    """
+
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+            # -1: table was never analyzed
+            return row[0] if row and row[0] >= 0 else None
+
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]['Plan']['Plan Rows']
+
+
+class EstimatedCountPaginator(Paginator):
+
+    """
+    Paginator for admin change lists of large tables (outcomes, instances): an exact COUNT(*) reads the whole
+    table (or all matching rows), so large counts are estimated instead. Counts below ESTIMATED_COUNT_THRESHOLD are exact.
+    """
+
+    @cached_property
+    def count(self):
+
+        estimate = get_estimated_count(self.object_list)
+        if estimate is None or estimate < ESTIMATED_COUNT_THRESHOLD:
+            return super().count
+        return estimate
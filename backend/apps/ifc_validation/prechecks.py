@@ -0,0 +1,110 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from apps.ifc_validation_models.models import ValidationTask, ValidationOutcome, Model
+
+from .ingestion import STEP_MAGIC, HEADER_SNIFF_LIMIT
+from .ingestion import IngestedUploadedFile, parse_step_header, get_stored_header
+
+logger = logging.getLogger(__name__)
+
+# schemas ifcopenshell can open; override via settings.SUPPORTED_FILE_SCHEMAS
+DEFAULT_SUPPORTED_FILE_SCHEMAS = [
+    'IFC2X3', 'IFC4', 'IFC4X1', 'IFC4X2',
+    'IFC4X3_RC1', 'IFC4X3_RC2', 'IFC4X3_RC3', 'IFC4X3_RC4',
+    'IFC4X3', 'IFC4X3_TC1', 'IFC4X3_ADD1', 'IFC4X3_ADD2'
+]
+
+# statuses of the validation stages (same as shown on the dashboard and in reports)
+STAGE_STATUS_FIELDS = [
+    'status_syntax', 'status_schema', 'status_prereq', 'status_bsdd', 'status_mvd', 'status_ids',
+    'status_ia', 'status_ip', 'status_industry_practices',
+]
+
+
+def sniff_uploaded_file(uploaded_file):
+
+    """
+    Returns the STEP header of an uploaded file, reading at most the first few KB of it.
+    """
+
+    if isinstance(uploaded_file, IngestedUploadedFile):
+        return uploaded_file.header
+
+    uploaded_file.seek(0)
+    data = uploaded_file.read(HEADER_SNIFF_LIMIT)
+    uploaded_file.seek(0)
+    return parse_step_header(data)
+
+
+def precheck_upload(uploaded_file):
+
+    """
+    Checks whether an upload is worth queueing: it must be a STEP file with a supported FILE_SCHEMA.
+    Files with an incomplete or malformed header are left to the full syntax check.
+
+    Returns:
+       None if the file can be queued, otherwise a (task type, outcome code, reason) tuple.
+    """
+
+    return precheck_header(sniff_uploaded_file(uploaded_file))
+
+
+def precheck_request(request):
+
+    """
+    Same checks as precheck_upload() for a queued Validation Request, using the STEP header stored at ingestion.
+
+    Returns:
+       None if the file passes or was not ingested (left to the full checks), otherwise a (task type, outcome code, reason) tuple.
+    """
+
+    header = get_stored_header(request)
+    return precheck_header(header) if header is not None else None
+
+
+def precheck_header(header):
+
+    supported_schemas = getattr(settings, 'SUPPORTED_FILE_SCHEMAS', DEFAULT_SUPPORTED_FILE_SCHEMAS)
+
+    if not header['is_step']:
+        reason = f"File is not an IFC file; it does not start with '{STEP_MAGIC}'."
+        return (ValidationTask.Type.SYNTAX, ValidationOutcome.ValidationOutcomeCode.SYNTAX_ERROR, reason)
+
+    if header['schema'] is not None and header['schema'] not in supported_schemas:
+        reason = f"Unsupported schema: {header['schema'].lower()}"
+        return (ValidationTask.Type.SCHEMA, ValidationOutcome.ValidationOutcomeCode.SCHEMA_ERROR, reason)
+
+    return None
+
+
+@transaction.atomic
+def reject_validation_request(request, task_type, outcome_code, reason):
+
+    """
+    Completes a Validation Request without queueing the validation workflow,
+    recording the rejection as a single failed Validation Task + Outcome.
+    The stage that rejected the file is invalid, the stages that did not run are not applicable.
+    """
+
+    task = ValidationTask.objects.create(request=request, type=task_type)
+    task.mark_as_initiated()
+    task.outcomes.create(
+        severity=ValidationOutcome.OutcomeSeverity.ERROR,
+        outcome_code=outcome_code,
+        observed=reason
+    )
+    task.mark_as_completed(reason)
+
+    from .tasks import get_or_create_ifc_model  # tasks.py runs the same prechecks
+    model = get_or_create_ifc_model(request.id)
+    status_field = 'status_syntax' if task_type == ValidationTask.Type.SYNTAX else 'status_schema'
+    for field in STAGE_STATUS_FIELDS:
+        setattr(model, field, Model.Status.INVALID if field == status_field else Model.Status.NOT_APPLICABLE)
+    model.save(update_fields=STAGE_STATUS_FIELDS)
+
+    request.model = model
+    request.mark_as_completed(reason)
+    logger.info(f"Validation Request id: {request.id} file_name: {request.file_name} rejected before queueing - {reason}")
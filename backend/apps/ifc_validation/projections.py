@@ -0,0 +1,205 @@
+import functools
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, FieldDoesNotExist
+from django.db import models
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+from rest_framework import ISO_8601
+from rest_framework.exceptions import ValidationError
+from rest_framework.relations import HyperlinkedIdentityField, HyperlinkedRelatedField, ManyRelatedField
+
+from apps.ifc_validation_models.models import IdObfuscator
+
+from .serializers import MessageField
+from .messages import load_templates
+
+# IMPORTANT
+#
+# Read-only projections of the API serializers for high-volume (list) endpoints.
+# The field list of a serializer is introspected once per class and compiled into a plan of
+# (name, column, converter) tuples, which is then applied to plain values() rows - no model instances,
+# no per-instance field resolution. The output has the same keys and values as the serializer, except for:
+#   - hyperlinked related objects (eg. 'created_by'), which are projected as public ids (the API routes are
+#     unnamed, so there is no URL to link to)
+#   - the hyperlinked identity ('url') and many-to-many fields, which are not exposed by the list endpoints
+
+# serializer field types that need conversion (eg. Decimal -> string); other values are returned as is
+CONVERTED_FIELD_TYPES = (
+    serializers.DateField,
+    serializers.TimeField,
+    serializers.DurationField,
+    serializers.DecimalField,
+    serializers.UUIDField,
+)
+
+
+def datetime_converter(serializer_field):
+
+    """
+    Same output as DateTimeField.to_representation(), with the format and timezone resolved
+    once per page instead of once per value.
+    """
+
+    def bind():
+        output_format = getattr(serializer_field, 'format', api_settings.DATETIME_FORMAT)
+        if output_format is None or output_format.lower() != ISO_8601 or not settings.USE_TZ:
+            return serializer_field.to_representation
+
+        field_timezone = serializer_field.timezone if hasattr(serializer_field, 'timezone') else serializer_field.default_timezone()
+
+        def convert(value):
+            if not value:
+                return None
+            if isinstance(value, str) or timezone.is_naive(value):
+                return serializer_field.to_representation(value)
+            value = value.astimezone(field_timezone).isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+        return convert
+
+    return bind
+
+
+def message_converter(serializer_field):
+
+    # interned messages are rendered with their templates loaded per batch of rows, see Plan.project_all()
+    bind = static(serializer_field.to_representation)
+    bind.interned = True
+    return bind
+
+
+def file_url_converter(serializer_field, model_field):
+
+    use_url = getattr(serializer_field, 'use_url', True)
+    storage = model_field.storage
+
+    def convert(name):
+        if not name:
+            return None
+        return storage.url(name) if use_url else name
+
+    return static(convert)
+
+
+def public_id_converter(model):
+
+    def convert(id):
+        return None if id is None else IdObfuscator.to_public_id(id, override_cls=model)
+
+    return static(convert)
+
+
+def static(convert):
+
+    return lambda: convert
+
+
+class Plan:
+
+    """
+    Compiled (name, column, converter factory) tuples for a set of fields.
+    Converter factories are called once per batch of rows, eg. to resolve the current timezone.
+    """
+
+    def __init__(self, entries):
+
+        self.entries = entries
+        self.columns = list(dict.fromkeys(column for _, column, _ in entries))
+        self.message_columns = [column for _, column, bind in entries if getattr(bind, 'interned', False)]
+
+    def project_all(self, rows):
+
+        if self.message_columns:
+            rows = list(rows)
+            load_templates(row[column] for row in rows for column in self.message_columns)
+
+        entries = [(name, column, None if bind is None else bind()) for name, column, bind in self.entries]
+        return [{name: (row[column] if convert is None else convert(row[column])) for name, column, convert in entries} for row in rows]
+
+    def project(self, row):
+
+        return self.project_all([row])[0]
+
+
+class Projection:
+
+    """
+    values()-based, read-only equivalent of a (model) serializer class.
+
+    Mandatory Args:
+       serializer_class: ModelSerializer subclass to mirror
+    """
+
+    def __init__(self, serializer_class):
+
+        self.serializer_class = serializer_class
+        self.model = serializer_class.Meta.model
+        self.entries = {}
+
+        for name, field in serializer_class().fields.items():
+            if isinstance(field, (HyperlinkedIdentityField, ManyRelatedField)):
+                continue
+            self.entries[name] = self.compile_field(name, field)
+
+        self.plan = Plan(list(self.entries.values()))
+
+    def compile_field(self, name, field):
+
+        # fields of related objects (eg. source='validation_task.request.file_name') are read via joins (validation_task__request__file_name)
+        *path, source = field.source.split('.')
+        model = self.model
+        for part in path:
+            model = model._meta.get_field(part).related_model
+        prefix = ''.join(f'{part}__' for part in path)
+        meta = model._meta
+
+        # public id of the object itself or of a related object (eg. 'public_id', 'validation_task_public_id')
+        if source == 'public_id':
+            return name, prefix + meta.pk.attname, public_id_converter(model)
+        if source.endswith('_public_id'):
+            related_field = meta.get_field(source[:-len('_public_id')])
+            return name, prefix + related_field.attname, public_id_converter(related_field.related_model)
+
+        try:
+            model_field = meta.get_field(source)
+        except FieldDoesNotExist:
+            raise ImproperlyConfigured(f"Field '{name}' of {self.serializer_class.__name__} can not be projected onto a column.")
+
+        column = prefix + model_field.attname
+        if isinstance(field, HyperlinkedRelatedField):
+            return name, column, public_id_converter(model_field.related_model)
+        if isinstance(model_field, models.FileField):
+            return name, column, file_url_converter(field, model_field)
+        if isinstance(field, serializers.DateTimeField):
+            return name, column, datetime_converter(field)
+        if isinstance(field, MessageField):
+            return name, column, message_converter(field)
+        if isinstance(field, CONVERTED_FIELD_TYPES):
+            return name, column, static(field.to_representation)
+        return name, column, None
+
+    @functools.lru_cache(maxsize=64)
+    def get_plan(self, fields=None):
+
+        """
+        Returns the compiled plan for all fields, or a subset of them (sparse fieldsets).
+
+        Optional Args:
+           fields: tuple of field names
+        """
+
+        if not fields:
+            return self.plan
+
+        unknown_fields = set(fields) - set(self.entries)
+        if unknown_fields:
+            raise ValidationError({'fields': f"Unknown field(s): {', '.join(sorted(unknown_fields))}."})
+        return Plan([entry for name, entry in self.entries.items() if name in fields])
+
+
+@functools.lru_cache(maxsize=None)
+def get_projection(serializer_class):
+
+    return Projection(serializer_class)
@@ -0,0 +1,244 @@
+import os
+import logging
+import datetime
+import functools
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Exists, OuterRef, F, Count
+from django.utils import timezone
+
+from apps.ifc_validation_models.models import ValidationRequest, Model
+
+from .models import OutcomeArchive, PurgeJob
+from .archival import get_archive_root
+
+from apps.ifc_validation_bff.dashboard import invalidate_dashboard, adjust_dashboard_count
+from apps.ifc_validation_bff.snapshots import invalidate_report_snapshots
+
+logger = logging.getLogger(__name__)
+
+# IMPORTANT
+#
+# Permanently deleting Validation Requests: Model.delete() collects and deletes every related row one model at a time
+# (and sends signals for each of them), which does not scale to hundreds of requests with millions of outcomes.
+# Purge jobs instead delete a batch of requests per transaction, with set-based DELETEs in foreign key order (children
+# first) derived from the model relations, each bounded to DELETE_BATCH_SIZE rows. Files (uploads, outcome archives,
+# report snapshots) are removed after each batch is committed.
+
+PURGE_BATCH_SIZE = 50  # Validation Requests per transaction
+DELETE_BATCH_SIZE = 5000  # rows per DELETE statement
+
+
+def get_purge_retention_days():
+
+    return getattr(settings, 'PURGE_RETENTION_DAYS', 0)
+
+
+def get_delete_plan(model, queryset, parents=()):
+
+    """
+    Returns the steps to delete the rows of a queryset and all rows referring to them (on_delete=CASCADE), in foreign key order.
+
+    Mandatory Args:
+       model: model of the rows to delete
+       queryset: rows to delete
+
+    Returns:
+       List of (model, queryset, field name) tuples - field name is set for rows to update (on_delete=SET_NULL) rather than delete.
+    """
+
+    plan = []
+    for relation in model._meta.related_objects:
+        if not (relation.one_to_many or relation.one_to_one) or relation.related_model in parents:
+            continue
+        children = relation.related_model._base_manager.filter(**{f'{relation.field.name}__in': queryset})
+        if relation.on_delete is models.CASCADE:
+            plan += get_delete_plan(relation.related_model, children, parents + (model,))
+        elif relation.on_delete is models.SET_NULL:
+            plan.append((relation.related_model, children, relation.field.name))
+        # other rules (eg. PROTECT, DO_NOTHING) are left to the database
+
+    plan.append((model, queryset, None))
+    return plan
+
+
+def delete_rows(model, queryset):
+
+    manager = model._base_manager
+    count = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:DELETE_BATCH_SIZE])
+        if not ids:
+            return count
+        # raw DELETE: no signals, no collection of related rows (already deleted by the previous steps)
+        count += manager.filter(pk__in=ids)._raw_delete(manager.db)
+
+
+def execute_plan(plan):
+
+    count = 0
+    for model, queryset, field_name in plan:
+        if field_name:
+            queryset.update(**{field_name: None})
+        else:
+            count += delete_rows(model, queryset)
+    return count
+
+
+def remove_purged_files(job_id, uploads, archives, request_ids):
+
+    """
+    Removes the files of purged Validation Requests: uploaded files, outcome archives and report snapshots.
+
+    Returns:
+       Number of files removed.
+    """
+
+    storage = ValidationRequest._meta.get_field('file').storage
+    count = 0
+    for name in uploads:
+        if storage.exists(name):
+            storage.delete(name)
+            count += 1
+    for path in archives:
+        try:
+            os.remove(os.path.join(get_archive_root(), path))
+            count += 1
+        except FileNotFoundError:
+            pass
+    invalidate_report_snapshots(*request_ids)
+
+    if job_id is not None:
+        PurgeJob.objects.filter(pk=job_id).update(files_deleted=F('files_deleted') + count)
+    logger.info(f"Removed {count:,} files of {len(request_ids):,} purged Validation Request(s)")
+    return count
+
+
+def purge_requests(request_ids, job_id=None, remove_files=remove_purged_files):
+
+    """
+    Permanently deletes Validation Requests with their tasks, outcomes and related rows, and their models (with
+    instances) when no other request refers to them. Must run in a transaction; files are removed after commit.
+
+    Mandatory Args:
+       request_ids: ids of the Validation Requests
+
+    Optional Args:
+       job_id: id of the Purge Job (for progress)
+       remove_files: callable removing the files of the purged requests (eg. a Celery task)
+
+    Returns:
+       Number of rows deleted.
+    """
+
+    requests = ValidationRequest._base_manager.filter(id__in=request_ids)
+    rows = list(requests.values_list('file', 'model_id', 'model__file', 'created_by_id'))
+    if not rows:
+        return 0
+
+    model_ids = {model_id for _, model_id, _, _ in rows if model_id is not None}
+    uploads = {name for file, _, model_file, _ in rows for name in (file, model_file) if name}
+    archives = list(OutcomeArchive.objects.filter(request_id__in=request_ids).values_list('file', flat=True))
+
+    count = execute_plan(get_delete_plan(ValidationRequest, requests))
+
+    # models (and their instances) of the purged requests, unless still used by other requests
+    orphans = Model._base_manager.filter(id__in=model_ids).exclude(Exists(ValidationRequest._base_manager.filter(model=OuterRef('pk'))))
+    count += execute_plan(get_delete_plan(Model, Model._base_manager.filter(id__in=list(orphans.values_list('id', flat=True)))))
+
+    # uploaded files can be shared (eg. between a request and its model)
+    uploads -= set(ValidationRequest._base_manager.filter(file__in=uploads).values_list('file', flat=True))
+    uploads -= set(Model._base_manager.filter(file__in=uploads).values_list('file', flat=True))
+
+    transaction.on_commit(functools.partial(remove_files, job_id, sorted(uploads), archives, list(request_ids)))
+    for user_id in {user_id for _, _, _, user_id in rows if user_id is not None}:
+        transaction.on_commit(functools.partial(invalidate_dashboard, user_id))
+
+    return count
+
+
+def schedule_purge(request_ids, reason=PurgeJob.Reason.ADMIN, user=None):
+
+    """
+    Creates a Purge Job and hides its Validation Requests (marked as deleted) until they are purged.
+
+    Returns:
+       The Purge Job.
+    """
+
+    request_ids = sorted(set(request_ids))
+    job = PurgeJob.objects.create(request_ids=request_ids, total=len(request_ids), reason=reason, created_by=user)
+
+    # set-based, so dashboards are invalidated (and counts adjusted) explicitly
+    requests = ValidationRequest._base_manager.filter(id__in=request_ids, deleted=False)
+    counts = requests.exclude(created_by_id=None).order_by().values('created_by_id').annotate(count=Count('id')).values_list('created_by_id', 'count')
+    for user_id, count in counts:
+        transaction.on_commit(functools.partial(invalidate_dashboard, user_id))
+        transaction.on_commit(functools.partial(adjust_dashboard_count, user_id, -count))
+    # bulk update, bypasses auto_now - 'updated' is when the request was (soft) deleted, see get_expired_requests
+    requests.update(deleted=True, updated=timezone.now())
+
+    return job
+
+
+def run_purge_job(job, remove_files=remove_purged_files):
+
+    """
+    Purges the Validation Requests of a Purge Job in batches of PURGE_BATCH_SIZE, one transaction each, recording
+    progress after every batch. A failed (or interrupted) job resumes after the last purged batch when run again.
+
+    Mandatory Args:
+       job: Purge Job
+
+    Optional Args:
+       remove_files: callable removing the files of purged requests after commit, see purge_requests
+
+    Returns:
+       Number of rows deleted.
+    """
+
+    job.status = PurgeJob.Status.RUNNING
+    job.started = job.started or timezone.now()
+    job.error = None
+    job.save(update_fields=['status', 'started', 'error'])
+
+    count = 0
+    try:
+        for i in range(job.processed, len(job.request_ids), PURGE_BATCH_SIZE):
+            batch = job.request_ids[i:i + PURGE_BATCH_SIZE]
+            with transaction.atomic():
+                deleted = purge_requests(batch, job.id, remove_files)
+                PurgeJob.objects.filter(pk=job.pk).update(processed=F('processed') + len(batch), rows_deleted=F('rows_deleted') + deleted)
+            count += deleted
+            logger.info(f"Purge Job #{job.id}: purged {i + len(batch):,} of {job.total:,} Validation Request(s) ({deleted:,} rows)")
+
+    except Exception as err:
+        PurgeJob.objects.filter(pk=job.pk).update(status=PurgeJob.Status.FAILED, error=str(err), ended=timezone.now())
+        raise
+
+    PurgeJob.objects.filter(pk=job.pk).update(status=PurgeJob.Status.COMPLETED, ended=timezone.now())
+    job.refresh_from_db()
+    return count
+
+
+def get_expired_requests(now=None):
+
+    """
+    Returns the ids of soft-deleted Validation Requests which were deleted more than PURGE_RETENTION_DAYS ago,
+    except those already listed in a pending or running Purge Job.
+    """
+
+    now = now or timezone.now()
+    retention_days = get_purge_retention_days()
+    if not retention_days:
+        return []
+
+    scheduled = PurgeJob.objects.filter(status__in=[PurgeJob.Status.PENDING, PurgeJob.Status.RUNNING]).values_list('request_ids', flat=True)
+    scheduled_ids = {id for request_ids in scheduled for id in request_ids}
+
+    request_ids = ValidationRequest._base_manager.filter(
+        deleted=True,
+        updated__lt=now - datetime.timedelta(days=retention_days)
+    ).order_by('id').values_list('id', flat=True)
+    return [id for id in request_ids if id not in scheduled_ids]
@@ -0,0 +1,95 @@
+from django.db.models import Q
+from django.db.models.fields.json import KeyTransform
+from django.utils.text import smart_split, unescape_string_literal
+
+from apps.ifc_validation_models.models import ValidationTask, Model
+
+from .models import MessageTemplate
+from .messages import TEMPLATE_KEY, PARAMETERS_KEY
+
+# IMPORTANT
+#
+# Text search over Validation Outcomes (admin and search API): every term matches the rule (feature) or the
+# observed/expected messages, case-insensitively. Each branch is served by its own index (see migration 0010):
+#   - feature, observed and expected: trigram (GIN) indexes on UPPER(<column>::text)
+#   - interned messages (see messages.py): the text of their templates is matched first (trigram index on the
+#     template text), then outcomes referring to these templates (index on the template hash of observed/expected)
+# Hence a term matches either the fixed text or a parameter of an interned message, not a mix of both - and never
+# the payload itself (template hash, keys).
+# File names (admin only) are matched on the request/model table first (trigram index, see migration 0011), then the
+# outcomes/instances of the matching rows are selected through their (btree) foreign key indexes.
+
+
+def get_search_terms(search_term):
+
+    """
+    Splits a search into its terms, same as the admin: words, or phrases in quotes.
+    """
+
+    terms = []
+    for term in smart_split(search_term or ''):
+        if term.startswith(('"', "'")) and term[0] == term[-1]:
+            term = unescape_string_literal(term)
+        if term:
+            terms.append(term)
+    return terms
+
+
+def match_message(field, term):
+
+    # plain messages as stored, interned messages on their parameters only; the match on the whole value is kept for
+    # both, as it is served by the trigram index (the parameters are part of the payload text)
+    interned = Q(**{f'{field}__has_key': TEMPLATE_KEY})
+    return Q(**{f'{field}__icontains': term}) & (~interned | Q(**{f'{field}_parameters__icontains': term}))
+
+
+def search_outcomes(queryset, search_term, file_name=False):
+
+    """
+    Filters Validation Outcomes on all terms of a search.
+
+    Mandatory Args:
+       queryset: Validation Outcomes
+       search_term: words or phrases (in quotes), all of which must match
+
+    Optional Args:
+       file_name: whether terms also match the file name of the request
+
+    Returns:
+       Filtered queryset.
+    """
+
+    terms = get_search_terms(search_term)
+    if not terms:
+        return queryset
+
+    queryset = queryset.alias(
+        observed_template=KeyTransform(TEMPLATE_KEY, 'observed'),
+        expected_template=KeyTransform(TEMPLATE_KEY, 'expected'),
+        observed_parameters=KeyTransform(PARAMETERS_KEY, 'observed'),
+        expected_parameters=KeyTransform(PARAMETERS_KEY, 'expected')
+    )
+    for term in terms:
+        templates = list(MessageTemplate.objects.filter(text__icontains=term).values_list('hash', flat=True))
+        condition = (
+            Q(feature__icontains=term) | match_message('observed', term) | match_message('expected', term)
+            | Q(observed_template__in=templates) | Q(expected_template__in=templates)
+        )
+        if file_name:
+            condition |= Q(validation_task_id__in=ValidationTask.objects.filter(request__file_name__icontains=term).values('id'))
+        queryset = queryset.filter(condition)
+    return queryset
+
+
+def search_instances(queryset, search_term):
+
+    """
+    Filters Model Instances on all terms of a search: STEP id (eg. 12 or #12), IFC type or file name of the model.
+    """
+
+    for term in get_search_terms(search_term):
+        condition = Q(ifc_type__icontains=term) | Q(model_id__in=Model.objects.filter(file_name__icontains=term).values('id'))
+        if term.lstrip('#').isdigit():
+            condition |= Q(stepfile_id=int(term.lstrip('#')))
+        queryset = queryset.filter(condition)
+    return queryset
@@ -1,12 +1,28 @@
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
 
 from apps.ifc_validation_models.models import ValidationRequest
 from apps.ifc_validation_models.models import ValidationTask
 from apps.ifc_validation_models.models import ValidationOutcome
 
+from .messages import render_message
+
 
 class BaseSerializer(serializers.HyperlinkedModelSerializer):
 
+    def __init__(self, *args, fields=None, **kwargs):
+
+        # sparse fieldsets - only serialize the requested fields (eg. ?fields=public_id,status)
+
+        super(BaseSerializer, self).__init__(*args, **kwargs)
+
+        if fields:
+            unknown_fields = set(fields) - set(self.fields)
+            if unknown_fields:
+                raise ValidationError({'fields': f"Unknown field(s): {', '.join(sorted(unknown_fields))}."})
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
     def get_field_names(self, declared_fields, info):
 
         # Django does not support both 'fields' and 'exclude'
@@ -22,6 +38,14 @@ class BaseSerializer(serializers.HyperlinkedModelSerializer):
         return expanded_fields
         
 
+class MessageField(serializers.JSONField):
+
+    # interned outcome messages (see messages.py) are rendered to their full text
+    def to_representation(self, value):
+
+        return super().to_representation(render_message(value))
+
+
 class ValidationRequestSerializer(BaseSerializer):
     
     class Meta:
@@ -42,8 +66,21 @@ class ValidationTaskSerializer(BaseSerializer):
 
 class ValidationOutcomeSerializer(BaseSerializer):
 
+    expected = MessageField(required=False, allow_null=True)
+    observed = MessageField(required=False, allow_null=True)
+
     class Meta:
         model = ValidationOutcome
         fields = '__all__'
         show = ["public_id", "instance_public_id", "validation_task_public_id"]
         hide = ["id", "instance", "validation_task"]
+
+
+class ValidationOutcomeSearchSerializer(ValidationOutcomeSerializer):
+
+    # where an outcome comes from (search results span all users)
+    request_public_id = serializers.CharField(source='validation_task.request_public_id', read_only=True)
+    task_type = serializers.CharField(source='validation_task.type', read_only=True)
+    file_name = serializers.CharField(source='validation_task.request.file_name', read_only=True)
+    created_by = serializers.CharField(source='validation_task.request.created_by.username', read_only=True, allow_null=True)
+    authoring_tool = serializers.CharField(source='validation_task.request.model.produced_by.name', read_only=True, allow_null=True)
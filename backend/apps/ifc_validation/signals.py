@@ -0,0 +1,24 @@
+import os
+import functools
+
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import OutcomeArchive
+from .archival import get_archive_root
+
+
+def remove_archive_file(path):
+
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@receiver(post_delete, sender=OutcomeArchive)
+def on_outcome_archive_deleted(sender, instance, **kwargs):
+
+    # eg. hard-deleted Validation Requests (after commit, the delete may still be rolled back)
+    transaction.on_commit(functools.partial(remove_archive_file, os.path.join(get_archive_root(), instance.file)))
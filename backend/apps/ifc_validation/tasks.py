@@ -8,6 +8,7 @@ import ifcopenshell
 
 from celery import shared_task, chain, chord, group
 from celery.utils.log import get_task_logger
+from django.conf import settings
 from django.db import transaction
 
 from core.utils import log_execution
@@ -17,6 +18,16 @@ from apps.ifc_validation_models.decorators import requires_django_user_context
 from apps.ifc_validation_models.models import *
 
 from .email_tasks import *
+from .outcomes import OutcomeWriter, get_compaction_limit, compact_outcomes, rebuild_outcome_summary, get_aggregate_status
+from .messages import intern_queryset, is_interning_enabled
+from .prechecks import precheck_request
+from .archival import archive_outcomes, get_archive_limit, restore_request
+from .purge import run_purge_job, schedule_purge, remove_purged_files, get_expired_requests
+from .models import PurgeJob
+from .bsdd import build_snapshot, get_snapshot_path
+
+from apps.ifc_validation_bff.tasks import materialize_reports_task
+from apps.ifc_validation_bff.snapshots import invalidate_report_snapshots
 
 logger = get_task_logger(__name__)
 
@@ -72,6 +83,7 @@ def on_workflow_started(self, *args, **kwargs):
     reason = f"args={args} kwargs={kwargs}"
     request = ValidationRequest.objects.get(pk=id)
     request.mark_as_initiated(reason)
+    invalidate_report_snapshots(id)
 
     # queue sending emails
     nbr_of_tasks = request.tasks.count()
@@ -94,6 +106,9 @@ def on_workflow_completed(self, *args, **kwargs):
     request = ValidationRequest.objects.get(pk=id)
     request.mark_as_completed(reason)
 
+    # queue rendering of report snapshots
+    materialize_reports_task.delay(id=id, file_name=request.file_name)
+
     # queue sending email
     send_completion_email_task.delay(id=id, file_name=request.file_name)
 
@@ -132,7 +147,7 @@ def get_or_create_ifc_model(request_id):
         model, _ = Model.objects.get_or_create(
             file_name=request.file_name,
             file=request.file,
-            size=request.file.size,
+            size=request.size,  # uploads are moved into place on commit (see ingestion.py)
             uploaded_by=request.created_by
         )
         request.model = model
@@ -238,6 +253,23 @@ def syntax_validation_subtask(self, prev_result, id, file_name, *args, **kwargs)
     task = ValidationTask.objects.create(request=request, type=ValidationTask.Type.SYNTAX)
     task.mark_as_initiated()
 
+    # not a STEP file according to the header stored at upload - no need to run the parser
+    rejection = precheck_request(request)
+    if rejection is not None and rejection[0] == ValidationTask.Type.SYNTAX:
+        _, outcome_code, reason = rejection
+        with transaction.atomic():
+            model = get_or_create_ifc_model(id)
+            with OutcomeWriter(task) as outcomes:
+                outcomes.add(
+                    severity=ValidationOutcome.OutcomeSeverity.ERROR,
+                    outcome_code=outcome_code,
+                    observed=reason
+                )
+            model.status_syntax = Model.Status.INVALID
+            model.save(update_fields=['status_syntax'])
+            task.mark_as_completed(reason)
+            return {'is_valid': False, 'reason': reason}
+
     # check syntax
     try:
 
@@ -262,30 +294,31 @@ def syntax_validation_subtask(self, prev_result, id, file_name, *args, **kwargs)
             model = get_or_create_ifc_model(id)
 
             # update Model info
-            if success:
-                model.status_syntax = Model.Status.VALID
-                task.outcomes.create(
-                    severity=ValidationOutcome.OutcomeSeverity.PASSED,
-                    outcome_code=ValidationOutcome.ValidationOutcomeCode.PASSED,
-                    observed=output if output != '' else None
-                )
+            with OutcomeWriter(task) as outcomes:
+                if success:
+                    model.status_syntax = Model.Status.VALID
+                    outcomes.add(
+                        severity=ValidationOutcome.OutcomeSeverity.PASSED,
+                        outcome_code=ValidationOutcome.ValidationOutcomeCode.PASSED,
+                        observed=output if output != '' else None
+                    )
 
-            elif len(error_output) != 0:
-                model.status_syntax = Model.Status.INVALID
-                task.outcomes.create(
-                    severity=ValidationOutcome.OutcomeSeverity.ERROR,
-                    outcome_code=ValidationOutcome.ValidationOutcomeCode.SYNTAX_ERROR,
-                    observed=list(filter(None, proc.stderr.split("\n")))[-1] # last line of traceback
-                )
+                elif len(error_output) != 0:
+                    model.status_syntax = Model.Status.INVALID
+                    outcomes.add(
+                        severity=ValidationOutcome.OutcomeSeverity.ERROR,
+                        outcome_code=ValidationOutcome.ValidationOutcomeCode.SYNTAX_ERROR,
+                        observed=list(filter(None, proc.stderr.split("\n")))[-1] # last line of traceback
+                    )
 
-            else:
-                messages = json.loads(output)
-                model.status_syntax = Model.Status.INVALID
-                task.outcomes.create(
-                    severity=ValidationOutcome.OutcomeSeverity.ERROR,
-                    outcome_code=ValidationOutcome.ValidationOutcomeCode.SYNTAX_ERROR,
-                    observed=messages['message'] if 'message' in messages else None
-                )
+                else:
+                    messages = json.loads(output)
+                    model.status_syntax = Model.Status.INVALID
+                    outcomes.add(
+                        severity=ValidationOutcome.OutcomeSeverity.ERROR,
+                        outcome_code=ValidationOutcome.ValidationOutcomeCode.SYNTAX_ERROR,
+                        observed=messages['message'] if 'message' in messages else None
+                    )
 
             model.save(update_fields=['status_syntax'])
 
@@ -330,6 +363,13 @@ def parse_info_subtask(self, prev_result, id, file_name, *args, **kwargs):
 
         task.mark_as_initiated()
 
+        # unsupported schema according to the header stored at upload - no need to open the file
+        rejection = precheck_request(request)
+        if rejection is not None:
+            reason = rejection[2]
+            task.mark_as_completed(reason)
+            return {'is_valid': False, 'reason': reason}
+
         # retrieve IFC info
         try:
             task.set_process_details(None, f"(module) ifcopenshell.open() for file '{file_path}')")
@@ -356,7 +396,6 @@ def parse_info_subtask(self, prev_result, id, file_name, *args, **kwargs):
                     ifc_file_time_stamp = f'{ifc_file.header.file_name.time_stamp}'
                 except RuntimeError:
                     ifc_file_time_stamp = None
-                    model.date = None
                 if ifc_file_time_stamp:
                     try:
                         logger.debug(f'Timestamp within file = {ifc_file_time_stamp}')
@@ -502,8 +541,12 @@ def prerequisites_subtask(self, prev_result, id, file_name, *args, **kwargs):
             # create or retrieve Model info
             model = get_or_create_ifc_model(id)
 
-            # update Model info
-            agg_status = task.determine_aggregate_status()
+            # update Model info (outcomes were written by the Gherkin rules - compact, intern and summarize them once)
+            compact_outcomes(task)
+            if is_interning_enabled():
+                intern_queryset(task.outcomes.all())
+            rebuild_outcome_summary(task)
+            agg_status = get_aggregate_status(task)
             model.status_prereq = agg_status
             model.save(update_fields=['status_prereq'])
 
@@ -589,36 +632,47 @@ def schema_validation_subtask(self, prev_result, id, file_name, *args, **kwargs)
             # create or retrieve Model info
             model = get_or_create_ifc_model(id)
 
-            # update Model and Validation Outcomes
-            if valid:
-                model.status_schema = Model.Status.VALID
-                task.outcomes.create(
-                    severity=ValidationOutcome.OutcomeSeverity.PASSED,
-                    outcome_code=ValidationOutcome.ValidationOutcomeCode.PASSED,
-                    observed=None
-                )
-            else:
-                for line in output:
-                    message = json.loads(line)
-                    model.status_schema = Model.Status.INVALID
-                    outcome = task.outcomes.create(
-                        severity=ValidationOutcome.OutcomeSeverity.ERROR,
-                        outcome_code=ValidationOutcome.ValidationOutcomeCode.SCHEMA_ERROR,
-                        observed=message['message'],
-                        feature=json.dumps({
-                            'type': message['type'] if 'type' in message else None,
-                            'attribute': message['attribute'] if 'attribute' in message else None
-                        }),
+            # update Model and Validation Outcomes (repeated errors beyond the compaction limit are aggregated)
+            with OutcomeWriter(task, compaction_limit=get_compaction_limit()) as outcomes:
+                if valid:
+                    model.status_schema = Model.Status.VALID
+                    outcomes.add(
+                        severity=ValidationOutcome.OutcomeSeverity.PASSED,
+                        outcome_code=ValidationOutcome.ValidationOutcomeCode.PASSED,
+                        observed=None
                     )
-
-                    if 'instance' in message and message['instance'] is not None and 'id' in message['instance'] and 'type' in message['instance']:
+                else:
+                    @functools.lru_cache(maxsize=None)
+                    def get_instance(stepfile_id, ifc_type):
+                        # many errors usually point to the same instance(s)
                         instance, _ = model.instances.get_or_create(
-                            stepfile_id=message['instance']['id'],
-                            ifc_type=message['instance']['type'],
+                            stepfile_id=stepfile_id,
+                            ifc_type=ifc_type,
                             model=model
                         )
-                        outcome.instance = instance
-                        outcome.save()
+                        return instance
+
+                    for line in output:
+                        message = json.loads(line)
+                        model.status_schema = Model.Status.INVALID
+
+                        # instances are only looked up (or created) for outcomes that are stored in full
+                        instance, stepfile_id = None, None
+                        if 'instance' in message and message['instance'] is not None and 'id' in message['instance'] and 'type' in message['instance']:
+                            stepfile_id = message['instance']['id']
+                            instance = functools.partial(get_instance, message['instance']['id'], message['instance']['type'])
+
+                        outcomes.add(
+                            severity=ValidationOutcome.OutcomeSeverity.ERROR,
+                            outcome_code=ValidationOutcome.ValidationOutcomeCode.SCHEMA_ERROR,
+                            observed=message['message'],
+                            feature=json.dumps({
+                                'type': message['type'] if 'type' in message else None,
+                                'attribute': message['attribute'] if 'attribute' in message else None
+                            }),
+                            instance=instance,
+                            stepfile_id=stepfile_id
+                        )
 
             model.save(update_fields=['status_schema'])
 
@@ -674,7 +728,7 @@ def bsdd_validation_subtask(self, prev_result, id, file_name, *args, **kwargs):
                 stderr=subprocess.PIPE,
                 universal_newlines=True,
                 timeout=TASK_TIMEOUT_LIMIT,
-                env=os.environ.copy()
+                env={**os.environ, 'BSDD_MODE': getattr(settings, 'BSDD_MODE', 'api'), 'BSDD_SNAPSHOT_PATH': get_snapshot_path()}
             )
             task.set_process_details(None, check_program)  # run() has no pid...
 
@@ -702,31 +756,35 @@ def bsdd_validation_subtask(self, prev_result, id, file_name, *args, **kwargs):
 
             # update Validation Outcomes
             json_output = json.loads(raw_output)
-            for message in json_output['messages']:
-
-                outcome = task.outcomes.create(
-                    severity=[c[0] for c in ValidationOutcome.OutcomeSeverity.choices if c[1] == (message['severity'])][0],
-                    outcome_code=[c[0] for c in ValidationOutcome.ValidationOutcomeCode.choices if c[1] == (message['outcome'])][0],
-                    observed=message['message'],
-                    feature=json.dumps({
-                        'rule': message['rule'] if 'rule' in message else None,
-                        'category': message['category'] if 'category' in message else None,
-                        'dictionary': message['dictionary'] if 'dictionary' in message else None,
-                        'class': message['class'] if 'class' in message else None,
-                        'instance_id': message['instance_id'] if 'instance_id' in message else None
-                    })                    
-                )
-
-                if 'instance_id' in message and message['instance_id'] is not None:
-                    instance, _ = model.instances.get_or_create(
-                        stepfile_id = message['instance_id'],
-                        model=model
+            instances = {}
+            with OutcomeWriter(task) as outcomes:
+                for message in json_output['messages']:
+
+                    instance = None
+                    if 'instance_id' in message and message['instance_id'] is not None:
+                        if message['instance_id'] not in instances:
+                            instances[message['instance_id']], _ = model.instances.get_or_create(
+                                stepfile_id = message['instance_id'],
+                                model=model
+                            )
+                        instance = instances[message['instance_id']]
+
+                    outcomes.add(
+                        severity=[c[0] for c in ValidationOutcome.OutcomeSeverity.choices if c[1] == (message['severity'])][0],
+                        outcome_code=[c[0] for c in ValidationOutcome.ValidationOutcomeCode.choices if c[1] == (message['outcome'])][0],
+                        observed=message['message'],
+                        feature=json.dumps({
+                            'rule': message['rule'] if 'rule' in message else None,
+                            'category': message['category'] if 'category' in message else None,
+                            'dictionary': message['dictionary'] if 'dictionary' in message else None,
+                            'class': message['class'] if 'class' in message else None,
+                            'instance_id': message['instance_id'] if 'instance_id' in message else None
+                        }),
+                        instance=instance
                     )
-                    outcome.instance = instance
-                    outcome.save()
-            
-            # update Model info
-            agg_status = task.determine_aggregate_status()
+
+            # update Model info (from the outcome summary)
+            agg_status = get_aggregate_status(task)
             model.status_bsdd = agg_status
             model.save(update_fields=['status_bsdd'])
 
@@ -802,8 +860,12 @@ def normative_rules_ia_validation_subtask(self, prev_result, id, file_name, *arg
             # create or retrieve Model info
             model = get_or_create_ifc_model(id)
 
-            # update Model info
-            agg_status = task.determine_aggregate_status()
+            # update Model info (outcomes were written by the Gherkin rules - compact, intern and summarize them once)
+            compact_outcomes(task)
+            if is_interning_enabled():
+                intern_queryset(task.outcomes.all())
+            rebuild_outcome_summary(task)
+            agg_status = get_aggregate_status(task)
             logger.debug(f'Aggregate status for {self.__qualname__}: {agg_status}')
             model.status_ia = agg_status
             model.save(update_fields=['status_ia'])
@@ -879,8 +941,12 @@ def normative_rules_ip_validation_subtask(self, prev_result, id, file_name, *arg
             # create or retrieve Model info
             model = get_or_create_ifc_model(id)
 
-            # update Model info
-            agg_status = task.determine_aggregate_status()
+            # update Model info (outcomes were written by the Gherkin rules - compact, intern and summarize them once)
+            compact_outcomes(task)
+            if is_interning_enabled():
+                intern_queryset(task.outcomes.all())
+            rebuild_outcome_summary(task)
+            agg_status = get_aggregate_status(task)
             model.status_ip = agg_status
             model.save(update_fields=['status_ip'])
 
@@ -955,8 +1021,12 @@ def industry_practices_subtask(self, prev_result, id, file_name, *args, **kwargs
             # create or retrieve Model info
             model = get_or_create_ifc_model(id)
 
-            # update Model info
-            agg_status = task.determine_aggregate_status()
+            # update Model info (outcomes were written by the Gherkin rules - compact, intern and summarize them once)
+            compact_outcomes(task)
+            if is_interning_enabled():
+                intern_queryset(task.outcomes.all())
+            rebuild_outcome_summary(task)
+            agg_status = get_aggregate_status(task)
             model.status_industry_practices = agg_status
             model.save(update_fields=['status_industry_practices'])
 
@@ -970,3 +1040,71 @@ def industry_practices_subtask(self, prev_result, id, file_name, *args, **kwargs
         reason = f'Skipped as prev_result = {prev_result}.'
         task.mark_as_skipped(reason)
         return {'is_valid': None, 'reason': reason}
+
+
+@shared_task(bind=True)
+@log_execution
+@requires_django_user_context
+def archive_outcomes_task(self, limit=None, *args, **kwargs):
+
+    # scheduled (see CELERY_BEAT_SCHEDULE) - moves outcomes older than the retention window to archive files,
+    # at most OUTCOME_ARCHIVE_LIMIT requests per run (a backlog is worked off over several nights)
+    count = archive_outcomes(limit=limit or get_archive_limit())
+    logger.info(f'Archived outcomes of {count:,} Validation Request(s)')
+    return count
+
+
+@shared_task(bind=True)
+@log_execution
+@requires_django_user_context
+def restore_request_task(self, request_id, *args, **kwargs):
+
+    # scheduled by the outcome API endpoints for archived requests (see archival.schedule_restore)
+    request = ValidationRequest.objects.get(pk=request_id)
+    return restore_request(request)
+
+
+@shared_task(bind=True)
+@log_execution
+def remove_purged_files_task(self, job_id, uploads, archives, request_ids, *args, **kwargs):
+
+    return remove_purged_files(job_id, uploads, archives, request_ids)
+
+
+@shared_task(bind=True)
+@log_execution
+@requires_django_user_context
+def purge_requests_task(self, job_id, *args, **kwargs):
+
+    # files are removed by a separate task once each batch is committed
+    job = PurgeJob.objects.get(pk=job_id)
+    count = run_purge_job(job, remove_files=lambda *args: remove_purged_files_task.delay(*args))
+    logger.info(f'Purge Job #{job.id}: deleted {count:,} rows of {job.total:,} Validation Request(s)')
+    return count
+
+
+@shared_task(bind=True)
+@log_execution
+@requires_django_user_context
+def purge_expired_requests_task(self, *args, **kwargs):
+
+    # scheduled (see CELERY_BEAT_SCHEDULE) - purges requests soft-deleted longer than the retention window
+    request_ids = get_expired_requests()
+    if not request_ids:
+        return 0
+
+    job = schedule_purge(request_ids, reason=PurgeJob.Reason.RETENTION)
+    return run_purge_job(job, remove_files=lambda *args: remove_purged_files_task.delay(*args))
+
+
+@shared_task(bind=True)
+@log_execution
+def refresh_bsdd_snapshot_task(self, *args, **kwargs):
+
+    # scheduled (see CELERY_BEAT_SCHEDULE) - only used with BSDD_MODE = 'snapshot'
+    if getattr(settings, 'BSDD_MODE', 'api') != 'snapshot':
+        return None
+
+    counts = build_snapshot()
+    logger.info(f"bSDD snapshot refreshed: {', '.join(f'{count:,} {kind}' for kind, count in counts.items())}")
+    return counts
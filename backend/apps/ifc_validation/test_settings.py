@@ -6,7 +6,9 @@ load_dotenv()
 INSTALLED_APPS = [
     "django.contrib.auth",
     "django.contrib.contenttypes",
-    "apps.ifc_validation_models"
+    "apps.ifc_validation_models",
+    "apps.ifc_validation",
+    "apps.ifc_validation_bff"
 ]
 
 DB_SQLITE = "sqlite"
@@ -0,0 +1,63 @@
+import json
+
+from django.contrib.auth.models import User
+
+from apps.ifc_validation_models.models import ValidationRequest, ValidationTask, ValidationOutcome, Model
+from apps.ifc_validation_models.decorators import requires_django_user_context
+
+from .outcomes import OutcomeWriter
+
+
+class ValidationRequestTestMixin:
+
+    """
+    Test data shared by the test cases of stored outcomes (archival, purge, admin): users, and Validation Requests
+    of a model with one schema error per instance.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+
+        """
+        Creates a SYSTEM user, a user and an admin user in the (in-memory) test database.
+        Runs once for the whole test case.
+        """
+
+        super().setUpTestData()
+        user = User.objects.create(id=1, username='SYSTEM', is_active=True)
+        user.save()
+        User.objects.create(id=2, username='user@localhost', email='user@localhost', is_active=True)
+        User.objects.create_superuser(id=3, username='admin', email='admin@localhost', password='admin')
+
+    @requires_django_user_context
+    def create_request(self, number_of_outcomes, file_name='valid_file.ifc', size=280, model=None, compaction_limit=None, **fields):
+
+        """
+        Creates a Validation Request of the user, with a schema task and one schema error (and instance) per outcome.
+
+        Mandatory Args:
+           number_of_outcomes: number of schema errors
+
+        Optional Args:
+           file_name, size: of the request (and of its model)
+           model: model of the request (default: a new one)
+           compaction_limit: passed to the OutcomeWriter (default: no compaction)
+           fields: other fields of the request (eg. status)
+        """
+
+        request = ValidationRequest.objects.create(file_name=file_name, file=file_name, size=size, created_by_id=2, **fields)
+        request.model = model or Model.objects.create(file_name=file_name, file=file_name, size=size, uploaded_by_id=2)
+        request.save()
+
+        task = ValidationTask.objects.create(request=request, type=ValidationTask.Type.SCHEMA)
+        with OutcomeWriter(task, compaction_limit=compaction_limit) as outcomes:
+            for i in range(number_of_outcomes):
+                outcomes.add(
+                    severity=ValidationOutcome.OutcomeSeverity.ERROR,
+                    outcome_code=ValidationOutcome.ValidationOutcomeCode.SCHEMA_ERROR,
+                    observed=f"Attribute 'Name' of #{i + 1}=IfcWall('wall {i}') has {i} items, expected 1",
+                    feature=json.dumps({'type': 'schema', 'attribute': 'IfcWall.Name'}),
+                    instance=request.model.instances.create(stepfile_id=i + 1, ifc_type='IfcWall', model=request.model)
+                )
+
+        return request
@@ -0,0 +1,99 @@
+from unittest import mock
+
+from django.test import TestCase, RequestFactory, override_settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.contrib.auth.models import User
+
+from apps.ifc_validation_models.models import *
+
+from .messages import clear_templates
+from .pagination import EstimatedCountPaginator, ESTIMATED_COUNT_THRESHOLD
+from .test_utils import ValidationRequestTestMixin
+
+from apps.ifc_validation_bff.views_legacy import get_current_user
+
+
+@override_settings(OUTCOME_MESSAGE_INTERNING=True)
+class AdminTestCase(ValidationRequestTestMixin, TestCase):
+
+    def setUp(self):
+
+        cache.clear()
+        self.client.force_login(User.objects.get(id=3))
+
+    def get_changelist(self, model, **params):
+
+        # templates are cached per process
+        clear_templates()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/admin/ifc_validation_models/{model}/', params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_changelists_without_n_plus_1(self):
+
+        self.create_request(2)
+        _, outcome_queries = self.get_changelist('validationoutcome')
+        _, instance_queries = self.get_changelist('modelinstance')
+
+        self.create_request(10)
+        self.assertEqual(self.get_changelist('validationoutcome')[1], outcome_queries)
+        self.assertEqual(self.get_changelist('modelinstance')[1], instance_queries)
+
+    def test_search_interned_messages(self):
+
+        self.create_request(3)
+
+        # template text, parameter and rule (feature)
+        for term, count in [('items, expected', 3), ("'wall 1'", 1), ('"items, expected" IfcWall.Name', 3), ('IfcSlab', 0)]:
+            response, _ = self.get_changelist('validationoutcome', q=term)
+            self.assertEqual(response.context['cl'].result_count, count, term)
+
+    def test_search_file_names_and_step_ids(self):
+
+        self.create_request(3)
+        ValidationRequest.objects.create(file_name='other_file.ifc', file='other_file.ifc', size=280, created_by_id=2)
+
+        for term, count in [('valid_file', 3), ('other_file', 0), ('"valid_file.ifc" IfcWall.Name', 3)]:
+            response, _ = self.get_changelist('validationoutcome', q=term)
+            self.assertEqual(response.context['cl'].result_count, count, term)
+
+        for term, count in [('2', 1), ('#3', 1), ('valid_file', 3), ('IfcWall', 3), ('valid_file 1', 1), ('IfcSlab', 0)]:
+            response, _ = self.get_changelist('modelinstance', q=term)
+            self.assertEqual(response.context['cl'].result_count, count, term)
+
+    def test_estimated_count_paginator(self):
+
+        self.create_request(3)
+        queryset = ValidationOutcome.objects.order_by('id')
+
+        # no estimate (SQLite) or small tables: exact
+        self.assertEqual(EstimatedCountPaginator(queryset, 100).count, 3)
+        with mock.patch('apps.ifc_validation.pagination.get_estimated_count', return_value=ESTIMATED_COUNT_THRESHOLD - 1):
+            self.assertEqual(EstimatedCountPaginator(queryset, 100).count, 3)
+
+        with mock.patch('apps.ifc_validation.pagination.get_estimated_count', return_value=50_000_000):
+            paginator = EstimatedCountPaginator(queryset, 100)
+            self.assertEqual(paginator.count, 50_000_000)
+            self.assertEqual(paginator.num_pages, 500_000)
+            self.assertEqual(len(paginator.page(1)), 3)
+
+    def test_activation_changes_invalidate_cached_user(self):
+
+        http_request = RequestFactory().get('/bff/api/me')
+        http_request.session = {'user': {'email': 'user@localhost'}}
+        self.assertTrue(get_current_user(http_request).is_active)
+        self.assertEqual(http_request.session['user_id'], 2)
+
+        # cached: no queries for subsequent requests of the session
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(get_current_user(http_request).is_active)
+        self.assertEqual(len(queries), 0)
+
+        for action, is_active in [('deactivate', False), ('activate', True)]:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/admin/auth/user/', {'action': action, '_selected_action': [2]})
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(get_current_user(http_request).is_active, is_active)
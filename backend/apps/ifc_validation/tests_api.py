@@ -0,0 +1,295 @@
+import json
+from urllib.parse import urlsplit, parse_qsl
+
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.ifc_validation_models.models import *
+from apps.ifc_validation_models.decorators import requires_django_user_context
+
+from .views import ValidationRequestDetailAPIView, ValidationRequestListAPIView, ValidationTaskListAPIView, ValidationOutcomeListAPIView
+from .views import ValidationOutcomeSearchAPIView
+from .serializers import ValidationRequestSerializer, ValidationTaskSerializer, ValidationOutcomeSerializer, ValidationOutcomeSearchSerializer
+from .outcomes import OutcomeWriter
+from .messages import TEMPLATE_KEY, PARAMETERS_KEY
+from .projections import get_projection
+from .conditional import get_validators
+
+
+class APITestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        """
+        Creates a SYSTEM user and an API user in the (in-memory) test database.
+        Runs once for the whole test case.
+        """
+
+        user = User.objects.create(id=1, username='SYSTEM', is_active=True)
+        user.save()
+        User.objects.create(id=2, username='user@localhost', email='user@localhost', is_active=True)
+
+    def get(self, view, params=None, headers=None, **kwargs):
+
+        request = APIRequestFactory().get('/api/', params or {}, headers=headers)
+        force_authenticate(request, user=self.user)
+        response = view.as_view()(request, **kwargs)
+        return response.render() if hasattr(response, 'render') else response
+
+    def get_all_pages(self, view, params):
+
+        results, pages = [], 0
+        response = self.get(view, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            results += response.data['results']
+            pages += 1
+            if not response.data['next']:
+                return results, pages
+            response = self.get(view, dict(parse_qsl(urlsplit(response.data['next']).query)))
+
+
+class ListAPITestCase(APITestCase):
+
+    def setUp(self):
+
+        self.user = User.objects.get(id=2)
+
+    @requires_django_user_context
+    def create_request(self, number_of_outcomes):
+
+        request = ValidationRequest.objects.create(
+            file_name='valid_file.ifc',
+            file='valid_file.ifc',
+            size=280,
+            created_by_id=2
+        )
+        syntax_task = ValidationTask.objects.create(request=request, type=ValidationTask.Type.SYNTAX)
+        schema_task = ValidationTask.objects.create(request=request, type=ValidationTask.Type.SCHEMA)
+        for i in range(number_of_outcomes):
+            syntax_task.outcomes.create(
+                severity=ValidationOutcome.OutcomeSeverity.ERROR if i % 2 else ValidationOutcome.OutcomeSeverity.PASSED,
+                outcome_code=ValidationOutcome.ValidationOutcomeCode.SYNTAX_ERROR if i % 2 else ValidationOutcome.ValidationOutcomeCode.PASSED
+            )
+        schema_task.outcomes.create(severity=ValidationOutcome.OutcomeSeverity.WARNING, outcome_code=ValidationOutcome.ValidationOutcomeCode.WARNING)
+
+        return request
+
+    def test_outcomes_are_paginated_with_a_cursor(self):
+
+        self.create_request(9)
+
+        results, pages = self.get_all_pages(ValidationOutcomeListAPIView, {'page_size': 4})
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(len(results), 10)
+        self.assertEqual(len({result['public_id'] for result in results}), 10)
+
+    def test_requests_are_returned_newest_first(self):
+
+        requests = [self.create_request(0) for _ in range(3)]
+
+        results, _ = self.get_all_pages(ValidationRequestListAPIView, {'page_size': 2})
+
+        self.assertEqual([result['public_id'] for result in results], [request.public_id for request in reversed(requests)])
+
+    def test_outcome_filters(self):
+
+        request = self.create_request(6)
+        self.create_request(6)
+
+        def count(**params):
+            return len(self.get_all_pages(ValidationOutcomeListAPIView, params)[0])
+
+        self.assertEqual(count(), 14)
+        self.assertEqual(count(request=request.public_id), 7)
+        self.assertEqual(count(request=request.public_id, severity='ERROR'), 3)
+        self.assertEqual(count(request=request.public_id, severity='4,3'), 4)
+        self.assertEqual(count(request=request.public_id, task_type=ValidationTask.Type.SCHEMA), 1)
+        self.assertEqual(count(outcome_code=ValidationOutcome.ValidationOutcomeCode.PASSED), 6)
+        self.assertEqual(count(created_after='2000-01-01T00:00:00Z'), 14)
+        self.assertEqual(count(created_before='2000-01-01T00:00:00Z'), 0)
+        self.assertEqual(count(severity='UNKNOWN'), 0)
+
+    def test_task_filters(self):
+
+        request = self.create_request(0)
+        self.create_request(0)
+
+        results, _ = self.get_all_pages(ValidationTaskListAPIView, {'request': request.public_id, 'type': 'SYNTAX'})
+
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['request_public_id'], request.public_id)
+
+    def test_invalid_date_range_is_rejected(self):
+
+        response = self.get(ValidationOutcomeListAPIView, {'created_after': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_sparse_fieldsets(self):
+
+        self.create_request(1)
+
+        response = self.get(ValidationOutcomeListAPIView, {'fields': 'public_id,severity'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['results'][0]), {'public_id', 'severity'})
+
+        response = self.get(ValidationOutcomeListAPIView, {'fields': 'public_id,unknown'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_other_users_rows_are_not_listed(self):
+
+        self.create_request(1)
+        self.user = User.objects.get(id=1)
+
+        response = self.get(ValidationOutcomeListAPIView)
+        self.assertEqual(response.data['results'], [])
+
+    def test_projections_match_serializers(self):
+
+        request = self.create_request(2)
+        ValidationOutcome.objects.filter(validation_task__request=request).update(observed={'value': 'IfcWall', 'oid': 5})
+
+        for serializer_class, queryset in [
+                (ValidationRequestSerializer, ValidationRequest.objects.all()),
+                (ValidationTaskSerializer, ValidationTask.objects.all()),
+                (ValidationOutcomeSerializer, ValidationOutcome.objects.all()),
+                (ValidationOutcomeSearchSerializer, ValidationOutcome.objects.all())]:
+
+            # hyperlinked related objects (no named routes to link to) are projected as public ids, see below
+            projection = get_projection(serializer_class)
+            fields = tuple(name for name in projection.entries if name not in ('created_by', 'updated_by'))
+            expected = serializer_class(queryset.order_by('id'), many=True, fields=fields).data
+            projected = projection.get_plan(fields).project_all(queryset.order_by('id').values(*projection.get_plan(fields).columns))
+
+            self.assertNotIn('url', projection.entries)
+            self.assertEqual(json.loads(json.dumps(projected)), json.loads(json.dumps(expected)))
+
+    def test_projections_include_related_objects_as_public_ids(self):
+
+        request = self.create_request(0)
+        request.updated_by_id = 1
+        request.save()
+
+        projection = get_projection(ValidationRequestSerializer)
+        row = projection.plan.project(ValidationRequest.objects.filter(id=request.id).values(*projection.plan.columns).get())
+
+        self.assertEqual(row['created_by'], IdObfuscator.to_public_id(2, override_cls=User))
+        self.assertEqual(row['updated_by'], IdObfuscator.to_public_id(1, override_cls=User))
+        self.assertEqual(row['model_public_id'], request.model_public_id)
+
+    def test_unchanged_request_is_not_modified(self):
+
+        request = self.create_request(0)
+        validators = get_validators(ValidationRequest.objects.filter(id=request.id))
+
+        response = self.get(ValidationRequestDetailAPIView, headers={'If-None-Match': validators.etag}, id=request.id)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], validators.etag)
+
+        # any change to the request > new ETag
+        request.progress = 10
+        request.save()
+        self.assertNotEqual(get_validators(ValidationRequest.objects.filter(id=request.id)).etag, validators.etag)
+
+        # other users' requests are never 'not modified'
+        self.user = User.objects.get(id=1)
+        response = self.get(ValidationRequestDetailAPIView, headers={'If-None-Match': validators.etag}, id=request.id)
+        self.assertEqual(response.status_code, 404)
+
+
+class SearchAPITestCase(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        """
+        Creates a SYSTEM user, two users and a staff user in the (in-memory) test database.
+        Runs once for the whole test case.
+        """
+
+        super().setUpTestData()
+        User.objects.create(id=3, username='other@localhost', email='other@localhost', is_active=True)
+        User.objects.create(id=4, username='support@localhost', email='support@localhost', is_active=True, is_staff=True)
+
+    def setUp(self):
+
+        self.user = User.objects.get(id=4)
+
+    @requires_django_user_context
+    def create_outcomes(self, user_id, tool_name, messages):
+
+        request = ValidationRequest.objects.create(file_name=f'{tool_name}.ifc', file=f'{tool_name}.ifc', size=280, created_by_id=user_id)
+        request.model = Model.objects.create(file_name=request.file_name, file=request.file, size=request.size, uploaded_by_id=user_id)
+        request.model.produced_by = AuthoringTool.objects.create(name=tool_name)
+        request.model.save()
+        request.save()
+
+        task = ValidationTask.objects.create(request=request, type=ValidationTask.Type.NORMATIVE_IA)
+        with OutcomeWriter(task) as outcomes:
+            for feature, severity, observed in messages:
+                outcomes.add(
+                    severity=severity,
+                    outcome_code=ValidationOutcome.ValidationOutcomeCode.NOT_APPLICABLE,
+                    feature=feature,
+                    feature_version=1,
+                    observed=observed
+                )
+        return request
+
+    def search(self, **params):
+
+        return self.get_all_pages(ValidationOutcomeSearchAPIView, params)[0]
+
+    @override_settings(OUTCOME_MESSAGE_INTERNING=True)
+    def test_search_does_not_match_interned_payloads(self):
+
+        error = ValidationOutcome.OutcomeSeverity.ERROR
+        self.create_outcomes(2, 'Tool A', [('ALB001 - Alignment in spatial structure', error, "The alignment 'A' is not contained in the spatial structure of the project")])
+        self.create_outcomes(2, 'Tool B', [('ALB001 - Alignment in spatial structure', error, "The alignment 'B' is not contained in the spatial structure of the project, but in #42")])
+
+        # a number of the template hash (and the payload keys) is not part of the message
+        payload = ValidationOutcome.objects.get(validation_task__request__file_name='Tool A.ifc').observed
+        digit = next(c for c in payload[TEMPLATE_KEY] if c.isdigit())
+        self.assertEqual([result['file_name'] for result in self.search(q=digit)], ['Tool B.ifc'] if digit in '42' else [])
+        self.assertEqual(len(self.search(q=TEMPLATE_KEY)), 0)
+        self.assertEqual(len(self.search(q=PARAMETERS_KEY)), 0)
+
+        # parameters and template text do match
+        self.assertEqual([result['file_name'] for result in self.search(q='#42')], ['Tool B.ifc'])
+        self.assertEqual(len(self.search(q='"\'A\'"')), 1)
+        self.assertEqual(len(self.search(q='spatial structure of the project')), 2)
+
+    def test_search_is_admin_only(self):
+
+        self.user = User.objects.get(id=2)
+        self.assertEqual(self.get(ValidationOutcomeSearchAPIView, {'q': 'IfcWall'}).status_code, 403)
+
+    def test_search_across_users(self):
+
+        error, passed = ValidationOutcome.OutcomeSeverity.ERROR, ValidationOutcome.OutcomeSeverity.PASSED
+        message = 'The alignment #{} is not contained in the spatial structure of the project, but in #{}'
+        first = self.create_outcomes(2, 'Tool A', [('ALB001 - Alignment in spatial structure', error, message.format(10, 20)), ('GEM001 - Closed shell', passed, None)])
+        second = self.create_outcomes(3, 'Tool B', [('ALB001 - Alignment in spatial structure', error, message.format(11, 21))])
+
+        results = self.search(q='ALB001 "spatial structure of the project"')
+        self.assertEqual([result['request_public_id'] for result in results], [second.public_id, first.public_id])
+        self.assertEqual(results[1]['file_name'], 'Tool A.ifc')
+        self.assertEqual(results[1]['created_by'], 'user@localhost')
+        self.assertEqual(results[1]['authoring_tool'], 'Tool A')
+        self.assertEqual(results[1]['task_type'], ValidationTask.Type.NORMATIVE_IA)
+        self.assertEqual(results[1]['observed'], message.format(10, 20))
+
+        self.assertEqual(len(self.search(q='#11')), 1)
+        self.assertEqual(len(self.search(feature='alb001')), 2)
+        self.assertEqual(len(self.search(feature='ALB001', authoring_tool_name='tool b')), 1)
+        self.assertEqual(len(self.search(authoring_tool=first.model.produced_by.public_id)), 2)
+        self.assertEqual(len(self.search(severity='PASSED', feature_version='1,2')), 1)
+        self.assertEqual(len(self.search(q='ALB001', created_before='2000-01-01T00:00:00Z')), 0)
+        self.assertEqual(len(self.search(q='IfcSlab')), 0)
+
+        # deleted requests are not searched
+        ValidationRequest.objects.filter(id=second.id).update(deleted=True)
+        self.assertEqual(len(self.search(q='ALB001')), 1)
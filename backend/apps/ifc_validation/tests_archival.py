@@ -0,0 +1,220 @@
+import os
+import json
+import datetime
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, RequestFactory, override_settings
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.ifc_validation_models.models import *
+from apps.ifc_validation_models.decorators import requires_django_user_context
+from apps.ifc_validation_bff.views_legacy import report
+
+from .models import OutcomeArchive, OutcomeAggregate
+from .outcomes import get_aggregate_status
+from .messages import render_message
+from .archival import get_archivable_requests, archive_outcomes, archive_request, restore_request, is_archived, get_archive_root
+from .tasks import archive_outcomes_task
+from .views import ValidationOutcomeListAPIView, ValidationOutcomeDetailAPIView
+from .test_utils import ValidationRequestTestMixin
+
+
+class ArchivalTestCase(ValidationRequestTestMixin, TestCase):
+
+    def setUp(self):
+
+        cache.clear()
+        self.archive_root = tempfile.TemporaryDirectory()
+        self.overrides = override_settings(OUTCOME_ARCHIVE_ROOT=self.archive_root.name, OUTCOME_RETENTION_DAYS=30, OUTCOME_RESTORED_DAYS=7)
+        self.overrides.enable()
+
+    def tearDown(self):
+
+        self.overrides.disable()
+        self.archive_root.cleanup()
+
+    def create_request(self, number_of_outcomes, days_old=60):
+
+        # completed, with the last occurrence compacted (an outcome without instance)
+        request = super().create_request(number_of_outcomes, compaction_limit=number_of_outcomes - 1, status=ValidationRequest.Status.COMPLETED)
+        ValidationRequest.objects.filter(id=request.id).update(created=timezone.now() - datetime.timedelta(days=days_old))
+        request.refresh_from_db()
+        return request
+
+    def get_outcomes(self, request):
+
+        return list(ValidationOutcome.objects.filter(validation_task__request=request).order_by('id').values())
+
+    def test_archivable_requests(self):
+
+        old = self.create_request(3)
+        self.create_request(3, days_old=1)
+
+        self.assertEqual(list(get_archivable_requests()), [old])
+        with override_settings(OUTCOME_RETENTION_DAYS=0):
+            self.assertEqual(list(get_archivable_requests()), [])
+
+    def test_scheduled_archival_is_limited_per_run(self):
+
+        for _ in range(3):
+            self.create_request(2)
+
+        with override_settings(OUTCOME_ARCHIVE_LIMIT=2):
+            self.assertEqual(archive_outcomes_task(), 2)
+            self.assertEqual(archive_outcomes_task(), 1)
+
+    def test_archive_and_restore(self):
+
+        request = self.create_request(5)
+        outcomes = self.get_outcomes(request)
+        instances = list(ModelInstance.objects.filter(model=request.model).order_by('id').values())
+        task = request.tasks.get()
+
+        self.assertEqual(archive_outcomes(), 1)
+
+        archive = OutcomeArchive.objects.get(request=request)
+        self.assertTrue(os.path.exists(os.path.join(get_archive_root(), archive.file)))
+        self.assertEqual((archive.outcome_count, archive.instance_count), (5, 5))
+        self.assertTrue(is_archived(request))
+        self.assertEqual(self.get_outcomes(request), [])
+        self.assertFalse(ModelInstance.objects.filter(model=request.model).exists())
+        # statuses are derived from the (kept) outcome summary
+        self.assertEqual(get_aggregate_status(task), Model.Status.INVALID)
+        # nothing left to archive
+        self.assertEqual(archive_outcomes(), 0)
+
+        self.assertEqual(restore_request(request), 5)
+
+        # same ids, dates and (interned/aggregated) messages
+        self.assertEqual(self.get_outcomes(request), outcomes)
+        self.assertEqual(list(ModelInstance.objects.filter(model=request.model).order_by('id').values()), instances)
+        aggregate = OutcomeAggregate.objects.get(outcome__validation_task__request=request)
+        self.assertIn('1 more occurrence(s)', render_message(aggregate.outcome.observed))
+        self.assertFalse(is_archived(request))
+        self.assertEqual(restore_request(request), 0)
+
+        # archived again once not restored for a while
+        self.assertEqual(archive_outcomes(), 0)
+        self.assertEqual(archive_outcomes(now=timezone.now() + datetime.timedelta(days=8)), 1)
+        self.assertTrue(is_archived(request))
+
+    @requires_django_user_context
+    def create_shared_request(self, other):
+
+        # a second request of the same model, with outcomes referring to the same instances
+        request = ValidationRequest.objects.create(file_name=other.file_name, file=other.file, size=other.size, created_by_id=2, model=other.model)
+        request.status = ValidationRequest.Status.COMPLETED
+        request.save()
+        ValidationRequest.objects.filter(id=request.id).update(created=other.created)
+        request.refresh_from_db()
+
+        task = ValidationTask.objects.create(request=request, type=ValidationTask.Type.SCHEMA)
+        for instance in other.model.instances.order_by('id'):
+            task.outcomes.create(
+                severity=ValidationOutcome.OutcomeSeverity.ERROR,
+                outcome_code=ValidationOutcome.ValidationOutcomeCode.SCHEMA_ERROR,
+                observed='Attribute value missing',
+                instance=instance
+            )
+        return request
+
+    def test_restore_with_instances_shared_by_other_requests(self):
+
+        first = self.create_request(3)
+        second = self.create_shared_request(first)
+        outcomes = self.get_outcomes(first)
+
+        # instances are still referred to by the second request, then archived with it
+        archive_request(first)
+        self.assertEqual(OutcomeArchive.objects.get(request=first).instance_count, 0)
+        archive_request(second)
+        self.assertEqual(OutcomeArchive.objects.get(request=second).instance_count, 3)
+        self.assertFalse(ModelInstance.objects.filter(model=first.model).exists())
+
+        # instances come from the archive of the second request (2 outcomes in full + 1 aggregated, without instance)
+        self.assertEqual(restore_request(first), 3)
+        self.assertEqual(self.get_outcomes(first), outcomes)
+        self.assertEqual(ModelInstance.objects.filter(model=first.model).count(), 2)
+
+        # ... and are not restored twice
+        self.assertEqual(restore_request(second), 3)
+        self.assertEqual(ModelInstance.objects.filter(model=first.model).count(), 3)
+        self.assertEqual(ValidationOutcome.objects.filter(validation_task__request=second, instance__isnull=False).count(), 3)
+
+    def test_restore_without_instances_that_no_longer_exist(self):
+
+        first = self.create_request(3)
+        second = self.create_shared_request(first)
+        archive_request(first)
+        archive_request(second)
+        OutcomeArchive.objects.filter(request=second).delete()
+
+        self.assertEqual(restore_request(first), 3)
+        self.assertFalse(ValidationOutcome.objects.filter(validation_task__request=first, instance__isnull=False).exists())
+
+    def test_report_restores_archived_outcomes(self):
+
+        request = self.create_request(3)
+        ValidationRequest.objects.filter(id=request.id).update(status=ValidationRequest.Status.FAILED)
+        archive_request(request)
+
+        http_request = RequestFactory().get(f'/bff/api/report/{request.public_id}', {'type': 'schema'})
+        http_request.session = {'user': {'email': 'user@localhost'}}
+        response = report(http_request, request.public_id)
+        data = json.loads(b''.join(response.streaming_content))
+
+        # 2 outcomes in full + 1 aggregated (without instance)
+        self.assertEqual(len(data['results']['schema_results']), 3)
+        self.assertEqual(len(data['instances']), 2)
+        self.assertFalse(is_archived(request))
+
+    def get_api(self, view, params=None, **kwargs):
+
+        http_request = APIRequestFactory().get('/', params or {})
+        force_authenticate(http_request, user=User.objects.get(id=2))
+        return view.as_view()(http_request, **kwargs)
+
+    def test_outcome_api_restores_archived_outcomes_in_a_task(self):
+
+        request = self.create_request(3)
+        outcome_id = ValidationOutcome.objects.filter(validation_task__request=request).order_by('id').values_list('id', flat=True).first()
+        archive_request(request)
+
+        with mock.patch('apps.ifc_validation.tasks.restore_request_task.delay') as delay:
+
+            # lists which are not narrowed down tell how many requests they leave out
+            response = self.get_api(ValidationOutcomeListAPIView)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['X-Archived-Requests'], '1')
+            self.assertFalse(delay.called)
+
+            response = self.get_api(ValidationOutcomeListAPIView, {'request': request.public_id})
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.data['archived'], [request.public_id])
+            self.assertIn('Retry-After', response)
+            response = self.get_api(ValidationOutcomeDetailAPIView, id=str(outcome_id))
+            self.assertEqual(response.status_code, 202)
+
+            # scheduled once, however often clients ask
+            delay.assert_called_once_with(request.id)
+
+        restore_request(request)
+        response = self.get_api(ValidationOutcomeListAPIView, {'request': request.public_id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertFalse(response.has_header('X-Archived-Requests'))
+
+    def test_archive_file_is_removed_with_request(self):
+
+        request = self.create_request(2)
+        archive_request(request)
+        path = os.path.join(get_archive_root(), OutcomeArchive.objects.get(request=request).file)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ValidationRequest.objects.filter(id=request.id).delete()
+
+        self.assertFalse(os.path.exists(path))
@@ -0,0 +1,283 @@
+import io
+import os
+import json
+import time
+import tempfile
+import threading
+import contextlib
+from unittest import mock
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import ifcopenshell
+from django.test import SimpleTestCase
+
+from .checks import bsdd_cache
+from .checks import bsdd_snapshot
+from .checks import check_bsdd
+from . import bsdd
+
+BSDD_URI = 'https://identifier.buildingsmart.org/uri/buildingsmart/ifc/4.3'
+
+
+class BsddServer(ThreadingHTTPServer):
+
+    """
+    Local stand-in for the bSDD API: dictionaries, classes and properties by uri (404 otherwise), and (paged) lists of
+    dictionaries and of the classes and properties of a dictionary.
+    Counts requests per uri, connections and concurrent requests; uris in 'failures' first fail with HTTP 503.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, classes, properties, failures=(), dictionaries=()):
+
+        super().__init__(('127.0.0.1', 0), BsddRequestHandler)
+        self.classes, self.properties, self.failures = classes, properties, set(failures)
+        self.dictionaries = {dictionary['uri']: dictionary for dictionary in dictionaries}
+        self.lock = threading.Lock()
+        self.requests, self.connections = {}, set()
+        self.in_flight = self.max_in_flight = 0
+
+    @property
+    def url(self):
+
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def get_page(self, items, params, items_key, total_key):
+
+        offset, limit = int(params.get('offset', 0)), int(params.get('limit', 100))
+        return 200, {items_key: items[offset:offset + limit], total_key: len(items)}
+
+    def get_response(self, path, params):
+
+        uri = params.get('uri')
+        if path == '/api/Dictionary/v1' and uri is None:
+            return self.get_page(list(self.dictionaries.values()), params, 'dictionaries', 'totalCount')
+        if path == '/api/Dictionary/v1' and uri in self.dictionaries:
+            return 200, {'dictionaries': [self.dictionaries[uri]], 'count': 1}
+
+        # summaries only, same as bSDD
+        in_dictionary = lambda items: [{'uri': item['uri'], 'name': item['name']} for item in items.values() if item['uri'].startswith(uri)]
+        if path == '/api/Dictionary/v1/Classes' and uri in self.dictionaries:
+            return self.get_page(in_dictionary(self.classes), params, 'classes', 'classesTotalCount')
+        if path == '/api/Dictionary/v1/Properties' and uri in self.dictionaries:
+            return self.get_page(in_dictionary(self.properties), params, 'properties', 'propertiesTotalCount')
+
+        lookup = {'/api/Class/v1': self.classes, '/api/Property/v4': self.properties}.get(path, {})
+        return (200, lookup[uri]) if uri in lookup else (404, {})
+
+
+class BsddRequestHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_GET(self):
+
+        server = self.server
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        uri = params.get('uri')
+        with server.lock:
+            server.connections.add(self.client_address)
+            server.requests[uri] = server.requests.get(uri, 0) + 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            failure = uri in server.failures
+            server.failures.discard(uri)
+
+        time.sleep(0.02)  # network latency
+        status, body = (503, {}) if failure else server.get_response(url.path, params)
+
+        with server.lock:
+            server.in_flight -= 1
+
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+
+        pass
+
+
+class BsddCacheTestCase(SimpleTestCase):
+
+    def setUp(self):
+
+        self.folder = tempfile.TemporaryDirectory()
+        env = mock.patch.dict(os.environ, {'BSDD_CACHE_URL': os.path.join(self.folder.name, 'bsdd.sqlite3'), 'BSDD_CACHE_TTL': '60'})
+        env.start()
+        self.addCleanup(env.stop)
+        self.addCleanup(self.folder.cleanup)
+        bsdd_cache.get_backend.cache_clear()
+        self.addCleanup(bsdd_cache.get_backend.cache_clear)
+
+    def get_lookup(self, responses):
+
+        calls = []
+
+        @bsdd_cache.cached('class')
+        def find_class_by_uri(uri):
+            calls.append(uri)
+            response = responses[uri]
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        return find_class_by_uri, calls
+
+    def test_shared_across_processes(self):
+
+        uri = 'https://identifier.buildingsmart.org/uri/buildingsmart/ifc/4.3/class/IfcWall'
+        lookup, calls = self.get_lookup({uri: {'uri': uri, 'name': 'IfcWall'}})
+        self.assertEqual(lookup(uri), {'uri': uri, 'name': 'IfcWall'})
+
+        # another process: same (SQLite) cache, no request
+        bsdd_cache.get_backend.cache_clear()
+        other_lookup, other_calls = self.get_lookup({})
+        self.assertEqual(other_lookup(uri), {'uri': uri, 'name': 'IfcWall'})
+        self.assertEqual((calls, other_calls), ([uri], []))
+
+    def test_not_found_is_cached(self):
+
+        lookup, calls = self.get_lookup({'https://example.org/unknown': None})
+        self.assertIsNone(lookup('https://example.org/unknown'))
+        self.assertIsNone(lookup('https://example.org/unknown'))
+        self.assertEqual(len(calls), 1)
+
+        # shorter lifetime than found entries
+        with mock.patch('time.time', return_value=time.time() + bsdd_cache.DEFAULT_NEGATIVE_TTL + 1):
+            self.assertIsNone(lookup('https://example.org/unknown'))
+        bsdd_cache.wait_for_revalidations()
+        self.assertEqual(len(calls), 2)
+
+    def test_stale_while_revalidate(self):
+
+        uri = 'https://identifier.buildingsmart.org/uri/buildingsmart/ifc/4.3/class/IfcWall'
+        responses = {uri: {'name': 'IfcWall'}}
+        lookup, calls = self.get_lookup(responses)
+        lookup(uri)
+
+        # expired: stale value served right away, refreshed in the background
+        responses[uri] = {'name': 'IfcWall (updated)'}
+        with mock.patch('time.time', return_value=time.time() + 120):
+            self.assertEqual(lookup(uri), {'name': 'IfcWall'})
+            bsdd_cache.wait_for_revalidations()
+            self.assertEqual(lookup(uri), {'name': 'IfcWall (updated)'})
+        self.assertEqual(len(calls), 2)
+
+        # failing refresh: stale value is kept
+        responses[uri] = ConnectionError('bSDD unavailable')
+        with mock.patch('time.time', return_value=time.time() + 240):
+            self.assertEqual(lookup(uri), {'name': 'IfcWall (updated)'})
+            bsdd_cache.wait_for_revalidations()
+            self.assertEqual(lookup(uri), {'name': 'IfcWall (updated)'})
+
+        # nothing cached: errors are raised as before
+        responses['https://example.org/other'] = ConnectionError('bSDD unavailable')
+        with self.assertRaises(ConnectionError):
+            lookup('https://example.org/other')
+
+
+class BsddLookupTestCase(SimpleTestCase):
+
+    def setUp(self):
+
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.file_name = os.path.join(folder.name, 'bsdd.ifc')
+
+        env = mock.patch.dict(os.environ, {'BSDD_CACHE_URL': os.path.join(folder.name, 'bsdd.sqlite3')})
+        env.start()
+        self.addCleanup(env.stop)
+
+        for func in [bsdd_cache.get_backend, check_bsdd.get_session, check_bsdd.find_dictionary_by_uri, check_bsdd.find_class_by_uri, check_bsdd.find_property_by_uri]:
+            func.cache_clear()
+            self.addCleanup(func.cache_clear)
+
+    def start_server(self, **kwargs):
+
+        server = BsddServer(**kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def write_file(self, number_of_properties, number_of_uris):
+
+        f = ifcopenshell.file(schema='IFC4X3')
+        classification = f.createIfcClassification(Source='buildingSMART', Edition='4.3', Name='IFC', Specification=BSDD_URI)
+        f.createIfcClassificationReference(Location=f'{BSDD_URI}/class/IfcWall', Identification='IfcWall', Name='IfcWall', ReferencedSource=classification)
+        for i in range(number_of_properties):
+            f.createIfcPropertySingleValue(Name=f'Property{i % number_of_uris}', Specification=f'{BSDD_URI}/prop/Property{i % number_of_uris}', NominalValue=f.createIfcLabel('value'))
+        f.write(self.file_name)
+
+    def perform(self):
+
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out), self.assertRaises(SystemExit):
+            check_bsdd.perform(self.file_name, task_id=1, verbose=True)
+        return json.loads(out.getvalue())
+
+    def get_properties(self, number_of_properties):
+
+        return {
+            f'{BSDD_URI}/prop/Property{i}': {'uri': f'{BSDD_URI}/prop/Property{i}', 'name': f'Property{i}', 'dataType': 'String', 'propertyValueKind': 'Single'}
+            for i in range(number_of_properties)
+        }
+
+    def test_distinct_uris_resolved_concurrently(self):
+
+        server = self.start_server(
+            classes={f'{BSDD_URI}/class/IfcWall': {'uri': f'{BSDD_URI}/class/IfcWall', 'name': 'IfcWall'}},
+            properties=self.get_properties(40),
+            failures=[f'{BSDD_URI}/prop/Property0']
+        )
+        self.write_file(number_of_properties=200, number_of_uris=40)
+
+        with mock.patch.object(check_bsdd, 'BSDD_API_URL', server.url), mock.patch.object(check_bsdd, 'BSDD_MAX_CONCURRENCY', 4):
+            results = self.perform()
+
+        # each uri once (plus a retry), at most 4 at a time over at most 4 (keep-alive) connections
+        self.assertEqual(server.requests[f'{BSDD_URI}/prop/Property1'], 1)
+        self.assertEqual(server.requests[f'{BSDD_URI}/prop/Property0'], 2)
+        self.assertEqual(sum(server.requests.values()), 1 + 1 + 40 + 1)
+        self.assertGreater(server.max_in_flight, 1)
+        self.assertLessEqual(server.max_in_flight, 4)
+        self.assertLessEqual(len(server.connections), 4)
+
+        self.assertTrue(all(p['property_in_bsdd'] for p in results['properties']))
+        self.assertTrue(results['classes'][0]['class_in_bsdd'])
+        self.assertFalse(results['dictionaries'][0]['dictionary_in_bsdd'])
+        self.assertEqual(len([m for m in results['messages'] if m['rule'] == 30]), 200)
+
+    def test_snapshot(self):
+
+        server = self.start_server(
+            dictionaries=[{'uri': BSDD_URI, 'name': 'IFC', 'version': '4.3'}, {'uri': 'https://identifier.buildingsmart.org/uri/other/1.0', 'name': 'Other', 'version': '1.0'}],
+            classes={f'{BSDD_URI}/class/IfcWall': {'uri': f'{BSDD_URI}/class/IfcWall', 'name': 'IfcWall', 'relatedIfcEntityNames': ['IfcWall']}},
+            properties=self.get_properties(40)
+        )
+        path = os.path.join(os.path.dirname(self.file_name), 'snapshot.sqlite3')
+
+        # full entries (not the summaries of the lists), across pages
+        with mock.patch.object(check_bsdd, 'BSDD_API_URL', server.url), mock.patch.object(bsdd, 'PAGE_SIZE', 15):
+            counts = bsdd.build_snapshot(path, [BSDD_URI])
+        self.assertEqual(counts, {'dictionaries': 2, 'classes': 1, 'properties': 40})
+        self.assertEqual(bsdd.get_snapshot_info(path)['count:properties'], 40)
+
+        # local lookups, API on a miss only (Property40 is in the file, not in the snapshot)
+        self.write_file(number_of_properties=41, number_of_uris=41)
+        server.requests.clear()
+        with mock.patch.dict(os.environ, {'BSDD_MODE': 'snapshot', 'BSDD_SNAPSHOT_PATH': path}), mock.patch.object(check_bsdd, 'BSDD_API_URL', server.url):
+            self.assertEqual(bsdd_snapshot.find('classes', f'{BSDD_URI}/class/IfcWall')['relatedIfcEntityNames'], ['IfcWall'])
+            results = self.perform()
+
+        self.assertEqual(server.requests, {f'{BSDD_URI}/prop/Property40': 1})
+        self.assertTrue(results['dictionaries'][0]['dictionary_in_bsdd'])
+        self.assertTrue(results['classes'][0]['class_in_bsdd'])
+        self.assertEqual([p['property_in_bsdd'] for p in results['properties']].count(True), 40)
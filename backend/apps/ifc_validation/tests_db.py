@@ -0,0 +1,54 @@
+from io import StringIO
+from unittest import mock
+
+from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+
+from core.db import record_connection, flush_metrics, get_metrics, reset_metrics
+
+
+class DatabaseMetricsTestCase(TestCase):
+
+    def setUp(self):
+
+        cache.clear()
+
+    def test_record_connection(self):
+
+        record_connection('web', 0.0005)
+        record_connection('web', 0.003)
+        record_connection('worker', 2)
+
+        metrics = get_metrics()
+        self.assertEqual(metrics['web']['connections'], 2)
+        self.assertAlmostEqual(metrics['web']['avg_connect_ms'], 1.75, places=3)
+        self.assertEqual(metrics['web']['histogram']['<1ms'], 1)
+        self.assertEqual(metrics['web']['histogram']['<5ms'], 1)
+        self.assertEqual(metrics['worker']['histogram']['>=1000ms'], 1)
+
+        reset_metrics()
+        self.assertEqual(get_metrics()['web'], {
+            'connections': 0, 'avg_connect_ms': None, 'histogram': dict.fromkeys(metrics['web']['histogram'], 0)
+        })
+
+    def test_record_connection_is_not_blocked_by_the_cache(self):
+
+        reset_metrics()
+        with mock.patch('core.db.cache.incr', side_effect=ConnectionError('cache is down')) as incr:
+            record_connection('web', 0.0005)
+            self.assertFalse(incr.called)
+            flush_metrics()
+            self.assertTrue(incr.called)
+
+        # kept for the next flush
+        self.assertEqual(get_metrics()['web']['connections'], 1)
+
+    def test_db_metrics_command(self):
+
+        record_connection('worker', 0.01)
+
+        out = StringIO()
+        call_command('db_metrics', '--reset', stdout=out)
+        self.assertIn('connections opened:        1', out.getvalue())
+        self.assertEqual(get_metrics()['worker']['connections'], 0)
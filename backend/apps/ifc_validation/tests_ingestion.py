@@ -0,0 +1,252 @@
+import os
+import hashlib
+import tempfile
+
+from django.test import TestCase, RequestFactory, override_settings
+from django.core.files.uploadhandler import StopFutureHandlers
+from django.contrib.auth.models import User
+
+from apps.ifc_validation_models.models import *
+from apps.ifc_validation_models.decorators import requires_django_user_context
+
+from .ingestion import parse_step_header, IngestionUploadHandler, IngestedUploadedFile
+from .ingestion import stored_file_or_upload, store_ingestion_results, claim_uploaded_file
+from .prechecks import precheck_upload, reject_validation_request
+
+FIXTURES_FOLDER = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def read_fixture(file_name):
+
+    with open(os.path.join(FIXTURES_FOLDER, file_name), 'rb') as f:
+        return f.read()
+
+
+class IngestionTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        """
+        Creates a SYSTEM user in the (in-memory) test database.
+        Runs once for the whole test case.
+        """
+
+        user = User.objects.create(id=1, username='SYSTEM', is_active=True)
+        user.save()
+
+    def ingest(self, file_name, content, chunk_size=1024):
+
+        http_request = RequestFactory().post('/bff/api/upload')
+        http_request.session = {'user': {'email': 'user@localhost'}}
+        handler = IngestionUploadHandler(http_request)
+        with self.assertRaises(StopFutureHandlers):
+            handler.new_file('file', file_name, 'application/octet-stream', len(content))
+
+        for start in range(0, len(content), chunk_size):
+            self.assertIsNone(handler.receive_data_chunk(content[start:start + chunk_size], start))
+
+        return handler.file_complete(len(content))
+
+    def test_parse_step_header_reads_schema_date_and_mvd(self):
+
+        header = parse_step_header(read_fixture('wall-with-opening-and-window.ifc'))
+
+        self.assertTrue(header['is_step'])
+        self.assertTrue(header['complete'])
+        self.assertEqual(header['schema'], 'IFC4')
+        self.assertEqual(header['mvd'], 'CoordinationView')
+
+    def test_parse_step_header_ignores_comments(self):
+
+        header = parse_step_header(read_fixture('UT_ProjectSetup_1.ifc'))
+
+        self.assertTrue(header['is_step'])
+        self.assertEqual(header['schema'], 'IFC4X3_RC1')
+        self.assertEqual(header['time_stamp'], '2020-07-15T18:00:00')
+        self.assertEqual(header['mvd'], '')
+
+    def test_parse_step_header_reads_strings_as_a_whole(self):
+
+        data = (
+            "ISO-10303-21;\nHEADER;\n"
+            "FILE_DESCRIPTION(('ViewDefinition [ReferenceView]', 'a /* b'),'2;1');\n"
+            "FILE_NAME('a);b.ifc','2022-05-04T08:08:30',('it''s me'),(''),'','','');\n"
+            "FILE_SCHEMA(('IFC4'));\nENDSEC;\n"
+        )
+        header = parse_step_header(data)
+
+        self.assertEqual(header['schema'], 'IFC4')
+        self.assertEqual(header['time_stamp'], '2022-05-04T08:08:30')
+        self.assertEqual(header['mvd'], 'ReferenceView')
+
+    def test_parse_step_header_detects_non_step_file(self):
+
+        header = parse_step_header(read_fixture('invalid_file.ifc'))
+
+        self.assertFalse(header['is_step'])
+        self.assertIsNone(header['schema'])
+
+    def test_parse_step_header_with_malformed_schema(self):
+
+        header = parse_step_header(read_fixture('invalid_xss_file_missing_apostrophe.ifc'))
+
+        self.assertTrue(header['is_step'])
+        self.assertIsNone(header['schema'])
+
+    def test_upload_handler_streams_file_to_storage(self):
+
+        content = read_fixture('pass_reverse_comment.ifc')
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+
+            uploaded = self.ingest('pass_reverse_comment.ifc', content, chunk_size=64)
+
+            self.assertIsInstance(uploaded, IngestedUploadedFile)
+            self.assertEqual(uploaded.name, 'pass_reverse_comment.ifc')
+            self.assertEqual(uploaded.size, len(content))
+            self.assertEqual(uploaded.sha256, hashlib.sha256(content).hexdigest())
+            self.assertEqual(uploaded.line_count, content.count(b'\n'))
+            self.assertEqual(uploaded.header['schema'], 'IFC4')
+            self.assertEqual(uploaded.header['time_stamp'], '2022-05-04T08:08:30')
+
+            # temporary file until claimed by a Validation Request
+            self.assertFalse(os.path.exists(os.path.join(media_root, uploaded.stored_name)))
+            self.assertEqual(os.path.dirname(uploaded.temporary_path()), os.path.dirname(os.path.join(media_root, uploaded.stored_name)))
+            claim_uploaded_file(None, uploaded)
+            with open(os.path.join(media_root, uploaded.stored_name), 'rb') as f:
+                self.assertEqual(f.read(), content)
+            uploaded.close()
+            self.assertTrue(os.path.exists(os.path.join(media_root, uploaded.stored_name)))
+
+    def test_unclaimed_upload_is_removed(self):
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+
+            # eg. rejected by the view (not authenticated, invalid, error) - Django closes uploaded files at the end of a request
+            uploaded = self.ingest('valid_file.ifc', read_fixture('valid_file.ifc'))
+            uploaded.close()
+            self.assertEqual([files for _, _, files in os.walk(media_root) if files], [])
+
+    def test_upload_handler_skips_anonymous_requests(self):
+
+        http_request = RequestFactory().post('/bff/api/upload')
+        http_request.session = {}
+        handler = IngestionUploadHandler(http_request)
+        handler.new_file('file', 'valid_file.ifc', 'application/octet-stream', 280)
+
+        self.assertFalse(handler.activated)
+        self.assertEqual(handler.receive_data_chunk(b'ISO-10303-21;', 0), b'ISO-10303-21;')
+
+    @requires_django_user_context
+    def test_upload_handler_does_not_overwrite_existing_file(self):
+
+        content = read_fixture('valid_file.ifc')
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+
+            first = self.ingest('valid_file.ifc', content)
+            second = self.ingest('valid_file.ifc', content)
+            requests = []
+            for uploaded in (first, second):
+                request = ValidationRequest.objects.create(file=stored_file_or_upload(uploaded), file_name=uploaded.name, size=uploaded.size)
+                with self.captureOnCommitCallbacks(execute=True):
+                    store_ingestion_results(request, uploaded)
+                requests.append(request)
+
+            self.assertNotEqual(first.stored_name, second.stored_name)
+            for request in requests:
+                request.refresh_from_db()
+                self.assertTrue(os.path.exists(os.path.join(media_root, request.file.name)))
+            self.assertEqual(requests[1].file.name, second.stored_name)
+            first.close()
+            second.close()
+
+    @requires_django_user_context
+    def test_ingestion_results_are_stored_on_request(self):
+
+        content = read_fixture('valid_file.ifc')
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+
+            uploaded = self.ingest('valid_file.ifc', content)
+            request = ValidationRequest.objects.create(
+                file=stored_file_or_upload(uploaded),
+                file_name=uploaded.name,
+                size=uploaded.size
+            )
+            with self.captureOnCommitCallbacks(execute=True):
+                store_ingestion_results(request, uploaded)
+            uploaded.close()
+
+            request.refresh_from_db()
+            self.assertEqual(request.file.name, uploaded.stored_name)
+            self.assertTrue(os.path.exists(os.path.join(media_root, request.file.name)))
+            self.assertEqual(request.ingested_file.sha256, uploaded.sha256)
+            self.assertEqual(request.ingested_file.header_schema, 'IFC4')
+            self.assertEqual(request.ingested_file.header_mvd, 'CoordinationView')
+
+    def test_precheck_accepts_supported_schema(self):
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+
+            uploaded = self.ingest('valid_file.ifc', read_fixture('valid_file.ifc'))
+            self.assertIsNone(precheck_upload(uploaded))
+            uploaded.close()
+
+    def test_precheck_rejects_non_step_file(self):
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+
+            uploaded = self.ingest('document.ifc', b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+            task_type, outcome_code, reason = precheck_upload(uploaded)
+            uploaded.close()
+
+            self.assertEqual(task_type, ValidationTask.Type.SYNTAX)
+            self.assertEqual(outcome_code, ValidationOutcome.ValidationOutcomeCode.SYNTAX_ERROR)
+            self.assertTrue('ISO-10303-21;' in reason)
+
+    def test_precheck_rejects_unsupported_schema(self):
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+
+            uploaded = self.ingest('invalid_version.ifc', read_fixture('invalid_version.ifc'))
+            task_type, outcome_code, reason = precheck_upload(uploaded)
+            uploaded.close()
+
+            self.assertEqual(task_type, ValidationTask.Type.SCHEMA)
+            self.assertEqual(outcome_code, ValidationOutcome.ValidationOutcomeCode.SCHEMA_ERROR)
+            self.assertEqual(reason, 'Unsupported schema: ifc99')
+
+    def test_precheck_leaves_malformed_header_to_syntax_check(self):
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+
+            uploaded = self.ingest('invalid_xss_file_missing_apostrophe.ifc', read_fixture('invalid_xss_file_missing_apostrophe.ifc'))
+            self.assertIsNone(precheck_upload(uploaded))
+            uploaded.close()
+
+    @requires_django_user_context
+    def test_rejected_request_is_completed_with_outcome(self):
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+
+            uploaded = self.ingest('invalid_version.ifc', read_fixture('invalid_version.ifc'))
+            request = ValidationRequest.objects.create(
+                file=stored_file_or_upload(uploaded),
+                file_name=uploaded.name,
+                size=uploaded.size
+            )
+            reject_validation_request(request, *precheck_upload(uploaded))
+            uploaded.close()
+
+            request.refresh_from_db()
+            self.assertEqual(request.status, ValidationRequest.Status.COMPLETED)
+            self.assertEqual(request.model.status_schema, Model.Status.INVALID)
+            # stages which did not run are not left pending
+            for field in ('status_syntax', 'status_prereq', 'status_bsdd', 'status_ia', 'status_ip', 'status_industry_practices'):
+                self.assertEqual(getattr(request.model, field), Model.Status.NOT_APPLICABLE, field)
+            outcomes = ValidationOutcome.objects.all()
+            self.assertEqual(len(outcomes), 1)
+            self.assertEqual(outcomes.first().severity, ValidationOutcome.OutcomeSeverity.ERROR)
+            self.assertEqual(outcomes.first().observed, 'Unsupported schema: ifc99')
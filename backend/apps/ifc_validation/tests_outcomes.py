@@ -0,0 +1,308 @@
+from io import StringIO
+
+from django.test import TestCase, override_settings
+from django.core.management import call_command, CommandError
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.contrib.auth.models import User
+
+from apps.ifc_validation_models.models import *
+from apps.ifc_validation_models.decorators import requires_django_user_context
+from apps.ifc_validation_bff.reports import map_schema_outcome
+
+from .models import OutcomeAggregate, MessageTemplate
+from .messages import split_message, intern_message, intern_queryset, render_message, is_interned
+from .serializers import ValidationOutcomeSerializer
+from .projections import get_projection
+from .outcomes import OutcomeWriter, get_outcome_summary, rebuild_outcome_summary, get_aggregate_status
+from .outcomes import compact_outcomes, get_message_template, encode_instance_ids, decode_instance_ids
+
+
+class OutcomeTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        """
+        Creates a SYSTEM user and a user in the (in-memory) test database.
+        Runs once for the whole test case.
+        """
+
+        user = User.objects.create(id=1, username='SYSTEM', is_active=True)
+        user.save()
+        User.objects.create(id=2, username='user@localhost', email='user@localhost', is_active=True)
+
+    @requires_django_user_context
+    def create_task(self):
+
+        request = ValidationRequest.objects.create(
+            file_name='valid_file.ifc',
+            file='valid_file.ifc',
+            size=280,
+            created_by_id=2
+        )
+        return ValidationTask.objects.create(request=request, type=ValidationTask.Type.SCHEMA)
+
+
+class OutcomeSummaryTestCase(OutcomeTestCase):
+
+    @requires_django_user_context
+    def write_outcomes(self, task, severities, batch_size=1000):
+
+        with OutcomeWriter(task, batch_size=batch_size) as outcomes:
+            for severity in severities:
+                outcomes.add(
+                    severity=severity,
+                    outcome_code=ValidationOutcome.ValidationOutcomeCode.SCHEMA_ERROR if severity == ValidationOutcome.OutcomeSeverity.ERROR else ValidationOutcome.ValidationOutcomeCode.PASSED,
+                    observed='message'
+                )
+        return outcomes
+
+    def test_summary_counts_written_outcomes(self):
+
+        task = self.create_task()
+        ERROR, PASSED = ValidationOutcome.OutcomeSeverity.ERROR, ValidationOutcome.OutcomeSeverity.PASSED
+
+        outcomes = self.write_outcomes(task, [ERROR] * 7 + [PASSED] * 3, batch_size=4)
+
+        self.assertEqual(outcomes.count, 10)
+        self.assertEqual(task.outcomes.count(), 10)
+        self.assertEqual(get_outcome_summary(task), {
+            (ERROR, ValidationOutcome.ValidationOutcomeCode.SCHEMA_ERROR): 7,
+            (PASSED, ValidationOutcome.ValidationOutcomeCode.PASSED): 3,
+        })
+
+    def test_outcomes_are_written_in_batches(self):
+
+        task = self.create_task()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.write_outcomes(task, [ValidationOutcome.OutcomeSeverity.ERROR] * 500)
+        # one insert of outcomes + summary lookup + one insert of summaries (no query per outcome)
+        self.assertLess(len(queries), 10)
+
+    def test_rebuild_matches_incremental_summary(self):
+
+        task = self.create_task()
+        self.write_outcomes(task, [ValidationOutcome.OutcomeSeverity.ERROR, ValidationOutcome.OutcomeSeverity.WARNING] * 5, batch_size=3)
+        incremental = get_outcome_summary(task)
+
+        rebuild_outcome_summary(task)
+
+        self.assertEqual(get_outcome_summary(task), incremental)
+
+    def test_aggregate_status_matches_outcomes(self):
+
+        for severities, expected in [
+            ([ValidationOutcome.OutcomeSeverity.PASSED, ValidationOutcome.OutcomeSeverity.ERROR], Model.Status.INVALID),
+            ([ValidationOutcome.OutcomeSeverity.PASSED, ValidationOutcome.OutcomeSeverity.WARNING], Model.Status.WARNING),
+            ([ValidationOutcome.OutcomeSeverity.PASSED], Model.Status.VALID),
+        ]:
+            task = self.create_task()
+            self.write_outcomes(task, severities)
+
+            with CaptureQueriesContext(connection) as queries:
+                status = get_aggregate_status(task)
+            self.assertEqual(status, expected)
+            self.assertEqual(status, task.determine_aggregate_status())
+            self.assertEqual(len(queries), 1)
+
+    def test_aggregate_status_without_summary(self):
+
+        task = self.create_task()
+        task.outcomes.create(severity=ValidationOutcome.OutcomeSeverity.ERROR, outcome_code=ValidationOutcome.ValidationOutcomeCode.SCHEMA_ERROR)
+
+        self.assertEqual(get_outcome_summary(task), {})
+        self.assertEqual(get_aggregate_status(task), Model.Status.INVALID)
+
+
+class OutcomeCompactionTestCase(OutcomeTestCase):
+
+    @requires_django_user_context
+    def write_schema_errors(self, task, number_of_errors, compaction_limit):
+
+        with OutcomeWriter(task, compaction_limit=compaction_limit) as outcomes:
+            for i in range(number_of_errors):
+                outcomes.add(
+                    severity=ValidationOutcome.OutcomeSeverity.ERROR,
+                    outcome_code=ValidationOutcome.ValidationOutcomeCode.SCHEMA_ERROR,
+                    observed=f"Attribute 'Name' of #{100 + i}=IfcWall('{i}') has 2 items, expected 1",
+                    feature='{"type": "schema", "attribute": "IfcRoot.Name"}',
+                    stepfile_id=100 + i
+                )
+        return outcomes
+
+    def test_message_template(self):
+
+        self.assertEqual(
+            get_message_template("Attribute 'Name' of #12=IfcWall('x') has 2 items"),
+            "Attribute '<value>' of #<id>=IfcWall('<value>') has <n> items"
+        )
+
+    def test_instance_ids_roundtrip(self):
+
+        ids = [5, 1, 100000, 99999, 3]
+        self.assertEqual(decode_instance_ids(encode_instance_ids(ids)), sorted(ids))
+        self.assertEqual(decode_instance_ids(None), [])
+
+    def test_repeated_outcomes_are_compacted(self):
+
+        task = self.create_task()
+
+        outcomes = self.write_schema_errors(task, 25, compaction_limit=10)
+
+        # 10 in full + 1 aggregated
+        self.assertEqual(outcomes.count, 25)
+        self.assertEqual(task.outcomes.count(), 11)
+        aggregate = OutcomeAggregate.objects.get(outcome__validation_task=task)
+        self.assertEqual(aggregate.count, 15)
+        self.assertEqual(decode_instance_ids(aggregate.instance_ids), list(range(110, 125)))
+        self.assertIsNone(aggregate.outcome.instance_id)
+        self.assertIn('15 more occurrence(s)', render_message(aggregate.outcome.observed))
+
+        # summaries count occurrences, also when rebuilt
+        summary = {(ValidationOutcome.OutcomeSeverity.ERROR, ValidationOutcome.ValidationOutcomeCode.SCHEMA_ERROR): 25}
+        self.assertEqual(get_outcome_summary(task), summary)
+        rebuild_outcome_summary(task)
+        self.assertEqual(get_outcome_summary(task), summary)
+
+    def test_instances_are_only_created_for_stored_outcomes(self):
+
+        task = self.create_task()
+        calls = []
+
+        with OutcomeWriter(task, compaction_limit=2) as outcomes:
+            for i in range(5):
+                outcomes.add(
+                    severity=ValidationOutcome.OutcomeSeverity.ERROR,
+                    outcome_code=ValidationOutcome.ValidationOutcomeCode.SCHEMA_ERROR,
+                    observed=f'#{i} is invalid',
+                    instance=lambda: calls.append(1),
+                    stepfile_id=i
+                )
+
+        self.assertEqual(len(calls), 2)
+
+    def test_no_compaction_below_limit(self):
+
+        task = self.create_task()
+
+        self.write_schema_errors(task, 5, compaction_limit=10)
+
+        self.assertEqual(task.outcomes.count(), 5)
+        self.assertFalse(OutcomeAggregate.objects.exists())
+
+    @requires_django_user_context
+    def test_written_outcomes_are_compacted(self):
+
+        task = self.create_task()
+        for i in range(12):
+            task.outcomes.create(
+                severity=ValidationOutcome.OutcomeSeverity.ERROR,
+                outcome_code=ValidationOutcome.ValidationOutcomeCode.VALUE_ERROR,
+                feature='GEM001 - Closed shell edge usage',
+                observed={'value': f'#{i} is not closed'}
+            )
+        task.outcomes.create(severity=ValidationOutcome.OutcomeSeverity.PASSED, outcome_code=ValidationOutcome.ValidationOutcomeCode.PASSED, feature='GEM002')
+
+        removed = compact_outcomes(task, limit=4)
+        rebuild_outcome_summary(task)
+
+        self.assertEqual(removed, 7)
+        self.assertEqual(task.outcomes.count(), 6)
+        self.assertEqual(OutcomeAggregate.objects.get(outcome__validation_task=task).count, 8)
+        self.assertEqual(get_outcome_summary(task)[(ValidationOutcome.OutcomeSeverity.ERROR, ValidationOutcome.ValidationOutcomeCode.VALUE_ERROR)], 12)
+        self.assertEqual(get_aggregate_status(task), Model.Status.INVALID)
+
+        # compacting again changes nothing
+        self.assertEqual(compact_outcomes(task, limit=4), 0)
+        self.assertEqual(task.outcomes.count(), 6)
+
+    @requires_django_user_context
+    def test_outcomes_without_message_are_compacted(self):
+
+        task = self.create_task()
+        for i in range(5):
+            task.outcomes.create(severity=ValidationOutcome.OutcomeSeverity.PASSED, outcome_code=ValidationOutcome.ValidationOutcomeCode.PASSED, feature='GEM002')
+
+        # off by default
+        self.assertEqual(compact_outcomes(task), 0)
+
+        self.assertEqual(compact_outcomes(task, limit=2), 2)
+        aggregate = OutcomeAggregate.objects.get(outcome__validation_task=task)
+        self.assertEqual(aggregate.count, 3)
+        self.assertEqual(render_message(aggregate.outcome.observed), '3 more occurrence(s)')
+
+
+@override_settings(OUTCOME_MESSAGE_INTERNING=True)
+class MessageInterningTestCase(OutcomeTestCase):
+
+    MESSAGE = "Attribute 'Name' of #{id}=IfcWall('{id}', $, {{1.5, -2}}) has {n} items, expected 1"
+
+    def test_split_message_roundtrip(self):
+
+        for message in [self.MESSAGE.format(id=12, n=3), 'no parameters', '{braces} #1 and {}', "'unterminated #2", '']:
+            template, parameters = split_message(message)
+            self.assertEqual(template.format(*parameters), message)
+
+        self.assertEqual(split_message('#12=IfcWall has 2 items'), ('{}=IfcWall has {} items', ['#12', '2']))
+
+    def test_short_messages_are_stored_as_is(self):
+
+        self.assertEqual(intern_message('Short message #1'), ('Short message #1', None))
+        self.assertEqual(intern_message({'value': 'IfcSite'}), ({'value': 'IfcSite'}, None))
+
+    @requires_django_user_context
+    def test_written_messages_share_a_template(self):
+
+        task = self.create_task()
+        messages = [self.MESSAGE.format(id=i, n=i % 3) for i in range(10)]
+
+        with OutcomeWriter(task) as outcomes:
+            for message in messages:
+                outcomes.add(severity=ValidationOutcome.OutcomeSeverity.ERROR, outcome_code=ValidationOutcome.ValidationOutcomeCode.SCHEMA_ERROR, observed=message)
+
+        self.assertEqual(MessageTemplate.objects.count(), 1)
+        stored = list(task.outcomes.order_by('id'))
+        self.assertTrue(all(is_interned(outcome.observed) for outcome in stored))
+        self.assertEqual([render_message(outcome.observed) for outcome in stored], messages)
+
+        # rendered back in reports and the API
+        self.assertEqual(map_schema_outcome(stored[0])['msg'], messages[0])
+        plan = get_projection(ValidationOutcomeSerializer).get_plan(('observed',))
+        self.assertEqual(plan.project_all(task.outcomes.order_by('id').values(*plan.columns)), [{'observed': message} for message in messages])
+
+    @requires_django_user_context
+    def test_existing_outcomes_are_interned(self):
+
+        task = self.create_task()
+        for i in range(3):
+            task.outcomes.create(severity=ValidationOutcome.OutcomeSeverity.ERROR, outcome_code=ValidationOutcome.ValidationOutcomeCode.VALUE_ERROR, observed=self.MESSAGE.format(id=i, n=i))
+        task.outcomes.create(severity=ValidationOutcome.OutcomeSeverity.PASSED, outcome_code=ValidationOutcome.ValidationOutcomeCode.PASSED, observed={'value': 'IfcSite'})
+
+        self.assertEqual(intern_queryset(task.outcomes.all()), 3)
+        self.assertEqual(intern_queryset(task.outcomes.all()), 0)
+
+        observed = [render_message(value) for value in task.outcomes.order_by('id').values_list('observed', flat=True)]
+        self.assertEqual(observed, [self.MESSAGE.format(id=i, n=i) for i in range(3)] + [{'value': 'IfcSite'}])
+
+    @requires_django_user_context
+    def test_interning_is_opt_in(self):
+
+        task = self.create_task()
+        messages = [self.MESSAGE.format(id=i, n=i) for i in range(3)]
+
+        # plain text for the Gherkin rules and other direct readers of the outcome table
+        with override_settings(OUTCOME_MESSAGE_INTERNING=False):
+            with OutcomeWriter(task) as outcomes:
+                for message in messages:
+                    outcomes.add(severity=ValidationOutcome.OutcomeSeverity.ERROR, outcome_code=ValidationOutcome.ValidationOutcomeCode.SCHEMA_ERROR, observed=message)
+            self.assertEqual(list(task.outcomes.order_by('id').values_list('observed', flat=True)), messages)
+            with self.assertRaises(CommandError):
+                call_command('intern_outcome_messages', stdout=StringIO())
+
+        # existing outcomes are interned, and rendered back, by the management command
+        call_command('intern_outcome_messages', stdout=StringIO())
+        self.assertTrue(all(is_interned(observed) for observed in task.outcomes.values_list('observed', flat=True)))
+        call_command('intern_outcome_messages', '--render', stdout=StringIO())
+        self.assertEqual(list(task.outcomes.order_by('id').values_list('observed', flat=True)), messages)
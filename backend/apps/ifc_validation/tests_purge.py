@@ -0,0 +1,179 @@
+import os
+import datetime
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from apps.ifc_validation_models.models import *
+
+from .models import OutcomeSummary, OutcomeAggregate, OutcomeArchive, PurgeJob
+from .archival import archive_request, get_archive_root
+from .purge import get_delete_plan, purge_requests, schedule_purge, run_purge_job, get_expired_requests, remove_purged_files
+from .test_utils import ValidationRequestTestMixin
+
+
+class PurgeTestCase(ValidationRequestTestMixin, TestCase):
+
+    def setUp(self):
+
+        cache.clear()
+        self.media_root = tempfile.TemporaryDirectory()
+        self.overrides = override_settings(MEDIA_ROOT=self.media_root.name, OUTCOME_ARCHIVE_ROOT=os.path.join(self.media_root.name, '_archive'))
+        self.overrides.enable()
+
+    def tearDown(self):
+
+        self.overrides.disable()
+        self.media_root.cleanup()
+
+    def create_request(self, number_of_outcomes, model=None):
+
+        # an uploaded file of its own, with the last occurrence compacted (an outcome aggregate)
+        file_name = f'file_{ValidationRequest.objects.count()}.ifc'
+        with open(os.path.join(self.media_root.name, file_name), 'w') as f:
+            f.write('ISO-10303-21;')
+
+        return super().create_request(number_of_outcomes, file_name=file_name, size=13, model=model, compaction_limit=number_of_outcomes - 1)
+
+    def assertPurged(self, request):
+
+        self.assertFalse(ValidationRequest._base_manager.filter(id=request.id).exists())
+        self.assertFalse(ValidationTask.objects.filter(request_id=request.id).exists())
+        self.assertFalse(ValidationOutcome.objects.filter(validation_task__request_id=request.id).exists())
+        self.assertFalse(OutcomeSummary.objects.filter(task__request_id=request.id).exists())
+        self.assertFalse(OutcomeArchive.objects.filter(request_id=request.id).exists())
+
+    def test_delete_plan_deletes_children_first(self):
+
+        plan = [model for model, _, field_name in get_delete_plan(ValidationRequest, ValidationRequest.objects.none()) if not field_name]
+
+        self.assertEqual(plan[-1], ValidationRequest)
+        self.assertLess(plan.index(OutcomeAggregate), plan.index(ValidationOutcome))
+        self.assertLess(plan.index(ValidationOutcome), plan.index(ValidationTask))
+        self.assertLess(plan.index(OutcomeSummary), plan.index(ValidationTask))
+        self.assertLess(plan.index(OutcomeArchive), plan.index(ValidationRequest))
+
+    def test_purge_requests(self):
+
+        purged = self.create_request(5)
+        archived = self.create_request(3)
+        archive_request(archived)
+        kept = self.create_request(3)
+        archive_path = os.path.join(get_archive_root(), OutcomeArchive.objects.get(request=archived).file)
+        outcomes = ValidationOutcome.objects.filter(validation_task__request=kept).count()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            count = purge_requests([purged.id, archived.id])
+
+        self.assertGreater(count, 0)
+        for request in (purged, archived):
+            self.assertPurged(request)
+            self.assertFalse(Model.objects.filter(id=request.model_id).exists())
+            self.assertFalse(ModelInstance.objects.filter(model_id=request.model_id).exists())
+            self.assertFalse(os.path.exists(os.path.join(self.media_root.name, request.file.name)))
+        self.assertFalse(os.path.exists(archive_path))
+
+        # other requests are left untouched
+        self.assertEqual(ValidationOutcome.objects.filter(validation_task__request=kept).count(), outcomes)
+        self.assertTrue(ModelInstance.objects.filter(model_id=kept.model_id).exists())
+        self.assertTrue(os.path.exists(os.path.join(self.media_root.name, kept.file.name)))
+
+    def test_shared_model_is_kept(self):
+
+        first = self.create_request(2)
+        second = self.create_request(2, model=first.model)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            purge_requests([first.id])
+
+        self.assertPurged(first)
+        self.assertTrue(Model.objects.filter(id=first.model_id).exists())
+        self.assertTrue(ValidationOutcome.objects.filter(validation_task__request=second).exists())
+
+    def test_run_purge_job(self):
+
+        requests = [self.create_request(2) for _ in range(3)]
+        job = schedule_purge([request.id for request in requests], user=User.objects.get(id=3))
+
+        # hidden right away
+        self.assertFalse(ValidationRequest.objects.filter(id__in=job.request_ids, deleted=False).exists())
+        self.assertEqual((job.status, job.total, job.processed), (PurgeJob.Status.PENDING, 3, 0))
+
+        with mock.patch('apps.ifc_validation.purge.PURGE_BATCH_SIZE', 2), self.captureOnCommitCallbacks(execute=True):
+            count = run_purge_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed), (PurgeJob.Status.COMPLETED, 3))
+        self.assertEqual(job.rows_deleted, count)
+        self.assertEqual(job.files_deleted, 3)
+        for request in requests:
+            self.assertPurged(request)
+
+    def test_failed_purge_job_resumes(self):
+
+        requests = [self.create_request(2) for _ in range(2)]
+        job = schedule_purge([request.id for request in requests])
+
+        with mock.patch('apps.ifc_validation.purge.PURGE_BATCH_SIZE', 1), mock.patch('apps.ifc_validation.purge.purge_requests', side_effect=[3, RuntimeError('boom')]):
+            with self.assertRaises(RuntimeError):
+                run_purge_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed, job.error), (PurgeJob.Status.FAILED, 1, 'boom'))
+
+        with mock.patch('apps.ifc_validation.purge.PURGE_BATCH_SIZE', 1), mock.patch('apps.ifc_validation.purge.purge_requests', return_value=3) as purge:
+            run_purge_job(job)
+
+        job.refresh_from_db()
+        purge.assert_called_once_with([requests[1].id], job.id, remove_purged_files)
+        self.assertEqual((job.status, job.processed, job.rows_deleted), (PurgeJob.Status.COMPLETED, 2, 6))
+
+    def test_expired_requests(self):
+
+        expired = self.create_request(1)
+        recent = self.create_request(1)
+        self.create_request(1)
+        ValidationRequest.objects.filter(id__in=[expired.id, recent.id]).update(deleted=True)
+        ValidationRequest.objects.filter(id=expired.id).update(updated=timezone.now() - datetime.timedelta(days=31))
+
+        with override_settings(PURGE_RETENTION_DAYS=30):
+            self.assertEqual(get_expired_requests(), [expired.id])
+        with override_settings(PURGE_RETENTION_DAYS=0):
+            self.assertEqual(get_expired_requests(), [])
+
+    def test_scheduled_requests_are_not_expired_again(self):
+
+        requests = [self.create_request(1) for _ in range(3)]
+        job = schedule_purge([requests[0].id, requests[1].id])
+        ValidationRequest._base_manager.filter(id=requests[1].id).update(updated=timezone.now() - datetime.timedelta(days=31))
+
+        # soft-deleted just now (bulk update)
+        self.assertGreater(ValidationRequest._base_manager.get(id=requests[0].id).updated, timezone.now() - datetime.timedelta(minutes=1))
+
+        with override_settings(PURGE_RETENTION_DAYS=30):
+            self.assertEqual(get_expired_requests(), [])
+            PurgeJob.objects.filter(pk=job.pk).update(status=PurgeJob.Status.COMPLETED)
+            self.assertEqual(get_expired_requests(), [requests[1].id])
+
+    def test_admin_action_schedules_purge_job(self):
+
+        request = self.create_request(2)
+        self.client.force_login(User.objects.get(id=3))
+
+        with mock.patch('apps.ifc_validation.admin.purge_requests_task') as task, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/admin/ifc_validation_models/validationrequest/', {
+                'action': 'hard_delete_action',
+                'apply': 'Yes',
+                '_selected_action': [request.id],
+            })
+
+        self.assertEqual(response.status_code, 302)
+        job = PurgeJob.objects.get()
+        self.assertEqual((job.request_ids, job.created_by_id), ([request.id], 3))
+        task.delay.assert_called_once_with(job.id)
+        # not deleted yet, only hidden
+        self.assertTrue(ValidationRequest._base_manager.filter(id=request.id, deleted=True).exists())
@@ -0,0 +1,76 @@
+import json
+import uuid
+import datetime
+from decimal import Decimal
+
+from django.test import SimpleTestCase, override_settings
+from django.http import JsonResponse
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from core.renderers import FastJsonResponse, FastJSONRenderer, json_dumps
+
+PAYLOAD = {
+    'created': datetime.datetime(2024, 5, 1, 10, 0, 0, 123456, tzinfo=datetime.timezone.utc),
+    'date': datetime.date(2024, 5, 1),
+    'time': datetime.time(10, 0, 0, 500),
+    'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'decimal': Decimal('1.250'),
+    'lazy': gettext_lazy('Error'),
+    'text': 'non-ASCII ‘quotes’ and a   separator',
+    'nested': [{'id': 1, 'value': None}, {'id': 2, 'value': 3.5}],
+    7: 'non-string key',
+}
+
+
+@override_settings(JSON_RENDERER='orjson')
+class RendererTestCase(SimpleTestCase):
+
+    def test_json_dumps_matches_stdlib_encoder(self):
+
+        fast = json_dumps(PAYLOAD)
+        with override_settings(JSON_RENDERER='json'):
+            stdlib = json_dumps(PAYLOAD)
+
+        self.assertIsInstance(fast, bytes)
+        self.assertEqual(json.loads(fast), json.loads(stdlib))
+        self.assertEqual(json.loads(fast)['created'], '2024-05-01T10:00:00.123Z')
+        self.assertEqual(json.loads(fast)['decimal'], '1.250')
+
+    def test_fast_json_response_matches_json_response(self):
+
+        fast = FastJsonResponse(PAYLOAD)
+        default = JsonResponse(PAYLOAD)
+
+        self.assertEqual(fast['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(fast.content), json.loads(default.content))
+
+    def test_fast_json_response_requires_dict_unless_unsafe(self):
+
+        with self.assertRaises(TypeError):
+            FastJsonResponse([1, 2])
+        self.assertEqual(json.loads(FastJsonResponse([1, 2], safe=False).content), [1, 2])
+
+    def test_fast_renderer_matches_drf_renderer(self):
+
+        data = [{k: v for k, v in PAYLOAD.items() if k != 7}]
+        fast = FastJSONRenderer().render(data)
+        default = JSONRenderer().render(data)
+
+        self.assertEqual(json.loads(fast), json.loads(default))
+        self.assertIn(b'\\u2028', fast)
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_fast_renderer_leaves_indented_output_to_drf(self):
+
+        data = {'id': 1}
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2'))
+
+    @override_settings(JSON_RENDERER='json')
+    def test_stdlib_renderer_is_used_when_configured(self):
+
+        data = {'id': 1, 'name': 'a'}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJsonResponse(data).content, JsonResponse(data).content)
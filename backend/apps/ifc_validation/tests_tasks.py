@@ -11,6 +11,7 @@ from .tasks import syntax_validation_subtask
 from .tasks import parse_info_subtask
 from .tasks import prerequisites_subtask
 from .tasks import bsdd_validation_subtask
+from .models import IngestedFile
 
 class ValidationTasksTestCase(TestCase):
 
@@ -216,6 +217,75 @@ class ValidationTasksTestCase(TestCase):
         self.assertIsNotNone(model)
         self.assertIsNone(model.produced_by)
 
+    @requires_django_user_context
+    def test_parse_info_task_reads_header_from_file(self):
+
+        request = ValidationRequest.objects.create(
+            file_name='pass_reverse_comment.ifc',
+            file='pass_reverse_comment.ifc', 
+            size=1
+        )
+        IngestedFile.objects.create(
+            request=request, sha256='0' * 64, size=1, line_count=1, is_step=True,
+            header_schema='IFC4', header_time_stamp='2023-01-02T03:04:05', header_mvd='ReferenceView'
+        )
+        request.mark_as_initiated()
+
+        parse_info_subtask(
+            prev_result={'is_valid': True, 'reason': 'test'}, 
+            id=request.id, 
+            file_name=request.file_name
+        )
+
+        # the file is opened anyway - its header wins over the one stored at upload
+        model = Model.objects.all().first()
+        self.assertEqual(model.schema, 'IFC4')
+        self.assertEqual(model.date, datetime.datetime(2022, 5, 4, 8, 8, 30, tzinfo=datetime.timezone.utc))
+        self.assertEqual(model.mvd, 'CoordinationView')
+
+    @requires_django_user_context
+    def test_parse_info_task_rejects_unsupported_stored_schema(self):
+
+        request = ValidationRequest.objects.create(
+            file_name='pass_reverse_comment.ifc',
+            file='pass_reverse_comment.ifc', 
+            size=1
+        )
+        IngestedFile.objects.create(request=request, sha256='0' * 64, size=1, line_count=1, is_step=True, header_schema='IFC99')
+        request.mark_as_initiated()
+
+        result = parse_info_subtask(
+            prev_result={'is_valid': True, 'reason': 'test'}, 
+            id=request.id, 
+            file_name=request.file_name
+        )
+
+        self.assertEqual(result, {'is_valid': False, 'reason': 'Unsupported schema: ifc99'})
+        self.assertIsNone(Model.objects.all().first())
+
+    @requires_django_user_context
+    def test_syntax_validation_task_rejects_stored_non_step_header(self):
+
+        request = ValidationRequest.objects.create(
+            file_name='valid_file.ifc',
+            file='valid_file.ifc', 
+            size=280
+        )
+        IngestedFile.objects.create(request=request, sha256='0' * 64, size=280, line_count=1, is_step=False)
+        request.mark_as_initiated()
+
+        result = syntax_validation_subtask(
+            prev_result={'is_valid': True, 'reason': 'test'}, 
+            id=request.id, 
+            file_name=request.file_name
+        )
+
+        self.assertFalse(result['is_valid'])
+        outcomes = ValidationOutcome.objects.all()
+        self.assertEqual(len(outcomes), 1)
+        self.assertEqual(outcomes.first().outcome_code, ValidationOutcome.ValidationOutcomeCode.SYNTAX_ERROR)
+        self.assertEqual(Model.objects.get().status_syntax, Model.Status.INVALID)
+
     @requires_django_user_context
     def test_schema_validation_task_creates_passed_validation_outcome(self):
 
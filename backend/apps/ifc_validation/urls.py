@@ -2,7 +2,7 @@ from django.urls import path
 
 from .views import ValidationRequestListAPIView, ValidationRequestDetailAPIView
 from .views import ValidationTaskListAPIView, ValidationTaskDetailAPIView
-from .views import ValidationOutcomeListAPIView, ValidationOutcomeDetailAPIView
+from .views import ValidationOutcomeListAPIView, ValidationOutcomeDetailAPIView, ValidationOutcomeSearchAPIView
 
 urlpatterns = [
     path('validationrequest/',          ValidationRequestListAPIView.as_view()),
@@ -10,5 +10,6 @@ urlpatterns = [
     path('validationtask/',             ValidationTaskListAPIView.as_view()),
     path('validationtask/<str:id>/',    ValidationTaskDetailAPIView.as_view()),
     path('validationoutcome/',          ValidationOutcomeListAPIView.as_view()),
+    path('validationoutcome/search/',   ValidationOutcomeSearchAPIView.as_view()),
     path('validationoutcome/<str:id>/', ValidationOutcomeDetailAPIView.as_view()),
 ]
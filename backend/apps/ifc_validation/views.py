@@ -11,20 +11,100 @@ from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.exceptions import APIException
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.authentication import SessionAuthentication, BasicAuthentication, TokenAuthentication
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 
 from apps.ifc_validation_models.models import set_user_context
 from apps.ifc_validation_models.models import ValidationRequest, ValidationTask, ValidationOutcome
 
 from .serializers import ValidationRequestSerializer
 from .serializers import ValidationTaskSerializer
-from .serializers import ValidationOutcomeSerializer
+from .serializers import ValidationOutcomeSerializer, ValidationOutcomeSearchSerializer
+from .filters import ValidationRequestFilter, ValidationTaskFilter, ValidationOutcomeFilter, ValidationOutcomeSearchFilter
+from .pagination import PaginatedListMixin, ValidationRequestCursorPagination, ValidationOutcomeSearchCursorPagination
+from .conditional import get_validators, get_not_modified_response, set_validators
 from .tasks import ifc_file_validation_task
+from .ingestion import stored_file_or_upload, store_ingestion_results
+from .prechecks import precheck_upload, reject_validation_request
+from .archival import get_archived_requests, schedule_restore
+
+from apps.ifc_validation_bff.snapshots import invalidate_report_snapshots
 
 logger = logging.getLogger(__name__)
 
+LIST_PARAMETERS = [
+    OpenApiParameter('cursor', str, description='Cursor of the page to return, as found in the next/previous links.'),
+    OpenApiParameter('page_size', int, description='Number of results per page (default: 100, max: 1000).'),
+    OpenApiParameter('fields', str, description='Comma-separated list of fields to return (default: all fields).'),
+    OpenApiParameter('created_after', str, description='Only return results created on or after this ISO 8601 date/time.'),
+    OpenApiParameter('created_before', str, description='Only return results created before this ISO 8601 date/time.'),
+]
+
+# seconds clients are asked to wait for archived outcomes to be restored
+ARCHIVED_RETRY_AFTER = 10
+
+
+class ArchivedOutcomesMixin:
+
+    """
+    Outcomes of archived Validation Requests (see archival.py) are not in the outcome tables until they are restored.
+    Asking for them (a single outcome, or a list narrowed down to a request or task) restores them in a task and
+    answers 202-Accepted with a Retry-After header meanwhile; other lists name the number of archived requests they
+    leave out in an X-Archived-Requests header.
+    """
+
+    def archived_response(self, requests):
+
+        requests = list(requests)
+        schedule_restore([r.id for r in requests])
+        public_ids = [r.public_id for r in requests]
+        data = {
+            'message': f"Outcomes of Validation Request(s) with id {', '.join(public_ids)} are archived and being restored - retry later.",
+            'archived': public_ids,
+        }
+        response = Response(data, status=status.HTTP_202_ACCEPTED)
+        response['Retry-After'] = str(ARCHIVED_RETRY_AFTER)
+        return response
+
+    def get_narrowed_requests(self, request, requests):
+
+        # the requests a list is narrowed down to (?request= or ?validation_task=), None if not narrowed down
+        params = request.query_params
+        try:
+            if params.get('request'):
+                return requests.filter(id=ValidationRequest.to_private_id(params['request']))
+            if params.get('validation_task'):
+                return requests.filter(tasks__id=ValidationTask.to_private_id(params['validation_task']))
+        except (ValueError, TypeError):
+            return requests.none()
+        return None
+
+    def archived_list_response(self, request, queryset, requests):
+
+        """
+        Returns a paginated Response (see list_response), or a 202-Accepted response when the list is narrowed
+        down to requests whose outcomes are archived.
+
+        Mandatory Args:
+           request: DRF request
+           queryset: all outcomes visible to the current user
+           requests: all Validation Requests visible to the current user
+        """
+
+        narrowed = self.get_narrowed_requests(request, requests)
+        if narrowed is not None:
+            archived = get_archived_requests(narrowed)
+            if archived.exists():
+                return self.archived_response(archived)
+            return self.list_response(request, queryset)
+
+        response = self.list_response(request, queryset)
+        archived_count = get_archived_requests(requests).count()
+        if archived_count:
+            response['X-Archived-Requests'] = str(archived_count)
+        return response
+
 
 class ValidationRequestDetailAPIView(APIView):
 
@@ -43,11 +123,17 @@ class ValidationRequestDetailAPIView(APIView):
         
         logger.info('API request - User IP: %s Request Method: %s Request URL: %s Content-Length: %s' % (get_client_ip_address(request), request.method, request.path, request.META.get('CONTENT_LENGTH')))
 
+        # unchanged since the client's last poll > 304-NotModified
+        validators = get_validators(ValidationRequest.objects.filter(created_by__id=request.user.id, deleted=False, id=id))
+        not_modified = get_not_modified_response(request, validators)
+        if not_modified:
+            return not_modified
+
         instance = ValidationRequest.objects.filter(created_by__id=request.user.id, deleted=False, id=id).first()
 
         if instance:
             serializer = ValidationRequestSerializer(instance)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return set_validators(Response(serializer.data, status=status.HTTP_200_OK), validators)
         else:
             data = {'message': f"Validation Request with id='{id}' does not exist for user with id='{request.user.id}'."}
             return Response(data, status=status.HTTP_404_NOT_FOUND)
@@ -64,6 +150,7 @@ class ValidationRequestDetailAPIView(APIView):
         instance = ValidationRequest.objects.filter(created_by__id=request.user.id, deleted=False).filter(id=id).first()
         if instance:
             instance.delete()
+            invalidate_report_snapshots(instance.id)
             data = {'message': f"Validation Request with id='{id}' was deleted successfully."}
             return Response(data, status=status.HTTP_204_NO_CONTENT)
         else:
@@ -71,26 +158,29 @@ class ValidationRequestDetailAPIView(APIView):
             return Response(data, status=status.HTTP_404_NOT_FOUND)
 
 
-class ValidationRequestListAPIView(APIView):
+class ValidationRequestListAPIView(PaginatedListMixin, APIView):
 
     queryset = ValidationRequest.objects.all()
     authentication_classes = [SessionAuthentication, TokenAuthentication, BasicAuthentication]
     permission_classes = [IsAuthenticated]
     parser_classes = (MultiPartParser, FormParser)
     serializer_class = ValidationRequestSerializer
+    pagination_class = ValidationRequestCursorPagination
+    filterset_class = ValidationRequestFilter
 
-    @extend_schema(operation_id='validationrequest_list')
+    @extend_schema(operation_id='validationrequest_list', parameters=LIST_PARAMETERS + [
+        OpenApiParameter('status', str, description='Comma-separated list of statuses.'),
+    ])
     def get(self, request, *args, **kwargs):
 
         """
-        Returns a list of all Validation Requests.
+        Returns a (paginated) list of all Validation Requests, newest first.
         """
 
         logger.info('API request - User IP: %s Request Method: %s Request URL: %s Content-Length: %s' % (get_client_ip_address(request), request.method, request.path, request.META.get('CONTENT_LENGTH')))
         
         all_user_instances = ValidationRequest.objects.filter(created_by__id=request.user.id, deleted=False)
-        serializer = self.serializer_class(all_user_instances, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return self.list_response(request, all_user_instances)
 
     @extend_schema(operation_id='validationrequest_create')
     def post(self, request, *args, **kwargs):
@@ -118,20 +208,23 @@ class ValidationRequestListAPIView(APIView):
                         if file_i is not None: files += file_i
                     logger.info(f"Received {len(files)} file(s) - files: {files}")
 
-                    # retrieve file size and save
+                    # file size was counted while streaming the upload; ingested files are already in storage
                     uploaded_file = serializer.validated_data
                     logger.info(f'uploaded_file = {uploaded_file}')
                     f = uploaded_file['file']
-                    f.seek(0, 2)
-                    file_length = f.tell()
                     file_name = uploaded_file['file_name']
-                    logger.info(f"file_length for uploaded file {file_name} = {file_length}")
+                    logger.info(f"file_length for uploaded file {file_name} = {f.size}")
 
-                    # can't use this, file hasn't been saved yet
-                    #file = os.path.join(MEDIA_ROOT, uploaded_file['file_name'])                   
-                    #uploaded_file['size'] = os.path.getsize(file)
-                    uploaded_file['size'] = file_length
+                    uploaded_file['size'] = f.size
+                    uploaded_file['file'] = stored_file_or_upload(f)
                     instance = serializer.save()
+                    store_ingestion_results(instance, f)
+
+                    # non-IFC files and unsupported schemas fail fast, without running the workflow
+                    rejection = precheck_upload(f)
+                    if rejection:
+                        reject_validation_request(instance, *rejection)
+                        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
                     # # submit task for background execution
                     def submit_task(instance):
@@ -175,28 +268,32 @@ class ValidationTaskDetailAPIView(APIView):
             return Response(data, status=status.HTTP_404_NOT_FOUND)
 
 
-class ValidationTaskListAPIView(APIView):
+class ValidationTaskListAPIView(PaginatedListMixin, APIView):
 
     queryset = ValidationTask.objects.all()
     authentication_classes = [SessionAuthentication, BasicAuthentication, TokenAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = ValidationTaskSerializer
+    filterset_class = ValidationTaskFilter
 
-    @extend_schema(operation_id='validationtask_list')
+    @extend_schema(operation_id='validationtask_list', parameters=LIST_PARAMETERS + [
+        OpenApiParameter('request', str, description='Public id of a Validation Request.'),
+        OpenApiParameter('type', str, description='Comma-separated list of task types (eg. SYNTAX,SCHEMA).'),
+        OpenApiParameter('status', str, description='Comma-separated list of statuses.'),
+    ])
     def get(self, request, *args, **kwargs):
 
         """
-        Returns a list of all Validation Tasks.
+        Returns a (paginated) list of all Validation Tasks.
         """
 
         logger.info('API request - User IP: %s Request Method: %s Request URL: %s Content-Length: %s' % (get_client_ip_address(request), request.method, request.path, request.META.get('CONTENT_LENGTH')))
         
         all_user_instances = ValidationTask.objects.filter(request__created_by__id=request.user.id, request__deleted=False)
-        serializer = self.serializer_class(all_user_instances, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return self.list_response(request, all_user_instances)
 
 
-class ValidationOutcomeDetailAPIView(APIView):
+class ValidationOutcomeDetailAPIView(ArchivedOutcomesMixin, APIView):
 
     queryset = ValidationOutcome.objects.all()
     authentication_classes = [SessionAuthentication, BasicAuthentication, TokenAuthentication]
@@ -216,28 +313,74 @@ class ValidationOutcomeDetailAPIView(APIView):
         if instance:
             serializer = ValidationOutcomeSerializer(instance)
             return Response(serializer.data, status=status.HTTP_200_OK)
-        else:
-            data = {'message': f"Validation Outcome with id='{id}' does not exist for user with id='{request.user.id}'."}
-            return Response(data, status=status.HTTP_404_NOT_FOUND)
 
+        # the outcome may be archived
+        if str(id).isdigit():
+            archived = get_archived_requests(ValidationRequest.objects.filter(created_by__id=request.user.id, deleted=False), outcome_id=int(id))
+            if archived.exists():
+                return self.archived_response(archived)
+
+        data = {'message': f"Validation Outcome with id='{id}' does not exist for user with id='{request.user.id}'."}
+        return Response(data, status=status.HTTP_404_NOT_FOUND)
 
-class ValidationOutcomeListAPIView(APIView):
+
+class ValidationOutcomeListAPIView(ArchivedOutcomesMixin, PaginatedListMixin, APIView):
 
     queryset = ValidationOutcome.objects.all()
     authentication_classes = [SessionAuthentication, BasicAuthentication, TokenAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = ValidationOutcomeSerializer
-
-    @extend_schema(operation_id='validationoutcome_list')
+    filterset_class = ValidationOutcomeFilter
+
+    @extend_schema(operation_id='validationoutcome_list', parameters=LIST_PARAMETERS + [
+        OpenApiParameter('request', str, description='Public id of a Validation Request.'),
+        OpenApiParameter('validation_task', str, description='Public id of a Validation Task.'),
+        OpenApiParameter('task_type', str, description='Comma-separated list of task types (eg. SYNTAX,SCHEMA).'),
+        OpenApiParameter('severity', str, description='Comma-separated list of severities, by value or name (eg. 4 or ERROR).'),
+        OpenApiParameter('outcome_code', str, description='Comma-separated list of outcome codes (eg. E00020).'),
+    ])
     def get(self, request, *args, **kwargs):
 
         """
-        Returns a list of all Validation Outcomes.
+        Returns a (paginated) list of all Validation Outcomes.
+        Outcomes of archived Validation Requests are restored on demand: see ArchivedOutcomesMixin.
         """
 
         logger.info('API request - User IP: %s Request Method: %s Request URL: %s Content-Length: %s' % (get_client_ip_address(request), request.method, request.path, request.META.get('CONTENT_LENGTH')))
         
         all_user_instances = ValidationOutcome.objects.filter(validation_task__request__created_by__id=request.user.id, validation_task__request__deleted=False)
-        serializer = self.serializer_class(all_user_instances, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        all_user_requests = ValidationRequest.objects.filter(created_by__id=request.user.id, deleted=False)
+        return self.archived_list_response(request, all_user_instances, all_user_requests)
+
+
+class ValidationOutcomeSearchAPIView(ArchivedOutcomesMixin, PaginatedListMixin, APIView):
+
+    queryset = ValidationOutcome.objects.all()
+    authentication_classes = [SessionAuthentication, BasicAuthentication, TokenAuthentication]
+    permission_classes = [IsAdminUser]
+    serializer_class = ValidationOutcomeSearchSerializer
+    pagination_class = ValidationOutcomeSearchCursorPagination
+    filterset_class = ValidationOutcomeSearchFilter
+
+    @extend_schema(operation_id='validationoutcome_search', parameters=LIST_PARAMETERS + [
+        OpenApiParameter('q', str, description='Words or "phrases" to find in the rule (feature) or messages of an outcome - all must match.'),
+        OpenApiParameter('feature', str, description='Rule (feature) name or code, or part of it (eg. ALB001).'),
+        OpenApiParameter('feature_version', str, description='Comma-separated list of rule versions.'),
+        OpenApiParameter('severity', str, description='Comma-separated list of severities, by value or name (eg. 4 or ERROR).'),
+        OpenApiParameter('outcome_code', str, description='Comma-separated list of outcome codes (eg. E00020).'),
+        OpenApiParameter('task_type', str, description='Comma-separated list of task types (eg. SYNTAX,SCHEMA).'),
+        OpenApiParameter('authoring_tool', str, description='Public id of an Authoring Tool.'),
+        OpenApiParameter('authoring_tool_name', str, description='Authoring Tool name, or part of it.'),
+    ])
+    def get(self, request, *args, **kwargs):
+
+        """
+        Searches the Validation Outcomes of all users (admin only), most recent first.
+        Outcomes of archived Validation Requests are restored on demand: see ArchivedOutcomesMixin.
+        """
+
+        logger.info('API request - User IP: %s Request Method: %s Request URL: %s Content-Length: %s' % (get_client_ip_address(request), request.method, request.path, request.META.get('CONTENT_LENGTH')))
+
+        all_instances = ValidationOutcome.objects.filter(validation_task__request__deleted=False)
+        return self.archived_list_response(request, all_instances, ValidationRequest.objects.filter(deleted=False))
 
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LegacyBffConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.ifc_validation_bff'
+
+    def ready(self):
+        from . import signals  # noqa: F401 - registers signal receivers
@@ -0,0 +1,128 @@
+import time
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# IMPORTANT
+#
+# Shared (Redis) cache for the BFF - see CACHES in settings.
+# Per-user data (dashboard pages/counts) is keyed on a per-user version, which is bumped whenever one of the
+# user's Validation Requests (or their Model) changes (see signals.py) - stale entries are never read again
+# and simply expire. Hits and misses are counted per cache name, shared across all workers.
+# The current user is resolved from the session (user id, see views_legacy.get_current_user) and cached by id;
+# it is invalidated whenever the user is saved or deleted, and on (bulk) activation changes in the admin.
+
+CACHE_NAMES = ('user', 'dashboard', 'report')
+DEFAULT_TIMEOUT = 300
+
+MISSING = object()
+
+
+def get_timeout(name):
+
+    return getattr(settings, 'BFF_CACHE_TIMEOUTS', {}).get(name, DEFAULT_TIMEOUT)
+
+
+def get_metrics_key(name, hit):
+
+    return f"bff:metrics:{name}:{'hits' if hit else 'misses'}"
+
+
+def record_access(name, hit):
+
+    key = get_metrics_key(name, hit)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # first access (or evicted) - add() keeps concurrent workers from resetting each other's counts
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_metrics():
+
+    """
+    Returns hits, misses and hit ratio per cache name (since the counters were last reset).
+    """
+
+    keys = {(name, hit): get_metrics_key(name, hit) for name in CACHE_NAMES for hit in (True, False)}
+    values = cache.get_many(keys.values())
+
+    metrics = {}
+    for name in CACHE_NAMES:
+        hits = values.get(keys[(name, True)], 0)
+        misses = values.get(keys[(name, False)], 0)
+        metrics[name] = {'hits': hits, 'misses': misses, 'ratio': hits / (hits + misses) if hits + misses else None}
+    return metrics
+
+
+def reset_metrics():
+
+    cache.delete_many([get_metrics_key(name, hit) for name in CACHE_NAMES for hit in (True, False)])
+
+
+def get_or_set(name, key, compute):
+
+    """
+    Returns a cached value, or computes and caches it (None is a valid value).
+
+    Mandatory Args:
+       name: cache name, for metrics and timeout (one of CACHE_NAMES)
+       key: cache key
+       compute: function returning the value on a miss
+    """
+
+    value = cache.get(key, MISSING)
+    record_access(name, value is not MISSING)
+    if value is MISSING:
+        value = compute()
+        cache.set(key, value, get_timeout(name))
+    return value
+
+
+def get_user_version_key(user_id):
+
+    return f'bff:user:{user_id}:version'
+
+
+def get_user_version(user_id):
+
+    key = get_user_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # a fresh (time-based) version, so entries cached before an eviction are never read again
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_user(user_id):
+
+    """
+    Invalidates all cached per-user (dashboard) data.
+    """
+
+    cache.set(get_user_version_key(user_id), time.time_ns(), timeout=None)
+
+
+def get_user_cache_key(user_id, *parts):
+
+    return ':'.join(['bff', 'user', str(user_id), str(get_user_version(user_id))] + [str(part) for part in parts])
+
+
+def get_user_id_key(user_id):
+
+    return f'bff:userid:{user_id}'
+
+
+def set_user(user):
+
+    cache.set(get_user_id_key(user.id), user, get_timeout('user'))
+
+
+def invalidate_user_ids(user_ids):
+
+    cache.delete_many([get_user_id_key(user_id) for user_id in user_ids])
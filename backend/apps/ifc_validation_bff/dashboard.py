@@ -0,0 +1,197 @@
+import base64
+import logging
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Q
+
+from apps.ifc_validation_models.models import IdObfuscator
+from apps.ifc_validation_models.models import ValidationRequest
+
+from . import caching
+from .reports import status_combine
+
+logger = logging.getLogger(__name__)
+
+# IMPORTANT
+#
+# Dashboard rows are fetched as a single joined values() query (Validation Request + Model + Authoring Tool)
+# and paginated on (created, id) - no OFFSET, no per-row lazy loading and no COUNT(*) per page.
+# Pages are cached per user (see caching.py) until one of the user's Validation Requests changes.
+# Counts are per-user counters, adjusted when a Validation Request is created, (soft) deleted or restored
+# (see signals.py) and only counted again once expired or evicted.
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+DASHBOARD_FIELDS = (
+    'id', 'file_name', 'created', 'created_by_id', 'status', 'progress', 'size',
+    'model__date', 'model__license', 'model__schema', 'model__mvd',
+    'model__number_of_elements', 'model__number_of_geometries', 'model__number_of_properties',
+    'model__produced_by__name',
+    'model__status_syntax', 'model__status_schema', 'model__status_prereq', 'model__status_bsdd',
+    'model__status_mvd', 'model__status_ids', 'model__status_ia', 'model__status_ip',
+    'model__status_industry_practices',
+)
+
+
+def format_request_values(row):
+
+    """
+    Same projection as reports.format_request(), but from a values() row (see DASHBOARD_FIELDS).
+    """
+
+    def status(field):
+        value = row[f'model__{field}']
+        return "p" if value is None else value
+
+    def value_or(field, default):
+        value = row[f'model__{field}']
+        return default if value is None else value
+
+    public_id = ValidationRequest.to_public_id(row['id'])
+    return {
+        "id": public_id,
+        "code": public_id,
+        "filename": row['file_name'],
+        "file_date": None if row['model__date'] is None else datetime.strftime(row['model__date'], '%Y-%m-%d %H:%M:%S'), # TODO - formatting is actually a UI concern...
+        "user_id": IdObfuscator.to_public_id(row['created_by_id'], override_cls=User),
+        "progress": -2 if row['status'] == ValidationRequest.Status.FAILED else (-1 if row['status'] == ValidationRequest.Status.PENDING else row['progress']),
+        "date": datetime.strftime(row['created'], '%Y-%m-%d %H:%M:%S'), # TODO - formatting is actually a UI concern...
+        "license": value_or('license', '-'),
+        "number_of_elements": row['model__number_of_elements'],
+        "number_of_geometries": row['model__number_of_geometries'],
+        "number_of_properties": row['model__number_of_properties'],
+        "authoring_application": value_or('produced_by__name', '-'),
+        "schema": value_or('schema', '-'),
+        "size": row['size'],
+        "mvd": value_or('mvd', '-'),
+        "status_syntax": status('status_syntax'),
+        "status_schema": status_combine(status('status_schema'), status('status_prereq')),
+        "status_bsdd": status('status_bsdd'),
+        "status_mvd": status('status_mvd'),
+        "status_ids": status('status_ids'),
+        "status_rules": status_combine(status('status_ia'), status('status_ip')),
+        "status_ind": status('status_industry_practices'),
+        "deleted": 0, # TODO
+        "commit_id": None #  TODO
+    }
+
+
+def get_user_requests(user_id):
+
+    return ValidationRequest.objects.filter(created_by__id=user_id, deleted=False)
+
+
+def encode_cursor(row):
+
+    value = f"{row['created'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(value.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+
+    """
+    Returns:
+       (created, id) tuple of the last row of the previous page, or None if the cursor is empty or invalid.
+    """
+
+    if not cursor:
+        return None
+    try:
+        value = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        created, id = value.rsplit('|', 1)
+        return datetime.fromisoformat(created), int(id)
+    except (ValueError, UnicodeDecodeError):
+        logger.warning(f"Ignoring invalid dashboard cursor '{cursor}'")
+        return None
+
+
+def get_dashboard_page(user_id, cursor=None, limit=DEFAULT_PAGE_SIZE):
+
+    """
+    Returns a page of a user's Validation Requests (newest first), using keyset pagination.
+    Pages are cached until one of the user's Validation Requests changes.
+
+    Mandatory Args:
+       user_id: id of the current user
+
+    Optional Args:
+       cursor: opaque cursor returned as 'next' for the previous page
+       limit: number of rows per page (capped at MAX_PAGE_SIZE)
+
+    Returns:
+       Tuple of (list of formatted rows, cursor for the next page or None).
+    """
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    def query():
+
+        queryset = get_user_requests(user_id)
+
+        position = decode_cursor(cursor)
+        if position:
+            created, id = position
+            queryset = queryset.filter(Q(created__lt=created) | Q(created=created, id__lt=id))
+
+        # one extra row tells whether there is a next page
+        rows = list(queryset.order_by('-created', '-id').values(*DASHBOARD_FIELDS)[:limit + 1])
+        next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+
+        return [format_request_values(row) for row in rows[:limit]], next_cursor
+
+    return caching.get_or_set('dashboard', caching.get_user_cache_key(user_id, 'page', cursor or '', limit), query)
+
+
+def get_dashboard_slice(user_id, start, end):
+
+    """
+    Returns rows [start:end] of a user's Validation Requests (newest first) - legacy offset pagination.
+    Slices are cached until one of the user's Validation Requests changes.
+    """
+
+    def query():
+        rows = get_user_requests(user_id).order_by('-created', '-id').values(*DASHBOARD_FIELDS)[start:end]
+        return [format_request_values(row) for row in rows]
+
+    return caching.get_or_set('dashboard', caching.get_user_cache_key(user_id, 'slice', start, end), query)
+
+
+def get_count_key(user_id):
+
+    return f'bff:user:{user_id}:count'
+
+
+def get_dashboard_count(user_id):
+
+    """
+    Returns the number of (non-deleted) Validation Requests of a user, from a maintained counter.
+    """
+
+    key = get_count_key(user_id)
+    count = cache.get(key)
+    caching.record_access('dashboard', count is not None)
+    if count is None:
+        count = get_user_requests(user_id).count()
+        # add(), so a concurrent adjustment isn't overwritten; expires in case one was lost meanwhile
+        cache.add(key, count, caching.get_timeout('dashboard'))
+    return count
+
+
+def adjust_dashboard_count(user_id, delta):
+
+    """
+    Adds 'delta' to the counter of a user's Validation Requests (negative for deletes), if it is counted.
+    """
+
+    try:
+        cache.incr(get_count_key(user_id), delta)
+    except ValueError:
+        pass  # not counted (anymore) - counted on the next read
+
+
+def invalidate_dashboard(user_id):
+
+    caching.invalidate_user(user_id)
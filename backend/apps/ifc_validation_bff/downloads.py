@@ -0,0 +1,163 @@
+import os
+import re
+import logging
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def accepts_gzip(request):
+
+    """
+    Returns True if the client accepts a gzip Content-Encoding (and did not disable it via q=0).
+    """
+
+    for coding in request.META.get('HTTP_ACCEPT_ENCODING', '').lower().split(','):
+        name, _, params = coding.partition(';')
+        if name.strip() != 'gzip':
+            continue
+        quality = params.strip().removeprefix('q=') or '1'
+        try:
+            return float(quality) > 0
+        except ValueError:
+            return False
+    return False
+
+
+def parse_range_header(header, size):
+
+    """
+    Parses a single byte range of an HTTP Range header (RFC 9110, section 14.1.2).
+
+    Mandatory Args:
+       header: value of the Range header, eg. 'bytes=0-1023', 'bytes=1024-' or 'bytes=-512'
+       size: size of the representation in bytes
+
+    Returns:
+       None if the header should be ignored (missing, malformed or multiple ranges),
+       False if the range is not satisfiable, otherwise an inclusive (start, end) tuple.
+    """
+
+    match = _RANGE_PATTERN.match(header.replace(' ', '')) if header else None
+    if match is None:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # suffix range: last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            return False
+        return (max(size - length, 0), size - 1)
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        return False
+    return (start, end)
+
+
+def read_file_range(path, start, length, chunk_size=DOWNLOAD_CHUNK_SIZE):
+
+    """
+    Yields `length` bytes of a file starting at offset `start`, in chunks.
+    """
+
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def file_etag(stat):
+
+    # same format as nginx, so validators stay stable when switching between both ways of serving
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def serve_file(request, name, download_name, content_type='application/x-step'):
+
+    """
+    Sends a file from MEDIA_ROOT back to the client without loading it in memory.
+
+    When USE_X_ACCEL_REDIRECT is enabled, the response only carries an X-Accel-Redirect header
+    and nginx serves the file itself (incl. Range, conditional requests and compression).
+    Otherwise the file is streamed by Django, honouring Range/If-Range, If-None-Match/If-Modified-Since
+    and a pre-compressed '.gz' sibling when the client accepts gzip.
+
+    Mandatory Args:
+       request: incoming HttpRequest
+       name: storage name of the file, relative to MEDIA_ROOT
+       download_name: file name suggested to the client
+
+    Returns:
+       HttpResponse (or subclass) to return from the view.
+    """
+
+    disposition = f"attachment; filename=\"{download_name}\"; filename*=UTF-8''{quote(download_name)}"
+
+    if getattr(settings, 'USE_X_ACCEL_REDIRECT', False):
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = getattr(settings, 'X_ACCEL_REDIRECT_PREFIX', '/protected_files/') + quote(name)
+        response['Content-Disposition'] = disposition
+        logger.debug(f"Handing off download of '{name}' to nginx")
+        return response
+
+    path = os.path.join(os.path.abspath(settings.MEDIA_ROOT), name)
+    content_encoding = None
+    if accepts_gzip(request) and os.path.isfile(path + '.gz'):
+        path += '.gz'
+        content_encoding = 'gzip'
+
+    stat = os.stat(path)
+    etag = file_etag(stat)
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+
+        byte_range = parse_range_header(request.META.get('HTTP_RANGE'), stat.st_size)
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if byte_range is not None and if_range and if_range != etag and parse_http_date_safe(if_range) != last_modified:
+            byte_range = None  # representation changed, send all of it
+
+        if byte_range is False:
+            response = HttpResponse(status=416, content_type=content_type)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+        elif byte_range is not None:
+            start, end = byte_range
+            response = StreamingHttpResponse(read_file_range(path, start, end - start + 1), status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = str(end - start + 1)
+        else:
+            # FileResponse uses wsgi.file_wrapper (sendfile) when the server supports it
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+            response['Content-Length'] = str(stat.st_size)
+
+        response['Content-Disposition'] = disposition
+        if content_encoding:
+            response['Content-Encoding'] = content_encoding
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Vary'] = 'Accept-Encoding'
+    return response
@@ -0,0 +1,127 @@
+import os
+import re
+import json
+import logging
+import tempfile
+import functools
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# IMPORTANT
+#
+# Index of the Gherkin rules (.feature files), keyed by '<code>/<version>' eg. 'ALB001/1'.
+# It is written once by 'manage.py build_feature_index' (see server/worker entrypoints) and
+# loaded by each process on first use, so rendering a report never scans the features folder.
+
+FEATURES_FOLDER = os.path.join(os.path.dirname(os.path.realpath(__file__)), '../ifc_validation/checks/ifc_gherkin_rules/features')
+
+_VERSION_TAG_PATTERN = re.compile(r'@version(\d+)\b')
+
+
+def parse_feature_file(path):
+
+    """
+    Parses a Gherkin feature file for its @version tag(s) and its description (text between 'Feature:' and the first Scenario/Background).
+
+    Returns:
+       Tuple of (set of versions, description).
+    """
+
+    versions = set()
+    description = ''
+    reading = False
+    done = False
+
+    with open(path, 'r') as input:
+        for line in input:
+            versions.update(_VERSION_TAG_PATTERN.findall(line))
+            if done:
+                continue
+            if 'Feature:' in line:
+                reading = True
+            if any(keyword in line for keyword in ['Scenario:', 'Background:', 'Scenario Outline:']):
+                done = True
+                continue
+            if reading and len(line.strip()) > 0 and 'Feature:' not in line and '@' not in line:
+                description += '\n' + line.strip()
+
+    return versions, description
+
+
+def build_feature_index(folder=FEATURES_FOLDER, feature_url=None):
+
+    """
+    Builds the feature index for all .feature files in a folder.
+
+    Returns:
+       Dictionary of '<code>/<version>' to {'file', 'url', 'description'}.
+    """
+
+    feature_url = getattr(settings, 'FEATURE_URL', '') if feature_url is None else feature_url
+
+    index = {}
+    for file_name in sorted(os.fsdecode(f) for f in os.listdir(folder)):
+        if not file_name.endswith('.feature'):
+            continue
+        versions, description = parse_feature_file(os.path.join(folder, file_name))
+        code = file_name[0:6]
+        for version in versions:
+            # keep the first match, as the previous folder scan did
+            index.setdefault(f'{code}/{version}', {
+                'file': file_name,
+                'url': feature_url + file_name,
+                'description': description
+            })
+
+    return index
+
+
+def write_feature_index(path, index):
+
+    """
+    Writes the feature index to a JSON file, atomically (readers never see a partial file).
+    """
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(index, f, separators=(',', ':'), sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+@functools.lru_cache(maxsize=1)
+def get_feature_index():
+
+    """
+    Returns the feature index, loaded from FEATURE_INDEX_FILE - or built in-process when that file is missing (eg. local development).
+    """
+
+    path = getattr(settings, 'FEATURE_INDEX_FILE', None)
+    if path and os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    logger.warning(f"Feature index '{path}' not found, building it in-process (run 'manage.py build_feature_index')")
+    try:
+        return build_feature_index()
+    except FileNotFoundError as err:
+        logger.error(f"Unable to build feature index: {err}")
+        return {}
+
+
+def get_feature(feature_code, feature_version):
+
+    return get_feature_index().get(f'{feature_code}/{feature_version}')
+
+
+def get_feature_url(feature_code, feature_version):
+
+    feature = get_feature(feature_code, feature_version)
+    return None if feature is None else feature['url']
+
+
+def get_feature_description(feature_code, feature_version):
+
+    feature = get_feature(feature_code, feature_version)
+    return None if feature is None else feature['description']
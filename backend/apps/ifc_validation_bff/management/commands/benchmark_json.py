@@ -0,0 +1,119 @@
+import json
+import uuid
+import random
+import timeit
+import datetime
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+from django.test import override_settings
+from rest_framework.renderers import JSONRenderer
+
+from core.renderers import FastJsonResponse, FastJSONRenderer, json_dumps
+
+from apps.ifc_validation_bff.reports import StreamingJSONWriter
+
+
+def generate_report_payload(number_of_outcomes, seed=42):
+
+    """
+    Generates a payload shaped like a (legacy) BFF report with Gherkin outcomes and instances.
+    """
+
+    rng = random.Random(seed)
+    outcomes = []
+    instances = {}
+    for i in range(number_of_outcomes):
+        instance_id = f'm{rng.randint(1, number_of_outcomes // 4 + 1) * 7 + 3}'
+        instances[instance_id] = {'guid': f'#{rng.randint(1, 10**6)}', 'type': rng.choice(['IfcWall', 'IfcSlab', 'IfcAlignment'])}
+        outcomes.append({
+            'id': f'o{i * 7 + 3}',
+            'feature': 'ALB001 - Alignment in spatial structure',
+            'feature_version': 1,
+            'feature_url': 'https://github.com/buildingSMART/ifc-gherkin-rules/blob/main/features/ALB001_Alignment-in-spatial-structure.feature',
+            'feature_text': '\nThe rule verifies that each IfcAlignment is aggregated by IfcProject.',
+            'step': 'Error',
+            'severity': 4,
+            'instance_id': instance_id,
+            'expected': {'value': 'IfcProject'},
+            'observed': {'value': 'IfcSite', 'oid': rng.randint(1, 10**6)},
+            'message': "Expected 'IfcProject' / observed 'IfcSite' – ‘non-ASCII’ text",
+            'task_id': f't{i % 5 * 7 + 3}',
+            'msg': None,
+        })
+
+    return {
+        'model': {'id': 'r10', 'filename': 'model.ifc', 'date': '2024-05-01 10:00:00', 'size': 1234567},
+        'results': {'norm_rules_results': outcomes},
+        'instances': instances,
+    }
+
+
+def generate_api_payload(number_of_outcomes, seed=42):
+
+    """
+    Generates a payload shaped like the DRF outcome list (datetime, UUID and Decimal values included).
+    """
+
+    rng = random.Random(seed)
+    created = datetime.datetime(2024, 5, 1, 10, 0, 0, 123456, tzinfo=datetime.timezone.utc)
+    return [{
+        'public_id': f'o{i * 7 + 3}',
+        'instance_public_id': f'i{rng.randint(1, 10**6)}',
+        'validation_task_public_id': f't{i % 5 * 7 + 3}',
+        'feature': 'SPS001 - Basic spatial structure for buildings',
+        'feature_version': 1,
+        'severity': 'ERROR',
+        'outcome_code': 'E00020',
+        'expected': None,
+        'observed': {'value': 'IfcBuildingStorey', 'oid': rng.randint(1, 10**6)},
+        'created': created + datetime.timedelta(seconds=i),
+        'updated': None,
+        'uuid': uuid.UUID(int=rng.getrandbits(128)),
+        'duration': Decimal('1.250'),
+    } for i in range(number_of_outcomes)]
+
+
+class Command(BaseCommand):
+
+    help = "Compares the stdlib and orjson encoders on report- and API-shaped payloads."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--outcomes', type=int, default=100_000, help='Number of outcomes in the generated payloads')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of timed runs; the fastest is reported')
+
+    def measure(self, label, func, repeat):
+
+        best = min(timeit.repeat(func, number=1, repeat=repeat))
+        self.stdout.write(f"{label:<48} {best * 1000:>10.1f} ms")
+        return best
+
+    def handle(self, *args, **options):
+
+        n, repeat = options['outcomes'], options['repeat']
+        report = generate_report_payload(n)
+        api = generate_api_payload(n)
+        self.stdout.write(f"Payloads: {n:,} outcomes - report {len(json_dumps(report)):,} bytes, API {len(JSONRenderer().render(api)):,} bytes")
+
+        results = []
+        with override_settings(JSON_RENDERER='json'):
+            stdlib = self.measure('BFF report - JsonResponse (stdlib)', lambda: JsonResponse(report), repeat)
+            streamed = self.measure('BFF report - streamed (stdlib)', lambda: b''.join(StreamingJSONWriter().array(report['results']['norm_rules_results'])), repeat)
+        with override_settings(JSON_RENDERER='orjson'):
+            results.append(('BFF report', stdlib, self.measure('BFF report - FastJsonResponse (orjson)', lambda: FastJsonResponse(report), repeat)))
+            results.append(('BFF report (streamed)', streamed, self.measure('BFF report - streamed (orjson)', lambda: b''.join(StreamingJSONWriter().array(report['results']['norm_rules_results'])), repeat)))
+
+        drf = self.measure('API outcomes - JSONRenderer (stdlib)', lambda: JSONRenderer().render(api), repeat)
+        with override_settings(JSON_RENDERER='orjson'):
+            results.append(('API outcomes', drf, self.measure('API outcomes - FastJSONRenderer (orjson)', lambda: FastJSONRenderer().render(api), repeat)))
+
+            # sanity check: both encoders must produce the same document
+            assert json.loads(FastJSONRenderer().render(api)) == json.loads(JSONRenderer().render(api))
+            assert json.loads(FastJsonResponse(report).content) == json.loads(json.dumps(report, cls=DjangoJSONEncoder))
+
+        for label, baseline, fast in results:
+            self.stdout.write(self.style.SUCCESS(f"{label}: {baseline / fast:.1f}x faster with orjson"))
@@ -0,0 +1,69 @@
+import json
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.ifc_validation_models.decorators import requires_django_user_context
+from apps.ifc_validation_models.models import ValidationRequest, ValidationTask, ValidationOutcome
+
+from apps.ifc_validation.serializers import ValidationOutcomeSerializer
+from apps.ifc_validation.projections import get_projection
+
+
+class Command(BaseCommand):
+
+    help = "Compares the API serializers with their values() projections on generated Validation Outcomes (rolled back afterwards)."
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--outcomes', type=int, default=10_000, help='Number of generated Validation Outcomes')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of timed runs; the fastest is reported')
+
+    def measure(self, label, func, repeat):
+
+        best = min(timeit.repeat(func, number=1, repeat=repeat))
+        self.stdout.write(f"{label:<52} {best * 1000:>10.1f} ms")
+        return best
+
+    @requires_django_user_context
+    def handle(self, *args, **options):
+
+        n, repeat = options['outcomes'], options['repeat']
+
+        with transaction.atomic():
+
+            request = ValidationRequest.objects.create(file_name='benchmark.ifc', file='benchmark.ifc', size=0)
+            task = ValidationTask.objects.create(request=request, type=ValidationTask.Type.NORMATIVE_IA)
+            ValidationOutcome.objects.bulk_create([ValidationOutcome(
+                validation_task=task,
+                feature='ALB001 - Alignment in spatial structure',
+                feature_version=1,
+                severity=ValidationOutcome.OutcomeSeverity.ERROR,
+                outcome_code=ValidationOutcome.ValidationOutcomeCode.VALUE_ERROR,
+                expected={'value': 'IfcProject'},
+                observed={'value': 'IfcSite', 'oid': i},
+            ) for i in range(n)], batch_size=1000)
+
+            queryset = ValidationOutcome.objects.filter(validation_task=task).order_by('id')
+            projection = get_projection(ValidationOutcomeSerializer)
+            fields = tuple(projection.entries)  # hyperlinked fields are not part of the projection
+            plan = projection.plan
+
+            # query + serialization
+            serializer = self.measure('ModelSerializer (instances)', lambda: ValidationOutcomeSerializer(queryset.select_related('validation_task'), many=True, fields=fields).data, repeat)
+            projected = self.measure('Projection (values)', lambda: plan.project_all(queryset.values(*plan.columns)), repeat)
+
+            # serialization only
+            instances, rows = list(queryset.select_related('validation_task')), list(queryset.values(*plan.columns))
+            serializer_only = self.measure('ModelSerializer (instances) - serialization only', lambda: ValidationOutcomeSerializer(instances, many=True, fields=fields).data, repeat)
+            projected_only = self.measure('Projection (values) - serialization only', lambda: plan.project_all(rows), repeat)
+
+            # sanity check: both must produce the same document
+            expected = ValidationOutcomeSerializer(queryset.select_related('validation_task'), many=True, fields=fields).data
+            assert json.loads(json.dumps(plan.project_all(queryset.values(*plan.columns)))) == json.loads(json.dumps(expected))
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS(f"{n:,} outcomes: {serializer / projected:.1f}x faster with the projection ({n / projected:,.0f} rows/s)"))
+        self.stdout.write(self.style.SUCCESS(f"{n:,} outcomes, serialization only: {serializer_only / projected_only:.1f}x faster with the projection"))
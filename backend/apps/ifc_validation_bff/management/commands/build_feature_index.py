@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+
+from apps.ifc_validation_bff.features import FEATURES_FOLDER, build_feature_index, write_feature_index
+
+
+class Command(BaseCommand):
+
+    help = "Parses all Gherkin .feature files once into the feature index used to render reports."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--folder', default=FEATURES_FOLDER, help='Folder containing the .feature files')
+        parser.add_argument('--output', default=getattr(settings, 'FEATURE_INDEX_FILE', 'feature_index.json'), help='Path of the generated index (JSON)')
+
+    def handle(self, *args, **options):
+
+        try:
+            index = build_feature_index(options['folder'])
+        except FileNotFoundError as err:
+            raise CommandError(f"Unable to build feature index - are the submodules fetched? ({err})")
+        write_feature_index(options['output'], index)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(index)} feature(s) to '{options['output']}'"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from apps.ifc_validation_bff.caching import get_metrics, reset_metrics
+
+
+class Command(BaseCommand):
+
+    help = "Shows hits/misses of the shared BFF caches (user lookups, dashboard pages, report snapshots)."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--reset', action='store_true', help='Resets the counters after showing them')
+
+    def handle(self, *args, **options):
+
+        for name, metrics in get_metrics().items():
+            ratio = '-' if metrics['ratio'] is None else f"{metrics['ratio']:.1%}"
+            self.stdout.write(f"{name:<12} hits: {metrics['hits']:>10,}  misses: {metrics['misses']:>10,}  hit ratio: {ratio:>6}")
+
+        if options['reset']:
+            reset_metrics()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
@@ -0,0 +1,330 @@
+import re
+import json
+import itertools
+from datetime import datetime
+import logging
+
+from django.contrib.auth.models import User
+
+from apps.ifc_validation_models.models import IdObfuscator
+from apps.ifc_validation_models.models import ValidationRequest
+from apps.ifc_validation_models.models import ValidationTask
+from apps.ifc_validation_models.models import ValidationOutcome
+from apps.ifc_validation_models.models import ModelInstance
+from apps.ifc_validation_models.models import Model
+
+from core.renderers import get_json_dumps
+from apps.ifc_validation.messages import render_message, load_templates
+
+from .features import get_feature_url, get_feature_description
+
+logger = logging.getLogger(__name__)
+
+# IMPORTANT
+#
+# Query layer for the (legacy) BFF report: every report type is built from a fixed number of queries,
+# regardless of the number of outcomes (one for the request, one for its tasks, one per task for its outcomes).
+
+OUTCOMES_CHUNK_SIZE = 2000
+STREAMING_BATCH_SIZE = 500
+
+GHERKIN_REPORT_GROUPING = (
+    ('normative', (ValidationTask.Type.NORMATIVE_IA, ValidationTask.Type.NORMATIVE_IP)),
+    ('prerequisites', (ValidationTask.Type.PREREQUISITES,)),
+    ('industry', (ValidationTask.Type.INDUSTRY_PRACTICES,)))
+
+GHERKIN_RESULT_KEYS = {
+    'normative': 'norm_rules_results',
+    'prerequisites': 'prereq_rules_results',
+    'industry': 'ind_rules_results'
+}
+
+REPORT_RESULT_KEYS = (
+    'syntax_results', 'schema_results', 'bsdd_results',
+    'norm_rules_results', 'ind_rules_results', 'prereq_rules_results')
+
+
+def status_combine(*args):
+    statuses = "-pvnwi"
+    return statuses[max(map(statuses.index, args))]
+
+
+def format_request(request):
+
+    # NOTE: expects request.model and request.model.produced_by to be loaded via select_related() (see get_report_requests)
+    return {
+        "id": request.public_id,
+        "code": request.public_id,
+        "filename": request.file_name,
+        "file_date": None if request.model is None or request.model.date is None else datetime.strftime(request.model.date, '%Y-%m-%d %H:%M:%S'), # TODO - formatting is actually a UI concern...
+        "user_id": IdObfuscator.to_public_id(request.created_by_id, override_cls=User),
+        "progress": -2 if request.status == ValidationRequest.Status.FAILED else (-1 if request.status == ValidationRequest.Status.PENDING else request.progress),
+        "date": datetime.strftime(request.created, '%Y-%m-%d %H:%M:%S'), # TODO - formatting is actually a UI concern...
+        "license": '-' if (request.model is None or request.model.license is None) else request.model.license,
+        "number_of_elements": None if (request.model is None or request.model.number_of_elements is None) else request.model.number_of_elements,
+        "number_of_geometries": None if (request.model is None or request.model.number_of_geometries is None) else request.model.number_of_geometries,
+        "number_of_properties": None if (request.model is None or request.model.number_of_properties is None) else request.model.number_of_properties,
+        "authoring_application": '-' if (request.model is None or request.model.produced_by is None) else request.model.produced_by.name,
+        "schema": '-' if (request.model is None or request.model.schema is None) else request.model.schema,
+        "size": request.size,
+        "mvd": '-' if (request.model is None or request.model.mvd is None) else request.model.mvd, # TODO - formatting is actually a UI concern...
+        "status_syntax": "p" if (request.model is None or request.model.status_syntax is None) else request.model.status_syntax,
+        "status_schema": status_combine(
+            "p" if (request.model is None or request.model.status_schema is None) else request.model.status_schema,
+            "p" if (request.model is None or request.model.status_prereq is None) else request.model.status_prereq
+        ),
+        "status_bsdd": "p" if (request.model is None or request.model.status_bsdd is None) else request.model.status_bsdd,
+        "status_mvd": "p" if (request.model is None or request.model.status_mvd is None) else request.model.status_mvd,
+        "status_ids": "p" if (request.model is None or request.model.status_ids is None) else request.model.status_ids,
+        "status_rules": status_combine(
+            "p" if (request.model is None or request.model.status_ia is None) else request.model.status_ia,
+            "p" if (request.model is None or request.model.status_ip is None)  else request.model.status_ip
+        ),
+        "status_ind": "p" if (request.model is None or request.model.status_industry_practices is None) else request.model.status_industry_practices,
+        "deleted": 0, # TODO
+        "commit_id": None #  TODO
+    }
+
+
+def get_report_requests():
+
+    """
+    Returns a queryset of Validation Requests that already joins everything format_request() touches.
+    """
+
+    return ValidationRequest.objects.select_related('model', 'model__produced_by')
+
+
+def get_latest_tasks(request, types):
+
+    """
+    Fetches the last run of each Validation Task type for a Validation Request, in a single query.
+
+    Returns:
+       Dictionary of task type to ValidationTask (or None if the task never ran).
+    """
+
+    latest = {t: None for t in types}
+    for task in ValidationTask.objects.filter(request_id=request.id, type__in=types).order_by('id'):
+        latest[task.type] = task
+    return latest
+
+
+def iterate_outcomes(task):
+
+    """
+    Iterates over the outcomes of a Validation Task with their instance joined in, using a server-side cursor where supported.
+    Outcomes retrieved via the related manager already have their validation_task set, so
+    neither instance_public_id nor validation_task_public_id trigger a query.
+    Message templates of interned messages are loaded once per chunk.
+    """
+
+    if task is None:
+        return
+
+    outcomes = task.outcomes.select_related('instance').iterator(chunk_size=OUTCOMES_CHUNK_SIZE)
+    for chunk in iter(lambda: list(itertools.islice(outcomes, OUTCOMES_CHUNK_SIZE)), []):
+        load_templates(value for outcome in chunk for value in (outcome.observed, outcome.expected))
+        yield from chunk
+
+
+def map_syntax_outcome(outcome):
+
+    # TODO - should we not do this in the model?
+    observed = render_message(outcome.observed)
+    match = re.search('^On line ([0-9])+ column ([0-9])+(.)*', observed)
+    return {
+        "id": outcome.public_id,
+        "lineno": match.groups()[0] if match and len(match.groups()) > 0 else None,
+        "column": match.groups()[1] if match and len(match.groups()) > 1 else None,
+        "severity": outcome.severity,
+        "msg": f"expected: {render_message(outcome.expected)}, observed: {observed}" if getattr(outcome, 'expected', None) is not None else observed,
+        "task_id": outcome.validation_task_public_id
+    }
+
+
+def map_schema_outcome(outcome):
+
+    feature = json.loads(outcome.feature) if outcome.feature else None
+    return {
+        "id": outcome.public_id,
+        "attribute": feature['attribute'] if feature else None, # eg. 'IfcSpatialStructureElement.WR41',
+        "constraint_type": feature['type'] if feature else None,  # 'uncategorized', 'schema', 'global_rule', 'simpletype_rule', 'entity_rule'
+        "instance_id": outcome.instance_public_id,
+        "severity": outcome.severity,
+        "msg": render_message(outcome.observed),
+        "task_id": outcome.validation_task_public_id
+    }
+
+
+def map_gherkin_outcome(outcome):
+
+    # rendered in place, so str(outcome) shows the full messages too
+    outcome.expected, outcome.observed = render_message(outcome.expected), render_message(outcome.observed)
+    return {
+        "id": outcome.public_id,
+        "feature": outcome.feature,
+        "feature_version": outcome.feature_version,
+        "feature_url": get_feature_url(outcome.feature[0:6], outcome.feature_version),
+        "feature_text": get_feature_description(outcome.feature[0:6], outcome.feature_version),
+        "step": outcome.get_severity_display(), # TODO
+        "severity": outcome.severity,
+        "instance_id": outcome.instance_public_id,
+        "expected": outcome.expected,
+        "observed": outcome.observed,
+        "message": str(outcome) if outcome.expected and outcome.observed else None,
+        "task_id": outcome.validation_task_public_id,
+        "msg": outcome.observed,
+    }
+
+
+def map_bsdd_outcome(outcome):
+
+    feature_json = json.loads(outcome.feature)
+    return {
+        "id": outcome.id,
+        "severity": outcome.severity,
+        "instance_id": outcome.instance_id,
+        "expected": render_message(outcome.expected),
+        "observed": render_message(outcome.observed),
+        "category": feature_json['category'] if 'category' in feature_json else None,
+        "dictionary": feature_json['dictionary'] if 'dictionary' in feature_json else None,
+        "class": feature_json['class'] if 'class' in feature_json else None,
+        "task_id": outcome.validation_task_public_id,
+    }
+
+
+def get_report_sections(request, report_type):
+
+    """
+    Determines which outcomes make up a report type.
+
+    Returns:
+       Dictionary of result key (eg. 'schema_results') to a (list of tasks, outcome mapping function) tuple.
+       Keys without outcomes for this report type are mapped to ([], None).
+    """
+
+    sections = {key: ([], None) for key in REPORT_RESULT_KEYS}
+
+    # which task types are needed for this report type
+    wanted = []
+    if report_type == 'syntax' and request.model and request.model.status_syntax != Model.Status.VALID:
+        wanted.append(('syntax_results', (ValidationTask.Type.SYNTAX,), map_syntax_outcome))
+    if report_type == 'schema' and request.model:
+        wanted.append(('schema_results', (ValidationTask.Type.SCHEMA,), map_schema_outcome))
+    if report_type == 'bsdd' and request.model:
+        wanted.append(('bsdd_results', (ValidationTask.Type.BSDD,), map_bsdd_outcome))
+    for label, types in GHERKIN_REPORT_GROUPING:
+        if report_type == label or (label == 'prerequisites' and report_type == 'schema'):
+            wanted.append((GHERKIN_RESULT_KEYS[label], types, map_gherkin_outcome))
+
+    if wanted:
+        tasks = get_latest_tasks(request, [t for _, types, _ in wanted for t in types])
+        for key, types, mapper in wanted:
+            sections[key] = ([tasks[t] for t in types if tasks[t] is not None], mapper)
+
+    return sections
+
+
+def iterate_instances(tasks, key_by_private_id=False):
+
+    """
+    Iterates over the (distinct) instances referenced by the outcomes of Validation Tasks, ordered by id.
+
+    Returns:
+       Iterator of (key, instance dictionary) tuples.
+    """
+
+    if not tasks:
+        return
+
+    instance_ids = ValidationOutcome.objects.filter(validation_task__in=tasks, instance__isnull=False).values('instance_id')
+    rows = ModelInstance.objects.filter(id__in=instance_ids).order_by('id').values_list('id', 'stepfile_id', 'ifc_type')
+    for id, stepfile_id, ifc_type in rows.iterator(chunk_size=OUTCOMES_CHUNK_SIZE):
+        key = id if key_by_private_id else ModelInstance.to_public_id(id)
+        yield key, {
+            "guid": f'#{stepfile_id}',
+            "type": ifc_type
+        }
+
+
+class StreamingJSONWriter:
+
+    """
+    Incremental JSON encoder: yields a document piece by piece, encoding array items and object members
+    in batches, so memory use does not depend on the number of items.
+    """
+
+    def __init__(self, encode=None, batch_size=STREAMING_BATCH_SIZE):
+
+        self.encode = encode or get_json_dumps()
+        self.batch_size = batch_size
+
+    def _batched(self, pieces):
+
+        batch = []
+        separator = b''
+        for piece in pieces:
+            batch.append(piece)
+            if len(batch) >= self.batch_size:
+                yield separator + b','.join(batch)
+                batch = []
+                separator = b','
+        if batch:
+            yield separator + b','.join(batch)
+
+    def array(self, items):
+
+        yield b'['
+        yield from self._batched(self.encode(item) for item in items)
+        yield b']'
+
+    def object(self, members):
+
+        yield b'{'
+        yield from self._batched(self.encode(str(key)) + b':' + self.encode(value) for key, value in members)
+        yield b'}'
+
+
+def stream_report(request, report_type, writer=None):
+
+    """
+    Streams the (legacy) report for a Validation Request as UTF-8 encoded JSON.
+    Outcomes are mapped one by one while iterating a (server-side) cursor; the referenced instances
+    are written afterwards, in a second section, from their own query.
+
+    Mandatory Args:
+       request: ValidationRequest, retrieved via get_report_requests()
+       report_type: one of 'syntax', 'schema', 'normative', 'industry', 'prerequisites' or 'bsdd'
+
+    Returns:
+       Generator of bytes, forming a JSON object with 'model', 'results' and 'instances' keys.
+    """
+
+    writer = writer or StreamingJSONWriter()
+    sections = get_report_sections(request, report_type)
+
+    yield b'{"model":' + writer.encode(format_request(request)) + b',"results":{'
+    for i, key in enumerate(REPORT_RESULT_KEYS):
+        tasks, mapper = sections[key]
+        yield f'{"," if i else ""}"{key}":'.encode('utf-8')
+        logger.info(f'Fetching and mapping {key}...')
+        yield from writer.array(mapper(outcome) for task in tasks for outcome in iterate_outcomes(task))
+    yield b'},"instances":'
+
+    instance_tasks = [task for key in REPORT_RESULT_KEYS if key != 'syntax_results' for task in sections[key][0]]
+    yield from writer.object(iterate_instances(instance_tasks, key_by_private_id=(report_type == 'bsdd')))
+    yield b'}'
+    logger.info(f'Streamed {report_type} report for Validation Request id: {request.id}')
+
+
+def build_report(request, report_type):
+
+    """
+    Builds the (legacy) report for a Validation Request in memory; prefer stream_report() for large reports.
+
+    Returns:
+       Dictionary with 'model', 'results' and 'instances' keys, as returned by the report view.
+    """
+
+    return json.loads(b''.join(stream_report(request, report_type)))
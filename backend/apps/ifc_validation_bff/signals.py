@@ -0,0 +1,67 @@
+import functools
+
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from django.contrib.auth.models import User
+
+from apps.ifc_validation_models.models import ValidationRequest, Model
+
+from .caching import invalidate_user_ids
+from .dashboard import invalidate_dashboard, adjust_dashboard_count
+
+
+@receiver(post_init, sender=ValidationRequest)
+def on_validation_request_loaded(sender, instance, **kwargs):
+
+    # to tell (soft) deletes and restores from other changes on save - without loading a deferred field
+    instance._dashboard_deleted = instance.__dict__.get('deleted')
+
+
+@receiver(post_save, sender=ValidationRequest)
+def on_validation_request_saved(sender, instance, created, **kwargs):
+
+    if created:
+        delta = 0 if instance.deleted else 1
+    elif instance._dashboard_deleted is not None and instance._dashboard_deleted != instance.deleted:
+        delta = -1 if instance.deleted else 1
+    else:
+        delta = 0
+    instance._dashboard_deleted = instance.deleted
+
+    on_validation_request_changed(instance, delta)
+
+
+@receiver(post_delete, sender=ValidationRequest)
+def on_validation_request_deleted(sender, instance, **kwargs):
+
+    on_validation_request_changed(instance, 0 if instance.deleted else -1)
+
+
+def on_validation_request_changed(instance, delta):
+
+    # uploads, status/progress changes, (soft) deletes and restores all change the dashboard pages, only
+    # uploads, deletes and restores change the count
+    # (after commit, so other workers can't cache the previous state under the new version)
+    if instance.created_by_id is not None:
+        transaction.on_commit(functools.partial(invalidate_dashboard, instance.created_by_id))
+        if delta:
+            transaction.on_commit(functools.partial(adjust_dashboard_count, instance.created_by_id, delta))
+
+
+@receiver(post_save, sender=Model)
+def on_model_changed(sender, instance, created, **kwargs):
+
+    # model properties and stage statuses are shown on the dashboard
+    if not created:
+        for user_id in set(ValidationRequest.objects.filter(model=instance).values_list('created_by_id', flat=True)):
+            if user_id is not None:
+                transaction.on_commit(functools.partial(invalidate_dashboard, user_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def on_user_changed(sender, instance, **kwargs):
+
+    # cached session-to-user resolution (see views_legacy.get_current_user)
+    transaction.on_commit(functools.partial(invalidate_user_ids, [instance.id]))
@@ -0,0 +1,174 @@
+import os
+import gzip
+import shutil
+import logging
+import tempfile
+
+from django.conf import settings
+from django.http import HttpResponse, FileResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from apps.ifc_validation_models.models import ValidationRequest
+from apps.ifc_validation.archival import restore_request
+
+from . import caching
+from .downloads import accepts_gzip, file_etag, DOWNLOAD_CHUNK_SIZE
+from .reports import stream_report
+
+logger = logging.getLogger(__name__)
+
+# IMPORTANT
+#
+# Results never change once a workflow has completed, so each report type is rendered once
+# (at workflow completion, or on first read) to a gzipped JSON file and served from there.
+# Snapshots are removed whenever a Validation Request is re-processed or deleted.
+
+REPORT_TYPES = ('syntax', 'schema', 'normative', 'industry', 'prerequisites')
+
+
+def get_snapshot_root():
+
+    return getattr(settings, 'REPORT_SNAPSHOT_ROOT', None) or os.path.join(settings.MEDIA_ROOT, '_reports')
+
+
+def get_snapshot_path(request_id, report_type):
+
+    return os.path.join(get_snapshot_root(), str(request_id), f'{report_type}.json.gz')
+
+
+def write_report_snapshot(request, report_type):
+
+    """
+    Renders a report type of a Validation Request to its (gzipped JSON) snapshot file.
+    The file is written next to its final location and moved in place, so readers never see a partial snapshot.
+
+    Mandatory Args:
+       request: ValidationRequest, retrieved via get_report_requests()
+       report_type: one of REPORT_TYPES
+
+    Returns:
+       Path of the snapshot file.
+    """
+
+    path = get_snapshot_path(request.id, report_type)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # outcomes of old requests may have been archived
+    restore_request(request)
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f, gzip.GzipFile(fileobj=f, mode='wb', compresslevel=6, mtime=0) as gz:
+            for chunk in stream_report(request, report_type):
+                gz.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    return path
+
+
+def materialize_reports(request):
+
+    """
+    Renders all report types of a completed Validation Request to snapshot files.
+    """
+
+    if request.status != ValidationRequest.Status.COMPLETED:
+        logger.info(f"Skipped materializing reports for Validation Request id: {request.id} (status={request.status})")
+        return
+
+    for report_type in REPORT_TYPES:
+        write_report_snapshot(request, report_type)
+    logger.info(f"Materialized {len(REPORT_TYPES)} report snapshots for Validation Request id: {request.id}")
+
+
+def invalidate_report_snapshots(*request_ids):
+
+    """
+    Removes all report snapshots of one or more Validation Requests.
+    """
+
+    for request_id in request_ids:
+        shutil.rmtree(os.path.join(get_snapshot_root(), str(request_id)), ignore_errors=True)
+        logger.debug(f"Invalidated report snapshots for Validation Request id: {request_id}")
+
+
+def get_report_snapshot(request, report_type):
+
+    """
+    Returns the path of an up-to-date report snapshot, materializing it first if needed.
+
+    Returns:
+       Snapshot path, or None if the report type can't be materialized (yet).
+    """
+
+    if report_type not in REPORT_TYPES or request.status != ValidationRequest.Status.COMPLETED:
+        return None
+
+    path = get_snapshot_path(request.id, report_type)
+    if not os.path.exists(path):
+        # eg. requests completed before snapshots were introduced
+        logger.info(f"Report snapshot '{report_type}' missing for Validation Request id: {request.id}, materializing...")
+        path = write_report_snapshot(request, report_type)
+
+    return path
+
+
+def read_gzip_file(path, chunk_size=DOWNLOAD_CHUNK_SIZE):
+
+    with gzip.open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
+def get_cached_snapshot(path, stat):
+
+    """
+    Returns the (gzipped) content of a small snapshot from the shared cache - or None for large snapshots,
+    which are streamed from storage instead. Keys include the file's mtime/size, so rewritten snapshots are never served stale.
+    """
+
+    if stat.st_size > getattr(settings, 'REPORT_SNAPSHOT_CACHE_MAX_SIZE', 256 * 1024):
+        return None
+
+    def read():
+        with open(path, 'rb') as f:
+            return f.read()
+
+    key = f'bff:report:{os.path.relpath(path, get_snapshot_root())}:{stat.st_mtime_ns}:{stat.st_size}'
+    return caching.get_or_set('report', key, read)
+
+
+def report_snapshot_response(http_request, path, validators=None):
+
+    """
+    Sends a report snapshot back as-is to clients accepting gzip (decompressing on the fly otherwise),
+    with ETag/Last-Modified validators so unchanged reports are answered with 304 Not Modified.
+    The validators default to those of the snapshot file itself.
+    """
+
+    stat = os.stat(path)
+    etag = validators.etag if validators else file_etag(stat)
+    last_modified = validators.last_modified if validators else int(stat.st_mtime)
+
+    response = get_conditional_response(http_request, etag=etag, last_modified=last_modified)
+    if response is None:
+        if accepts_gzip(http_request):
+            content = get_cached_snapshot(path, stat)
+            if content is not None:
+                response = HttpResponse(content, content_type='application/json')
+            else:
+                response = FileResponse(open(path, 'rb'), content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+            response['Content-Length'] = str(stat.st_size)
+        else:
+            response = StreamingHttpResponse(read_gzip_file(path), content_type='application/json')
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,21 @@
+from celery import shared_task
+from celery.utils.log import get_task_logger
+
+from core.utils import log_execution
+
+from .reports import get_report_requests
+from .snapshots import materialize_reports
+
+logger = get_task_logger(__name__)
+
+
+@shared_task
+@log_execution
+def materialize_reports_task(id, file_name):
+
+    request = get_report_requests().filter(pk=id, deleted=False).first()
+    if request is None:
+        logger.info(f"Validation Request id: {id} file_name: {file_name} no longer exists, skipped materializing reports")
+        return
+
+    materialize_reports(request)
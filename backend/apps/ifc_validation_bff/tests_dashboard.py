@@ -0,0 +1,210 @@
+import json
+
+from django.test import TestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.core.cache import cache
+from django.contrib.auth.models import User
+
+from apps.ifc_validation_models.models import *
+from apps.ifc_validation_models.decorators import requires_django_user_context
+from apps.ifc_validation.purge import schedule_purge
+
+from .views_legacy import models_paginated, models_cursor_paginated
+from .reports import format_request, get_report_requests
+from .dashboard import get_dashboard_page, get_dashboard_count, decode_cursor
+from . import caching
+
+
+class DashboardTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        """
+        Creates a SYSTEM user and a dashboard user in the (in-memory) test database.
+        Runs once for the whole test case.
+        """
+
+        user = User.objects.create(id=1, username='SYSTEM', is_active=True)
+        user.save()
+        User.objects.create(id=2, username='user@localhost', email='user@localhost', is_active=True)
+
+    def setUp(self):
+
+        cache.clear()
+        # one session across requests, same as a polling browser
+        self.session = {'user': {'email': 'user@localhost'}}
+
+    @requires_django_user_context
+    def create_requests(self, number_of_requests):
+
+        tool = AuthoringTool.objects.create(name='Authoring App', version='1.0')
+        requests = []
+        for i in range(number_of_requests):
+            request = ValidationRequest.objects.create(
+                file_name=f'file_{i}.ifc',
+                file=f'file_{i}.ifc',
+                size=280,
+                created_by_id=2
+            )
+            if i % 2 == 0:
+                request.model = Model.objects.create(
+                    file_name=request.file_name,
+                    file=request.file,
+                    size=request.size,
+                    uploaded_by_id=2,
+                    produced_by=tool,
+                    status_syntax=Model.Status.VALID
+                )
+                request.save()
+            requests.append(request)
+
+        return requests
+
+    def get_http_response(self, view, *args, headers=None, **params):
+
+        http_request = RequestFactory().get('/bff/api/models', params, headers=headers)
+        http_request.session = self.session
+        return view(http_request, *args)
+
+    def get_response(self, view, *args, **params):
+
+        return json.loads(self.get_http_response(view, *args, **params).content)
+
+    def test_projection_matches_format_request(self):
+
+        self.create_requests(3)
+
+        models, _ = get_dashboard_page(2)
+        expected = [format_request(request) for request in get_report_requests().filter(created_by__id=2).order_by('-created', '-id')]
+
+        self.assertEqual(models, expected)
+
+    def test_cursor_pages_cover_all_requests_once(self):
+
+        requests = self.create_requests(7)
+
+        ids, cursor, pages = [], None, 0
+        while True:
+            models, cursor = get_dashboard_page(2, cursor, limit=3)
+            ids += [model['id'] for model in models]
+            pages += 1
+            if cursor is None:
+                break
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(ids, [request.public_id for request in reversed(requests)])
+
+    def test_page_is_a_single_query(self):
+
+        self.create_requests(10)
+        get_dashboard_count(2)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.get_response(models_paginated, 0, 5)
+        # user lookup + validators + one page query; the count comes from cache
+        self.assertEqual(len(queries), 3)
+
+    def test_cursor_endpoint(self):
+
+        self.create_requests(4)
+
+        first = self.get_response(models_cursor_paginated, limit=3)
+        second = self.get_response(models_cursor_paginated, limit=3, cursor=first['next'])
+
+        self.assertEqual(first['count'], 4)
+        self.assertEqual(len(first['models']), 3)
+        self.assertEqual(len(second['models']), 1)
+        self.assertIsNone(second['next'])
+
+    def test_invalid_cursor_starts_from_first_page(self):
+
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        self.create_requests(2)
+        self.assertEqual(len(self.get_response(models_cursor_paginated, cursor='not-a-cursor')['models']), 2)
+
+    def test_count_is_maintained_on_change(self):
+
+        requests = self.create_requests(2)
+        self.assertEqual(get_dashboard_count(2), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_requests(1)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(get_dashboard_count(2), 3)
+        self.assertEqual(len(queries), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ValidationRequest.objects.filter(id=requests[0].id).first().delete()
+        self.assertEqual(get_dashboard_count(2), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ValidationRequest.objects.filter(id=requests[0].id).first().undo_delete()
+        self.assertEqual(get_dashboard_count(2), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule_purge([requests[0].id, requests[1].id])
+        self.assertEqual(get_dashboard_count(2), 1)
+        self.assertEqual(get_dashboard_count(2), ValidationRequest.objects.filter(created_by_id=2, deleted=False).count())
+
+    def test_count_is_kept_on_status_changes(self):
+
+        requests = self.create_requests(2)
+        self.assertEqual(get_dashboard_count(2), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            requests[0].mark_as_initiated()
+            requests[0].mark_as_completed()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(get_dashboard_count(2), 2)
+        self.assertEqual(len(queries), 0)
+
+    def test_pages_are_cached_until_a_request_changes(self):
+
+        requests = self.create_requests(3)
+        caching.reset_metrics()
+
+        self.get_response(models_paginated, 0, 5)
+        with CaptureQueriesContext(connection) as queries:
+            models = self.get_response(models_paginated, 0, 5)['models']
+        # validators only - user, page and count come from cache
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(caching.get_metrics()['dashboard'], {'hits': 2, 'misses': 2, 'ratio': 0.5})
+        self.assertEqual(caching.get_metrics()['user']['hits'], 1)
+
+        # status changes are visible on the next poll
+        requests[0].status = ValidationRequest.Status.COMPLETED
+        requests[0].progress = 100
+        with self.captureOnCommitCallbacks(execute=True):
+            requests[0].save()
+        models = self.get_response(models_paginated, 0, 5)['models']
+        self.assertEqual(models[-1]['progress'], 100)
+
+        # so are model changes
+        model = Model.objects.get(id=requests[0].model_id)
+        model.status_syntax = Model.Status.INVALID
+        with self.captureOnCommitCallbacks(execute=True):
+            model.save()
+        self.assertEqual(self.get_response(models_paginated, 0, 5)['models'][-1]['status_syntax'], Model.Status.INVALID)
+
+    def test_unchanged_dashboard_is_not_modified(self):
+
+        requests = self.create_requests(2)
+
+        response = self.get_http_response(models_paginated, 0, 5)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_http_response(models_paginated, 0, 5, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        # validators only (the user comes from cache)
+        self.assertEqual(len(queries), 1)
+
+        # progress of a request changes the dashboard
+        requests[0].progress = 50
+        requests[0].save()
+        response = self.get_http_response(models_paginated, 0, 5, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
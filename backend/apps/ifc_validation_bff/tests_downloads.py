@@ -0,0 +1,106 @@
+import os
+import gzip
+import tempfile
+
+from django.test import TestCase, RequestFactory, override_settings
+
+from .downloads import serve_file, parse_range_header, accepts_gzip
+
+CONTENT = b"ISO-10303-21;\nHEADER;\nENDSEC;\nDATA;\n" + b"#1=IFCWALL($,$,$,$,$,$,$,$,$);\n" * 1000 + b"ENDSEC;\nEND-ISO-10303-21;\n"
+
+
+class DownloadTestCase(TestCase):
+
+    def setUp(self):
+
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        with open(os.path.join(self.media_root.name, 'file.ifc'), 'wb') as f:
+            f.write(CONTENT)
+        self.factory = RequestFactory()
+
+    def download(self, **headers):
+
+        with override_settings(MEDIA_ROOT=self.media_root.name, USE_X_ACCEL_REDIRECT=False):
+            return serve_file(self.factory.get('/bff/api/download/1', headers=headers), 'file.ifc', 'my file.ifc')
+
+    def test_parse_range_header(self):
+
+        self.assertEqual(parse_range_header('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range_header('bytes=900-', 1000), (900, 999))
+        self.assertEqual(parse_range_header('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range_header('bytes=990-2000', 1000), (990, 999))
+        self.assertFalse(parse_range_header('bytes=1000-', 1000))
+        self.assertIsNone(parse_range_header('bytes=0-1,5-9', 1000))
+        self.assertIsNone(parse_range_header('items=0-1', 1000))
+        self.assertIsNone(parse_range_header(None, 1000))
+
+    def test_accepts_gzip(self):
+
+        self.assertTrue(accepts_gzip(self.factory.get('/', headers={'accept-encoding': 'gzip, deflate, br'})))
+        self.assertFalse(accepts_gzip(self.factory.get('/', headers={'accept-encoding': 'gzip;q=0, br'})))
+        self.assertFalse(accepts_gzip(self.factory.get('/')))
+
+    def test_download_streams_full_file(self):
+
+        response = self.download()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(response['Content-Disposition'].startswith('attachment; filename="my file.ifc"'))
+        response.close()
+
+    def test_download_byte_range(self):
+
+        response = self.download(range='bytes=14-20')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT[14:21])
+        self.assertEqual(response['Content-Range'], f'bytes 14-20/{len(CONTENT)}')
+
+    def test_download_unsatisfiable_range(self):
+
+        response = self.download(range=f'bytes={len(CONTENT)}-')
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(CONTENT)}')
+
+    def test_download_range_ignored_for_stale_if_range(self):
+
+        response = self.download(range='bytes=0-9', if_range='"stale"')
+
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+    def test_download_conditional_request(self):
+
+        etag = self.download()['ETag']
+        response = self.download(if_none_match=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_download_precompressed_representation(self):
+
+        with open(os.path.join(self.media_root.name, 'file.ifc.gz'), 'wb') as f:
+            f.write(gzip.compress(CONTENT))
+
+        response = self.download(accept_encoding='gzip')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), CONTENT)
+        response.close()
+
+    def test_download_via_x_accel_redirect(self):
+
+        with override_settings(USE_X_ACCEL_REDIRECT=True, X_ACCEL_REDIRECT_PREFIX='/protected_files/'):
+            response = serve_file(self.factory.get('/'), 'sub dir/file.ifc', 'file.ifc')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected_files/sub%20dir/file.ifc')
+        self.assertEqual(response.content, b'')
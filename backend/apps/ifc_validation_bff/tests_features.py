@@ -0,0 +1,67 @@
+import os
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.core.management import call_command
+
+from .features import build_feature_index, get_feature_index, get_feature_url, get_feature_description
+
+FEATURE_ALB001 = """@implementer-agreement
+@ALB
+@version1
+@E00020
+Feature: ALB001 - Alignment in spatial structure
+The rule verifies that each IfcAlignment is aggregated by IfcProject.
+
+  Background:
+    Given An IfcAlignment
+"""
+
+FEATURE_GEM001 = """@informal-proposition
+@version12
+Feature: GEM001 - Closed shell edge usage
+The rule verifies that edges of a closed shell are used
+exactly twice.
+
+  Scenario: Validating closed shells
+    Given An IfcClosedShell
+"""
+
+
+class FeatureIndexTestCase(TestCase):
+
+    def setUp(self):
+
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        for file_name, content in (
+            ('ALB001_Alignment-in-spatial-structure.feature', FEATURE_ALB001),
+            ('GEM001_Closed-shell-edge-usage.feature', FEATURE_GEM001),
+            ('README.md', '@version1')
+        ):
+            with open(os.path.join(self.folder.name, file_name), 'w') as f:
+                f.write(content)
+
+        get_feature_index.cache_clear()
+        self.addCleanup(get_feature_index.cache_clear)
+
+    def test_build_feature_index(self):
+
+        index = build_feature_index(self.folder.name, feature_url='https://features/')
+
+        self.assertEqual(sorted(index.keys()), ['ALB001/1', 'GEM001/12'])
+        self.assertEqual(index['ALB001/1']['file'], 'ALB001_Alignment-in-spatial-structure.feature')
+        self.assertEqual(index['ALB001/1']['url'], 'https://features/ALB001_Alignment-in-spatial-structure.feature')
+        self.assertEqual(index['ALB001/1']['description'], '\nThe rule verifies that each IfcAlignment is aggregated by IfcProject.')
+        self.assertEqual(index['GEM001/12']['description'], '\nThe rule verifies that edges of a closed shell are used\nexactly twice.')
+
+    def test_lookups_use_generated_index_file(self):
+
+        index_file = os.path.join(self.folder.name, 'feature_index.json')
+        call_command('build_feature_index', folder=self.folder.name, output=index_file, stdout=open(os.devnull, 'w'))
+
+        with override_settings(FEATURE_INDEX_FILE=index_file, FEATURE_URL='https://other/'):
+            self.assertTrue(get_feature_url('ALB001', 1).endswith('ALB001_Alignment-in-spatial-structure.feature'))
+            self.assertTrue(get_feature_description('GEM001', 12).startswith('\nThe rule verifies'))
+            self.assertIsNone(get_feature_url('GEM001', 1))
+            self.assertIsNone(get_feature_description('XYZ001', 1))
@@ -0,0 +1,262 @@
+import os
+import gzip
+import json
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.core.cache import cache
+from django.contrib.auth.models import User
+
+from apps.ifc_validation_models.models import *
+from apps.ifc_validation_models.decorators import requires_django_user_context
+from apps.ifc_validation.messages import intern_queryset, clear_templates, is_interned
+
+from .views_legacy import report
+from .reports import StreamingJSONWriter
+from . import caching
+from .snapshots import materialize_reports, invalidate_report_snapshots, get_snapshot_path, REPORT_TYPES
+
+
+class ReportTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        """
+        Creates a SYSTEM user and a report user in the (in-memory) test database.
+        Runs once for the whole test case.
+        """
+
+        user = User.objects.create(id=1, username='SYSTEM', is_active=True)
+        user.save()
+        User.objects.create(id=2, username='user@localhost', email='user@localhost', is_active=True)
+
+    def setUp(self):
+
+        cache.clear()
+        # one session across requests, same as a browser
+        self.session = {'user': {'email': 'user@localhost'}}
+
+    @requires_django_user_context
+    def create_request(self, number_of_outcomes):
+
+        request = ValidationRequest.objects.create(
+            file_name='valid_file.ifc',
+            file='valid_file.ifc',
+            size=280,
+            created_by_id=2
+        )
+        tool = AuthoringTool.objects.create(name='Authoring App', version='1.0')
+        model = Model.objects.create(
+            file_name=request.file_name,
+            file=request.file,
+            size=request.size,
+            uploaded_by_id=2,
+            produced_by=tool,
+            status_syntax=Model.Status.INVALID,
+            status_schema=Model.Status.INVALID
+        )
+        request.model = model
+        request.save()
+
+        syntax_task = ValidationTask.objects.create(request=request, type=ValidationTask.Type.SYNTAX)
+        schema_task = ValidationTask.objects.create(request=request, type=ValidationTask.Type.SCHEMA)
+        ValidationTask.objects.create(request=request, type=ValidationTask.Type.PREREQUISITES)
+
+        for i in range(number_of_outcomes):
+            syntax_task.outcomes.create(
+                severity=ValidationOutcome.OutcomeSeverity.ERROR,
+                outcome_code=ValidationOutcome.ValidationOutcomeCode.SYNTAX_ERROR,
+                observed=f'On line {i + 1} column 5'
+            )
+            instance = model.instances.create(stepfile_id=i + 1, ifc_type='IfcWall', model=model)
+            schema_task.outcomes.create(
+                severity=ValidationOutcome.OutcomeSeverity.ERROR,
+                outcome_code=ValidationOutcome.ValidationOutcomeCode.SCHEMA_ERROR,
+                observed='Attribute value missing',
+                feature=json.dumps({'type': 'schema', 'attribute': 'IfcWall.Name'}),
+                instance=instance
+            )
+
+        return request
+
+    def get_report_response(self, request, report_type, **headers):
+
+        http_request = RequestFactory().get(f'/bff/api/report/{request.public_id}', {'type': report_type}, headers=headers)
+        http_request.session = self.session
+        return report(http_request, request.public_id)
+
+    def get_report(self, request, report_type):
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.get_report_response(request, report_type)
+            content = b''.join(response.streaming_content)
+
+        self.assertEqual(response.status_code, 200)
+        return json.loads(content), len(context.captured_queries)
+
+    def test_report_query_count_does_not_depend_on_number_of_outcomes(self):
+
+        small = self.create_request(number_of_outcomes=2)
+        large = self.create_request(number_of_outcomes=50)
+
+        self.get_report(small, 'syntax')  # caches the user lookup
+        with mock.patch('apps.ifc_validation_bff.reports.OUTCOMES_CHUNK_SIZE', 10):  # large spans several chunks
+            for report_type in ('syntax', 'schema'):
+                _, small_queries = self.get_report(small, report_type)
+                data, large_queries = self.get_report(large, report_type)
+
+                self.assertEqual(small_queries, large_queries, report_type)
+        self.assertEqual(len(data['results']['schema_results']), 50)
+
+    def add_interned_messages(self, request, number_of_templates):
+
+        # long messages (interned), one template per constraint
+        constraints = ['uniqueness', 'cardinality', 'type', 'range', 'reference', 'placement', 'geometry', 'naming']
+        task = request.tasks.get(type=ValidationTask.Type.SCHEMA)
+        messages = []
+        for i, outcome in enumerate(task.outcomes.order_by('id')):
+            outcome.observed = f"Attribute 'Name' of #{i + 1}=IfcWall violates the {constraints[i % number_of_templates]} constraint of the schema"
+            outcome.save()
+            messages.append(outcome.observed)
+        intern_queryset(task.outcomes.all())
+        self.assertTrue(all(is_interned(observed) for observed in task.outcomes.values_list('observed', flat=True)))
+        return messages
+
+    def test_report_query_count_does_not_depend_on_number_of_templates(self):
+
+        small = self.create_request(number_of_outcomes=2)
+        large = self.create_request(number_of_outcomes=40)
+        self.add_interned_messages(small, 1)
+        messages = self.add_interned_messages(large, 8)
+
+        self.get_report(small, 'syntax')  # caches the user lookup
+        clear_templates()
+        _, small_queries = self.get_report(small, 'schema')
+        clear_templates()
+        with mock.patch('apps.ifc_validation_bff.reports.OUTCOMES_CHUNK_SIZE', 10):  # large spans several chunks
+            data, large_queries = self.get_report(large, 'schema')
+
+        self.assertEqual(small_queries, large_queries)
+        self.assertEqual([result['msg'] for result in data['results']['schema_results']], messages)
+
+    def test_report_maps_outcomes_and_instances(self):
+
+        request = self.create_request(number_of_outcomes=3)
+
+        data, _ = self.get_report(request, 'schema')
+
+        self.assertEqual(data['model']['authoring_application'], 'Authoring App')
+        self.assertEqual(len(data['results']['schema_results']), 3)
+        self.assertEqual(len(data['instances']), 3)
+        self.assertEqual(data['results']['schema_results'][0]['attribute'], 'IfcWall.Name')
+        self.assertEqual(data['results']['prereq_rules_results'], [])
+
+        data, _ = self.get_report(request, 'syntax')
+
+        self.assertEqual(len(data['results']['syntax_results']), 3)
+        self.assertEqual(data['results']['syntax_results'][0]['lineno'], '1')
+
+    def test_streaming_json_writer(self):
+
+        writer = StreamingJSONWriter(batch_size=2)
+
+        self.assertEqual(b''.join(writer.array(iter([]))), b'[]')
+        self.assertEqual(json.loads(b''.join(writer.array({'n': i} for i in range(5)))), [{'n': i} for i in range(5)])
+        self.assertEqual(json.loads(b''.join(writer.object((i, [i]) for i in range(3)))), {'0': [0], '1': [1], '2': [2]})
+
+    def test_report_is_streamed(self):
+
+        request = self.create_request(number_of_outcomes=3)
+
+        response = self.get_report_response(request, 'schema')
+        self.assertTrue(response.streaming)
+
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(list(data.keys()), ['model', 'results', 'instances'])
+        self.assertEqual(len(data['instances']), 3)
+        self.assertEqual(
+            sorted(r['instance_id'] for r in data['results']['schema_results']),
+            sorted(data['instances'].keys()))
+
+    def test_unchanged_report_is_not_modified(self):
+
+        request = self.create_request(number_of_outcomes=5)
+
+        response = self.get_report_response(request, 'schema')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        response.close()
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.get_report_response(request, 'schema', if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        # validators only (the user comes from cache)
+        self.assertEqual(len(context.captured_queries), 1)
+
+        # other report type > other ETag
+        response = self.get_report_response(request, 'syntax', if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+        # a task making progress changes the report
+        task = request.tasks.get(type=ValidationTask.Type.SCHEMA)
+        task.progress = 100
+        task.save()
+        response = self.get_report_response(request, 'schema', if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+    @requires_django_user_context
+    def test_completed_report_is_served_from_snapshot(self):
+
+        request = self.create_request(number_of_outcomes=3)
+        request.mark_as_completed('Processing completed')
+
+        with tempfile.TemporaryDirectory() as snapshot_root, override_settings(REPORT_SNAPSHOT_ROOT=snapshot_root):
+
+            materialize_reports(request)
+            for report_type in REPORT_TYPES:
+                self.assertTrue(os.path.exists(get_snapshot_path(request.id, report_type)))
+
+            response = self.get_report_response(request, 'schema', accept_encoding='gzip')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            data = json.loads(gzip.decompress(response.getvalue()))
+            self.assertEqual(len(data['results']['schema_results']), 3)
+            response.close()
+
+            # small snapshots are read from the shared cache once read from storage
+            caching.reset_metrics()
+            response = self.get_report_response(request, 'schema', accept_encoding='gzip')
+            self.assertEqual(json.loads(gzip.decompress(response.getvalue())), data)
+            self.assertEqual(caching.get_metrics()['report']['hits'], 1)
+
+            # same ETag > 304 Not Modified
+            response = self.get_report_response(request, 'schema', if_none_match=response['ETag'])
+            self.assertEqual(response.status_code, 304)
+
+            # decompressed for clients not accepting gzip
+            response = self.get_report_response(request, 'syntax')
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(response.has_header('Content-Encoding'))
+            self.assertEqual(len(json.loads(b''.join(response.streaming_content))['results']['syntax_results']), 3)
+
+            invalidate_report_snapshots(request.id)
+            self.assertFalse(os.path.exists(get_snapshot_path(request.id, 'schema')))
+
+    @requires_django_user_context
+    def test_missing_snapshot_is_materialized_on_first_read(self):
+
+        request = self.create_request(number_of_outcomes=1)
+        request.mark_as_completed('Processing completed')
+
+        with tempfile.TemporaryDirectory() as snapshot_root, override_settings(REPORT_SNAPSHOT_ROOT=snapshot_root):
+
+            response = self.get_report_response(request, 'schema')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(os.path.exists(get_snapshot_path(request.id, 'schema')))
+            self.assertFalse(os.path.exists(get_snapshot_path(request.id, 'syntax')))
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from .views_legacy import me, models_paginated, download, upload, delete, revalidate
+from .views_legacy import me, models_paginated, models_cursor_paginated, download, upload, delete, revalidate
 from .views_legacy import report, report_error
 
 urlpatterns = [
@@ -8,6 +8,7 @@ urlpatterns = [
     # 'Flask'-way of doing things; backend for legacy API (< 0.6)
     path('api/me',                                              me),
     path('api/models_paginated/<int:start>/<int:end>',          models_paginated),
+    path('api/models',                                          models_cursor_paginated),
     path('api/download/<str:id>',                               download),
     path('api/',                                                upload),
     path('api/delete/<str:ids>',                                delete),
@@ -1,28 +1,30 @@
-import operator
-import os, subprocess
-import re
-import json
-from datetime import datetime
 import logging
-import itertools
 import functools
-import typing
 
 from django.db import transaction
-from django.http import JsonResponse, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, HttpResponseRedirect, HttpResponseNotFound
+from django.http import StreamingHttpResponse, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, HttpResponseRedirect, HttpResponseNotFound
 from django.contrib.auth.models import User
 from django.views.decorators.csrf import ensure_csrf_cookie, requires_csrf_token
 
-from apps.ifc_validation_models.models import IdObfuscator, ValidationOutcome, set_user_context
+from apps.ifc_validation_models.models import set_user_context
 from apps.ifc_validation_models.models import ValidationRequest
-from apps.ifc_validation_models.models import ValidationTask
-from apps.ifc_validation_models.models import Model
 
 from apps.ifc_validation.tasks import ifc_file_validation_task
+from apps.ifc_validation.ingestion import stored_file_or_upload, store_ingestion_results
+from apps.ifc_validation.conditional import get_validators, get_not_modified_response, set_validators
+from apps.ifc_validation.prechecks import precheck_upload, reject_validation_request
+from apps.ifc_validation.archival import restore_request
 
-from core.settings import MEDIA_ROOT, MAX_FILES_PER_UPLOAD
+from core.renderers import FastJsonResponse
+
+from . import caching
+from .downloads import serve_file
+from .reports import get_report_requests, stream_report
+from .dashboard import get_user_requests, get_dashboard_page, get_dashboard_slice, get_dashboard_count, invalidate_dashboard, DEFAULT_PAGE_SIZE
+from .snapshots import get_report_snapshot, report_snapshot_response, invalidate_report_snapshots
+
+from core.settings import MAX_FILES_PER_UPLOAD
 from core.settings import DEVELOPMENT, LOGIN_URL, USE_WHITELIST 
-from core.settings import FEATURE_URL
 
 logger = logging.getLogger(__name__)
 
@@ -39,7 +41,22 @@ def get_current_user(request):
     if sso_user:
         
         username = sso_user['email'].lower()
-        user = User.objects.all().filter(username=username).first()
+
+        # user id is kept in the session (once resolved), the user itself in the shared cache
+        user_id = request.session.get('user_id')
+        if user_id is None:
+            user = User.objects.all().filter(username=username).first()
+            if user is None:
+                logger.info(f"No user with username = '{username}'")
+                return None
+            request.session['user_id'] = user.id
+            caching.set_user(user)
+        else:
+            user = caching.get_or_set('user', caching.get_user_id_key(user_id), User.objects.all().filter(id=user_id).first)
+            if user is None:
+                # deleted since
+                request.session.pop('user_id', None)
+                return None
 
         logger.info(f"Authenticated user with username = '{username}' via OAuth, user.id = {user.id}")
         return user
@@ -74,119 +91,19 @@ def create_redirect_response(login=True, dashboard=False):
 
     if dashboard:
 
-        return JsonResponse({
+        return FastJsonResponse({
                 "redirect": '/dashboard',
                 "reason": "403 - Forbidden"
             })
 
     else:
         
-        return JsonResponse({
+        return FastJsonResponse({
                 "redirect": LOGIN_URL,
                 "reason": "401 - Unauthorized"
             })
 
 
-@functools.lru_cache(maxsize=256)
-def file_contains_string(file_name, fragment):
-
-    with open(file_name, 'r') as file:
-        for line_no, line in enumerate(file):
-            if fragment in line:
-                return True
-    return False
-
-
-@functools.lru_cache(maxsize=1024)
-def get_feature_url(feature_code, feature_version):
-
-    # TODO - fetch remote/sha based on code/version; for now we point to main repo (configurable)
-
-    file_folder = os.path.dirname(os.path.realpath(__file__))
-    feature_folder = os.path.join(file_folder, '../ifc_validation/checks/ifc_gherkin_rules/features')
-
-    for file in os.listdir(feature_folder):
-        file_name = os.fsdecode(file)
-        fq_file_name = os.path.join(feature_folder, file_name)
-        version_tag = f'@version{feature_version}'
-        
-        if file_name.endswith(".feature") and file_name.startswith(feature_code) and file_contains_string(fq_file_name, version_tag):
-            return FEATURE_URL + file_name
-    
-    return None
-
-
-@functools.lru_cache(maxsize=1024)
-def get_feature_description(feature_code, feature_version):
-
-    # TODO - could probably use some of the ifc_gherkin_rules methods here?
-
-    file_folder = os.path.dirname(os.path.realpath(__file__))
-    feature_folder = os.path.join(file_folder, '../ifc_validation/checks/ifc_gherkin_rules/features')
-    
-    for file in os.listdir(feature_folder):
-        file_name = os.fsdecode(file)
-        fq_file_name = os.path.join(feature_folder, file_name)
-        version_tag = f'@version{feature_version}'
-
-        if file_name.endswith(".feature") and file_name.startswith(feature_code) and file_contains_string(fq_file_name, version_tag):
-            
-            gherkin_desc = ''
-            reading = False
-
-            with open(os.path.join(feature_folder, file_name), 'r') as input:
-                
-                for line in input:
-                    if 'Feature:' in line:
-                        reading = True
-                    if any(keyword in line for keyword in ['Scenario:', 'Background:', 'Scenario Outline:']):
-                        return gherkin_desc
-                    if reading and len(line.strip()) > 0 and 'Feature:' not in line and '@' not in line: 
-                        gherkin_desc += '\n' + line.strip()
-    
-    return None
-
-
-def status_combine(*args):
-    statuses = "-pvnwi"
-    return statuses[max(map(statuses.index, args))]
-
-
-def format_request(request):
-    return {
-        "id": request.public_id,
-        "code": request.public_id,
-        "filename": request.file_name,
-        "file_date": None if request.model is None or request.model.date is None else datetime.strftime(request.model.date, '%Y-%m-%d %H:%M:%S'), # TODO - formatting is actually a UI concern...
-        "user_id": IdObfuscator.to_public_id(request.created_by.id, override_cls=User),
-        "progress": -2 if request.status == ValidationRequest.Status.FAILED else (-1 if request.status == ValidationRequest.Status.PENDING else request.progress),
-        "date": datetime.strftime(request.created, '%Y-%m-%d %H:%M:%S'), # TODO - formatting is actually a UI concern...
-        "license": '-' if (request.model is None or request.model.license is None) else request.model.license,
-        "number_of_elements": None if (request.model is None or request.model.number_of_elements is None) else request.model.number_of_elements,
-        "number_of_geometries": None if (request.model is None or request.model.number_of_geometries is None) else request.model.number_of_geometries,
-        "number_of_properties": None if (request.model is None or request.model.number_of_properties is None) else request.model.number_of_properties,
-        "authoring_application": '-' if (request.model is None or request.model.produced_by is None) else request.model.produced_by.name,
-        "schema": '-' if (request.model is None or request.model.schema is None) else request.model.schema,
-        "size": request.size,
-        "mvd": '-' if (request.model is None or request.model.mvd is None) else request.model.mvd, # TODO - formatting is actually a UI concern...
-        "status_syntax": "p" if (request.model is None or request.model.status_syntax is None) else request.model.status_syntax,
-        "status_schema": status_combine(
-            "p" if (request.model is None or request.model.status_schema is None) else request.model.status_schema,
-            "p" if (request.model is None or request.model.status_prereq is None) else request.model.status_prereq
-        ),
-        "status_bsdd": "p" if (request.model is None or request.model.status_bsdd is None) else request.model.status_bsdd,
-        "status_mvd": "p" if (request.model is None or request.model.status_mvd is None) else request.model.status_mvd,
-        "status_ids": "p" if (request.model is None or request.model.status_ids is None) else request.model.status_ids,
-        "status_rules": status_combine(
-            "p" if (request.model is None or request.model.status_ia is None) else request.model.status_ia,
-            "p" if (request.model is None or request.model.status_ip is None)  else request.model.status_ip
-        ),
-        "status_ind": "p" if (request.model is None or request.model.status_industry_practices is None) else request.model.status_industry_practices,
-        "deleted": 0, # TODO
-        "commit_id": None #  TODO
-    }
-
-
 #@login_required - doesn't work as OAuth is not integrated with Django
 @ensure_csrf_cookie
 def me(request):
@@ -211,7 +128,7 @@ def me(request):
             },
             "redirect": None if user.is_active else '/waiting_zone'
         }
-        return JsonResponse(json)
+        return FastJsonResponse(json)
     
     else:
     
@@ -225,16 +142,48 @@ def models_paginated(request, start: int, end: int):
     if not user:
         return create_redirect_response(login=True)
     
-    # return model(s) as projection of Validation Request + Model attributes
-    requests = ValidationRequest.objects.filter(created_by__id=user.id, deleted=False).order_by('-created')[start:end]
-    total_count = ValidationRequest.objects.filter(created_by__id=user.id, deleted=False).count()
-    models = list(map(format_request, requests))
-    
+    # unchanged since the last poll > 304-NotModified
+    validators = get_validators(get_user_requests(user.id), user.id, start, end)
+    not_modified = get_not_modified_response(request, validators)
+    if not_modified:
+        return not_modified
+
+    # return model(s) as projection of Validation Request + Model attributes (single query, cached count)
+    response_data = {}
+    response_data['models'] = get_dashboard_slice(user.id, start, end)
+    response_data['count'] = get_dashboard_count(user.id)
+
+    return set_validators(FastJsonResponse(response_data), validators)
+
+
+def models_cursor_paginated(request):
+
+    # fetch current user
+    user = get_current_user(request)
+    if not user:
+        return create_redirect_response(login=True)
+
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return HttpResponseBadRequest()
+
+    # unchanged since the last poll > 304-NotModified
+    cursor = request.GET.get('cursor')
+    validators = get_validators(get_user_requests(user.id), user.id, cursor, limit)
+    not_modified = get_not_modified_response(request, validators)
+    if not_modified:
+        return not_modified
+
+    # keyset-paginated projection of Validation Request + Model attributes; 'next' is the cursor of the next page
+    models, next_cursor = get_dashboard_page(user.id, cursor, limit)
+
     response_data = {}
     response_data['models'] = models
-    response_data['count'] = total_count
+    response_data['count'] = get_dashboard_count(user.id)
+    response_data['next'] = next_cursor
 
-    return JsonResponse(response_data)
+    return set_validators(FastJsonResponse(response_data), validators)
 
 
 @requires_csrf_token
@@ -246,14 +195,13 @@ def download(request, id: int):
         return create_redirect_response(login=True)
 
     logger.debug(f"Locating file for pub='{id}' pk='{ValidationRequest.to_private_id(id)}'")
-    request = ValidationRequest.objects.filter(created_by__id=user.id, deleted=False, id=ValidationRequest.to_private_id(id)).first()
-    if request:
-        file_path = os.path.join(os.path.abspath(MEDIA_ROOT), request.file.name)
-        logger.debug(f"File to be downloaded is located at '{file_path}'")
+    validation_request = ValidationRequest.objects.filter(created_by__id=user.id, deleted=False, id=ValidationRequest.to_private_id(id)).first()
+    if validation_request:
+        logger.debug(f"File to be downloaded is located at '{validation_request.file.name}'")
 
-        response = HttpResponse(open(file_path), content_type="application/x-step")
-        response['Content-Disposition'] = f'attachment; filename="{request.file_name}"'
-        logger.debug(f"Sending file with id='{id}' back as '{request.file_name}'")
+        # streamed (or handed off to nginx), never read into memory
+        response = serve_file(request, validation_request.file.name, validation_request.file_name, content_type="application/x-step")
+        logger.debug(f"Sending file with id='{id}' back as '{validation_request.file_name}' (status={response.status_code})")
 
         return response
     else:
@@ -288,10 +236,17 @@ def upload(request):
             with transaction.atomic():
                 
                 instance = ValidationRequest.objects.create(
-                    file=f,
+                    file=stored_file_or_upload(f),
                     file_name=f.name,
                     size=f.size
                 )
+                store_ingestion_results(instance, f)
+
+                # non-IFC files and unsupported schemas fail fast, without running the workflow
+                rejection = precheck_upload(f)
+                if rejection:
+                    reject_validation_request(instance, *rejection)
+                    continue
 
                 transaction.on_commit(lambda: ifc_file_validation_task.delay(instance.id, instance.file_name))    
                 logger.info(f"Task 'ifc_file_validation_task' submitted for id: {instance.id} file_name: {instance.file_name} size: {f.size:,} bytes")
@@ -300,7 +255,7 @@ def upload(request):
         response = { 
             "url": "/dashboard"
         }
-        return JsonResponse(response)
+        return FastJsonResponse(response)
 
         #return HttpResponse(status=200) # TODO - this theoretically should be a 201_CREATED... 
     else:
@@ -328,10 +283,13 @@ def delete(request, ids: str):
                 request = ValidationRequest.objects.filter(created_by__id=user.id, deleted=False, id=ValidationRequest.to_private_id(id)).first()
 
                 request.delete()
+                transaction.on_commit(functools.partial(invalidate_report_snapshots, request.id))
                 logger.info(f"Validation Request with id='{id}' and related entities were marked as deleted.")
 
+            transaction.on_commit(functools.partial(invalidate_dashboard, user.id))
+
         # legacy API returns this object
-        return JsonResponse({
+        return FastJsonResponse({
 
             'status': 'success',
             'id': ids,
@@ -366,10 +324,11 @@ def revalidate(request, ids: str):
             request = ValidationRequest.objects.filter(created_by__id=user.id, id=ValidationRequest.to_private_id(id)).first()
             request.mark_as_pending(reason='Resubmitted for processing via React UI')
             if request.model: request.model.reset_status()
+            transaction.on_commit(functools.partial(invalidate_report_snapshots, request.id))
 
         transaction.on_commit(lambda: on_commit(ids))      
 
-    return JsonResponse({
+    return FastJsonResponse({
 
         'status': 'success',
         'id': ids,
@@ -385,171 +344,36 @@ def report(request, id: str):
     if not user:
         return create_redirect_response(login=True)
 
+    # unchanged since the last poll > 304-NotModified (before any report query runs)
+    http_request = request
+    requests = ValidationRequest.objects.filter(created_by__id=user.id, deleted=False, id=ValidationRequest.to_private_id(id))
+    validators = get_validators(requests, report_type, with_tasks=True)
+    not_modified = get_not_modified_response(http_request, validators)
+    if not_modified:
+        return not_modified
+
     # return 404-NotFound if report is not for current user or if it is deleted
-    request = ValidationRequest.objects.filter(created_by__id=user.id, deleted=False, id=ValidationRequest.to_private_id(id)).first()
+    request = get_report_requests().filter(created_by__id=user.id, deleted=False, id=ValidationRequest.to_private_id(id)).first()
     if not request:
         return HttpResponseNotFound()
     
-    # return file metrics as projection of Validation Request + Model attributes
-    instances = {}
-    model = format_request(request)
-    
-    # retrieve and map syntax outcome(s)
-    syntax_results = []
-    if report_type == 'syntax' and request.model and request.model.status_syntax != Model.Status.VALID:
-        
-        logger.info('Fetching and mapping syntax results...')    
-        
-        task = ValidationTask.objects.filter(request_id=request.id, type=ValidationTask.Type.SYNTAX).last()
-        if task.outcomes:
-            for outcome in task.outcomes.iterator():
-                # TODO - should we not do this in the model?
-                match = re.search('^On line ([0-9])+ column ([0-9])+(.)*', outcome.observed)                
-                mapped = {
-                    "id": outcome.public_id,
-                    "lineno": match.groups()[0] if match and len(match.groups()) > 0 else None,
-                    "column": match.groups()[1] if match and len(match.groups()) > 1 else None,
-                    "severity": outcome.severity,
-                    "msg": f"expected: {outcome.expected}, observed: {outcome.observed}" if getattr(outcome, 'expected', None) is not None else outcome.observed,
-                    "task_id": outcome.validation_task_public_id
-                }
-                syntax_results.append(mapped)
-    
-        logger.info('Fetching and mapping syntax done.')
-
-    # retrieve and map schema outcome(s) + instances
-    schema_results = []
-    if report_type == 'schema' and request.model:
-        
-        logger.info('Fetching and mapping schema results...')    
-        
-        task = ValidationTask.objects.filter(request_id=request.id, type=ValidationTask.Type.SCHEMA).last()
-        if task.outcomes:
-            for outcome in task.outcomes.iterator():
-                mapped = {
-                    "id": outcome.public_id,
-                    "attribute": json.loads(outcome.feature)['attribute'] if outcome.feature else None, # eg. 'IfcSpatialStructureElement.WR41',
-                    "constraint_type": json.loads(outcome.feature)['type'] if outcome.feature else None,  # 'uncategorized', 'schema', 'global_rule', 'simpletype_rule', 'entity_rule'
-                    "instance_id": outcome.instance_public_id,
-                    "severity": outcome.severity,
-                    "msg": outcome.observed,
-                    "task_id": outcome.validation_task_public_id
-                }
-                schema_results.append(mapped)
-
-                inst = outcome.instance
-                if inst and inst.public_id not in instances:
-                    instance = {
-                        "guid": f'#{inst.stepfile_id}',
-                        "type": inst.ifc_type
-                    }
-                    instances[inst.public_id] = instance
-    
-        logger.info('Fetching and mapping schema done.')
-
-    # retrieve and map gherkin rules outcome(s) + instances
-    grouping = (
-        ('normative', (ValidationTask.Type.NORMATIVE_IA, ValidationTask.Type.NORMATIVE_IP)),
-        ('prerequisites', (ValidationTask.Type.PREREQUISITES,)),
-        ('industry', (ValidationTask.Type.INDUSTRY_PRACTICES,)))
-    
-    grouped_gherkin_outcomes = {k: list() for k in map(operator.itemgetter(0), grouping)}
-
-    for label, types in grouping:
-
-        if not (report_type == label or (label == 'prerequisites' and report_type == 'schema')):
-            continue
-
-        logger.info('Fetching and mapping {label} Gherkin results...')
-
-        print(*(request.id for t in types))
-
-        tasks = [ValidationTask.objects.filter(request_id=request.id, type=t).last() for t in types]
-        all_outcomes : typing.Sequence[ValidationOutcome] = itertools.chain.from_iterable(t.outcomes.iterator() for t in tasks)
-        for outcome in all_outcomes:
-            mapped = {                
-                "id": outcome.public_id,
-                "feature": outcome.feature,
-                "feature_version": outcome.feature_version,
-                "feature_url": get_feature_url(outcome.feature[0:6], outcome.feature_version),
-                "feature_text": get_feature_description(outcome.feature[0:6], outcome.feature_version),
-                "step": outcome.get_severity_display(), # TODO
-                "severity": outcome.severity,
-                "instance_id": outcome.instance_public_id,
-                "expected": outcome.expected,
-                "observed": outcome.observed,
-                "message": str(outcome) if outcome.expected and outcome.observed else None,
-                "task_id": outcome.validation_task_public_id,
-                "msg": outcome.observed,                    
-            }
-            grouped_gherkin_outcomes[label].append(mapped)
-
-            inst = outcome.instance
-            if inst and inst.public_id not in instances:
-                instance = {
-                    "guid": f'#{inst.stepfile_id}',
-                    "type": inst.ifc_type
-                }
-                instances[inst.public_id] = instance
-
-        logger.info(f'Mapped {label} Gherkin results.')
-    
-    # retrieve and map bsdd results + instances
-    bsdd_results = []
+    # bSDD is disabled > 404-NotFound
     if report_type == 'bsdd' and request.model:
-
-        # bSDD is disabled > 404-NotFound
         logger.warning('Note: bSDD checks/reports are disabled.')
         return HttpResponseNotFound('bSDD checks are disabled')
 
-        logger.info('Fetching and mapping bSDD results...')
-
-        # only concerned about last run of each task
-        task = ValidationTask.objects.filter(request_id=request.id, type=ValidationTask.Type.BSDD).last()
-        if task.outcomes:
-            for outcome in task.outcomes.iterator():
-                feature_json = json.loads(outcome.feature)
-                mapped = {
-                    "id": outcome.id,                    
-                    "severity": outcome.severity,
-                    "instance_id": outcome.instance_id,
-                    "expected": outcome.expected,
-                    "observed": outcome.observed,
-                    "category": feature_json['category'] if 'category' in feature_json else None,
-                    "dictionary": feature_json['dictionary'] if 'dictionary' in feature_json else None,
-                    "class": feature_json['class'] if 'class' in feature_json else None,
-                    "task_id": outcome.validation_task_public_id,
-                }
-                bsdd_results.append(mapped)
-
-                inst = outcome.instance
-                if inst and inst.id not in instances:
-                    instance = {
-                        "guid": f'#{inst.stepfile_id}',
-                        "type": inst.ifc_type
-                    }
-                    instances[inst.id] = instance
-
-        logger.info('Fetching and mapping bSDD done.')
-
-    response_data = {
-        'instances': instances,
-        'model': model,
-        'results': {
-            "syntax_results": syntax_results,
-            "schema_results": schema_results,
-            "bsdd_results": bsdd_results,
-            "norm_rules_results": grouped_gherkin_outcomes["normative"],
-            "ind_rules_results": grouped_gherkin_outcomes["industry"],
-            "prereq_rules_results": grouped_gherkin_outcomes["prerequisites"],
-        }
-    }
+    # completed requests are served from their (materialized) report snapshot
+    snapshot_path = get_report_snapshot(request, report_type)
+    if snapshot_path:
+        return report_snapshot_response(http_request, snapshot_path, validators)
 
-    logger.info('Serializing to JSON...')
-    response = JsonResponse(response_data)
-    logger.info('JSON done.')
+    # outcomes of old requests may have been archived - restored right here (deliberately, unlike the API endpoints):
+    # only requests without a snapshot get here, and the report page needs the outcomes to show anything at all
+    restore_request(request)
 
-    return response
+    # return file metrics as projection of Validation Request + Model attributes, with mapped outcome(s) + instances
+    # (streamed, so memory use does not depend on the number of outcomes)
+    return set_validators(StreamingHttpResponse(stream_report(request, report_type), content_type='application/json'), validators)
 
 
 def report_error(request, path):
@@ -0,0 +1,174 @@
+import os
+import atexit
+import logging
+import threading
+import collections
+
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# IMPORTANT
+#
+# Database connection metrics, shared across all gunicorn and Celery processes (counters in the shared cache):
+#   - connections opened, per process type (web, worker)
+#   - time spent waiting for a new connection (connect + authentication, or pgbouncer), as a histogram
+# Connection setup never waits on the cache: counts are aggregated in process and flushed to the shared cache by a
+# background thread every FLUSH_INTERVAL seconds (and at exit) - a failed flush keeps them for the next one.
+# Connections currently open on the server side are read from pg_stat_activity (by application_name), and waiting
+# clients from pgbouncer (SHOW POOLS) when connecting through it. See the db_metrics management command.
+
+# upper bounds (ms) of the connect time histogram; the last bucket has no upper bound
+CONNECT_TIME_BUCKETS = (1, 5, 10, 50, 100, 500, 1000)
+
+FLUSH_INTERVAL = 10
+
+
+def get_bucket_label(index):
+
+    if index < len(CONNECT_TIME_BUCKETS):
+        return f'<{CONNECT_TIME_BUCKETS[index]}ms'
+    return f'>={CONNECT_TIME_BUCKETS[-1]}ms'
+
+
+def get_metrics_key(process_type, name):
+
+    return f"db:metrics:{process_type}:{name}"
+
+
+def increment(key, delta=1):
+
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # first connection (or evicted) - add() keeps concurrent processes from resetting each other's counts
+        if not cache.add(key, delta, timeout=None):
+            cache.incr(key, delta)
+
+
+_pending = collections.Counter()
+_lock = threading.Lock()
+_stopped = threading.Event()
+_flusher_pid = None
+
+
+def flush_metrics():
+
+    """
+    Adds the counts recorded in this process since the last flush to the shared counters.
+    """
+
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+
+    while pending:
+        key, delta = next(iter(pending.items()))
+        try:
+            increment(key, delta)
+        except Exception as err:
+            # keep the rest for the next flush; metrics must never fail a request or a task
+            with _lock:
+                _pending.update(pending)
+            logger.warning(f"Unable to flush database connection metrics ({err})")
+            return
+        del pending[key]
+
+
+def run_flusher():
+
+    while not _stopped.wait(FLUSH_INTERVAL):
+        flush_metrics()
+
+
+def reset_after_fork():
+
+    # counts recorded before a fork are the parent's to flush
+    global _lock
+    _lock = threading.Lock()
+    _pending.clear()
+
+
+atexit.register(flush_metrics)
+os.register_at_fork(after_in_child=reset_after_fork)
+
+
+def start_flusher():
+
+    global _flusher_pid
+
+    # one per process: threads don't survive a fork (gunicorn and Celery workers are forked)
+    if _flusher_pid != os.getpid():
+        with _lock:
+            if _flusher_pid != os.getpid():
+                _flusher_pid = os.getpid()
+                threading.Thread(target=run_flusher, name='db-metrics-flusher', daemon=True).start()
+
+
+def record_connection(process_type, seconds):
+
+    """
+    Records a new database connection and the time it took to get it (in process, see flush_metrics).
+    """
+
+    ms = seconds * 1000
+    bucket = next((i for i, bound in enumerate(CONNECT_TIME_BUCKETS) if ms < bound), len(CONNECT_TIME_BUCKETS))
+    with _lock:
+        _pending[get_metrics_key(process_type, 'connections')] += 1
+        _pending[get_metrics_key(process_type, 'connect_us')] += int(seconds * 1_000_000)
+        _pending[get_metrics_key(process_type, f'bucket:{bucket}')] += 1
+    start_flusher()
+
+
+def get_metrics(process_types=('web', 'worker')):
+
+    """
+    Returns the number of connections opened, their average connect time and connect time histogram per process type
+    (since the counters were last reset).
+    """
+
+    flush_metrics()
+    metrics = {}
+    for process_type in process_types:
+        names = ['connections', 'connect_us'] + [f'bucket:{i}' for i in range(len(CONNECT_TIME_BUCKETS) + 1)]
+        values = cache.get_many([get_metrics_key(process_type, name) for name in names])
+        value = lambda name: values.get(get_metrics_key(process_type, name), 0)
+
+        count = value('connections')
+        metrics[process_type] = {
+            'connections': count,
+            'avg_connect_ms': value('connect_us') / count / 1000 if count else None,
+            'histogram': {get_bucket_label(i): value(f'bucket:{i}') for i in range(len(CONNECT_TIME_BUCKETS) + 1)},
+        }
+    return metrics
+
+
+def reset_metrics(process_types=('web', 'worker')):
+
+    with _lock:
+        _pending.clear()
+    cache.delete_many([
+        get_metrics_key(process_type, name)
+        for process_type in process_types
+        for name in ['connections', 'connect_us'] + [f'bucket:{i}' for i in range(len(CONNECT_TIME_BUCKETS) + 1)]
+    ])
+
+
+def get_server_connections(using='default'):
+
+    """
+    Returns the connections currently open on the PostgreSQL server, per application name and state (eg. active, idle).
+    """
+
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return []
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT application_name, state, COUNT(*) FROM pg_stat_activity "
+            "WHERE datname = current_database() AND backend_type = 'client backend' "
+            "GROUP BY application_name, state ORDER BY application_name, state"
+        )
+        return cursor.fetchall()
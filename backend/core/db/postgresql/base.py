@@ -0,0 +1,20 @@
+import time
+
+from django.conf import settings
+from django.db.backends.postgresql import base
+
+from core.db import record_connection
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    """
+    PostgreSQL backend recording connection metrics (see core.db) - otherwise the same as django.db.backends.postgresql.
+    """
+
+    def get_new_connection(self, conn_params):
+
+        started = time.perf_counter()
+        connection = super().get_new_connection(conn_params)
+        record_connection(getattr(settings, 'DJANGO_PROCESS_TYPE', 'web'), time.perf_counter() - started)
+        return connection
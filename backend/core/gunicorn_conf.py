@@ -0,0 +1,11 @@
+# gunicorn settings (see docker/backend/server-entrypoint.sh) - workers, threads and worker class are set on the command line
+
+
+def post_fork(server, worker):
+
+    # gevent workers: make psycopg2 cooperative, so a greenlet waiting on PostgreSQL (or pgbouncer) yields to the others
+    # instead of blocking the whole worker
+    if 'gevent' in server.cfg.worker_class_str:
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+        worker.log.info("Patched psycopg2 for gevent")
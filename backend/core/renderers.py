@@ -0,0 +1,108 @@
+import logging
+import functools
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder as DRFJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to the stdlib encoder
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+JSON_RENDERER_ORJSON = 'orjson'
+JSON_RENDERER_STDLIB = 'json'
+
+# datetimes are passed to `default` so their format stays identical to the stdlib encoders (eg. '2024-01-31T10:00:00.123Z')
+ORJSON_OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+def use_orjson():
+
+    """
+    Returns True if the fast (orjson) encoder is configured via settings.JSON_RENDERER and available.
+    """
+
+    if getattr(settings, 'JSON_RENDERER', JSON_RENDERER_ORJSON) != JSON_RENDERER_ORJSON:
+        return False
+    if orjson is None:
+        logger.warning("JSON_RENDERER is set to 'orjson' but orjson is not installed - using the stdlib json encoder")
+        return False
+    return True
+
+
+def get_json_dumps(encoder_cls=DjangoJSONEncoder):
+
+    """
+    Returns a function serializing data to UTF-8 encoded JSON with the configured encoder.
+    Types not natively supported by orjson (datetime, Decimal, Promise, ...) are handled by `encoder_cls.default`,
+    so both encoders produce the same documents. Resolve it once when encoding many small objects.
+
+    Optional Args:
+       encoder_cls: stdlib JSONEncoder subclass used for (fallback) type conversions
+
+    Returns:
+       Function taking an object and returning bytes.
+    """
+
+    if use_orjson():
+        return functools.partial(orjson.dumps, default=encoder_cls().default, option=ORJSON_OPTIONS)
+
+    encoder = encoder_cls()
+    return lambda data: encoder.encode(data).encode('utf-8')
+
+
+def json_dumps(data, encoder_cls=DjangoJSONEncoder):
+
+    """
+    Serializes data to UTF-8 encoded JSON, using the configured encoder (see get_json_dumps).
+    """
+
+    return get_json_dumps(encoder_cls)(data)
+
+
+class FastJsonResponse(JsonResponse):
+
+    """
+    Drop-in replacement for JsonResponse that serializes via json_dumps() (orjson when configured).
+    """
+
+    def __init__(self, data, encoder=DjangoJSONEncoder, safe=True, json_dumps_params=None, **kwargs):
+
+        if safe and not isinstance(data, dict):
+            raise TypeError("In order to allow non-dict objects to be serialized set the safe parameter to False.")
+        if json_dumps_params:
+            # eg. indent/sort_keys - not supported by the fast path
+            super().__init__(data, encoder=encoder, safe=safe, json_dumps_params=json_dumps_params, **kwargs)
+            return
+
+        kwargs.setdefault("content_type", "application/json")
+        HttpResponse.__init__(self, content=json_dumps(data, encoder), **kwargs)
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    """
+    DRF renderer that serializes via orjson (when configured), keeping DRF's own type conversions.
+    Indented or ASCII-only output (eg. 'application/json; indent=4') is left to the default DRF renderer.
+    """
+
+    encoder_class = DRFJSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if not use_orjson() or self.ensure_ascii or self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+
+        # same as DRF: escape line/paragraph separators, which are valid JSON but not valid JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -17,6 +17,7 @@ import ast
 from dotenv import load_dotenv
 from pathlib import Path
 from django.core.exceptions import ImproperlyConfigured
+from celery.schedules import crontab
 
 load_dotenv()
 
@@ -38,6 +39,8 @@ PUBLIC_URL = os.getenv('PUBLIC_URL').strip('/') if os.getenv('PUBLIC_URL') is no
 
 # URL for rule hyperlinks; by default points to bSI Gherkin Rules repo (main)
 FEATURE_URL = os.getenv('FEATURE_URL', 'https://github.com/buildingSMART/ifc-gherkin-rules/blob/main/features/')
+# (code, version) -> feature file/url/description, generated via 'manage.py build_feature_index'
+FEATURE_INDEX_FILE = os.getenv('FEATURE_INDEX_FILE', os.path.join(BASE_DIR, 'feature_index.json'))
 
 ALLOWED_HOSTS = ["127.0.0.1", "0.0.0.0", "localhost", "backend"]
 
@@ -91,8 +94,6 @@ MIDDLEWARE = [
     "debug_toolbar.middleware.DebugToolbarMiddleware",
 ]
 
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
-
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_ALL_ORIGINS = False
 CORS_ALLOWED_ORIGINS = []
@@ -131,9 +132,16 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.BasicAuthentication',
         'rest_framework.authentication.SessionAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ]
 }
 
+# JSON encoder for API + BFF responses: 'orjson' (fast) or 'json' (stdlib)
+JSON_RENDERER = os.environ.get('JSON_RENDERER', 'orjson').lower()
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'IFC Validation Service API',
     'DESCRIPTION': 'API for the buildingSMART Validation Service',
@@ -198,6 +206,63 @@ DATABASES_ALL = {
 
 DATABASES = {"default": DATABASES_ALL[os.environ.get("DJANGO_DB", DB_SQLITE)]}
 
+# Database connections (PostgreSQL), per process type - DJANGO_PROCESS_TYPE is set by the entrypoints (web or worker)
+#  - POSTGRES_POOL_MODE=none: a new connection per web request and per Celery task
+#  - POSTGRES_POOL_MODE=persistent: Celery workers keep their connection for POSTGRES_CONN_MAX_AGE seconds; gunicorn (gevent)
+#    workers still connect per request, as connections belong to a greenlet and greenlets end with their request
+#  - POSTGRES_POOL_MODE=pgbouncer: all processes connect through pgbouncer (transaction pooling) - web requests connect
+#    per request (cheap, pgbouncer keeps the server connections open), Celery workers keep their connection
+DJANGO_PROCESS_TYPE = os.environ.get("DJANGO_PROCESS_TYPE", "web")
+POSTGRES_POOL_MODE = os.environ.get("POSTGRES_POOL_MODE", "none")
+POSTGRES_CONN_MAX_AGE = int(os.environ.get("POSTGRES_CONN_MAX_AGE", 300))
+PGBOUNCER_HOST = os.environ.get("PGBOUNCER_HOST", "pgbouncer")
+PGBOUNCER_PORT = int(os.environ.get("PGBOUNCER_PORT", 6432))
+
+if POSTGRES_POOL_MODE not in ("none", "persistent", "pgbouncer"):
+    msg = "Configuration for POSTGRES_POOL_MODE is invalid: '{}' (expected 'none', 'persistent' or 'pgbouncer')."
+    raise ImproperlyConfigured(msg.format(POSTGRES_POOL_MODE))
+
+if DATABASES["default"]["ENGINE"] == DATABASES_ALL[DB_POSTGRESQL]["ENGINE"]:
+    DATABASES["default"].update({
+        "ENGINE": "core.db.postgresql",  # records connection metrics (see core/db)
+        "CONN_MAX_AGE": POSTGRES_CONN_MAX_AGE if DJANGO_PROCESS_TYPE == "worker" and POSTGRES_POOL_MODE != "none" else 0,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {"application_name": f"validate-{DJANGO_PROCESS_TYPE}"},
+    })
+    if POSTGRES_POOL_MODE == "pgbouncer":
+        DATABASES["default"].update({
+            "HOST": PGBOUNCER_HOST,
+            "PORT": PGBOUNCER_PORT,
+            # named (server-side) cursors do not survive transaction pooling
+            "DISABLE_SERVER_SIDE_CURSORS": True,
+        })
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# shared by all gunicorn/Celery workers (user lookups, dashboard pages, report snapshots); local memory if REDIS_CACHE_URL is empty
+
+REDIS_CACHE_URL = os.environ.get("REDIS_CACHE_URL", "")
+
+if REDIS_CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_CACHE_URL,
+            "KEY_PREFIX": "validate",
+        }
+    }
+
+# sessions are read from the shared cache and written through to the database (so they survive evictions);
+# database only without a shared cache, as a per-process cache would miss logins/logouts handled by other workers
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db" if REDIS_CACHE_URL else "django.contrib.sessions.backends.db"
+
+# timeouts (in seconds) of the BFF caches - see apps/ifc_validation_bff/caching.py
+BFF_CACHE_TIMEOUTS = {
+    "user": 300,
+    "dashboard": 300,
+    "report": 3600,
+}
+
 
 
 # Password validation
@@ -241,6 +306,16 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # Uploaded files
 MAX_FILES_PER_UPLOAD = 100
+FILE_UPLOAD_HANDLERS = [
+    "apps.ifc_validation.ingestion.IngestionUploadHandler",  # streams to MEDIA_ROOT + hash/size/header in one pass
+    "django.core.files.uploadhandler.MemoryFileUploadHandler",
+    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
+]
+# uploads declaring any other FILE_SCHEMA are rejected before being queued
+SUPPORTED_FILE_SCHEMAS = os.environ.get(
+    "SUPPORTED_FILE_SCHEMAS",
+    "IFC2X3 IFC4 IFC4X1 IFC4X2 IFC4X3_RC1 IFC4X3_RC2 IFC4X3_RC3 IFC4X3_RC4 IFC4X3 IFC4X3_TC1 IFC4X3_ADD1 IFC4X3_ADD2"
+).upper().split()
 MEDIA_URL = '/files/'
 MEDIA_ROOT = os.environ.get('MEDIA_ROOT', '/files_storage')
 try:
@@ -248,6 +323,36 @@ try:
 except Exception as err:
     msg = "Configuration for MEDIA_ROOT is invalid: '{}' does not exist and could not be created ({})."
     raise ImproperlyConfigured(msg.format(MEDIA_ROOT, err))
+# file downloads - when behind nginx, hand off to an internal location aliasing MEDIA_ROOT instead of streaming via Django
+USE_X_ACCEL_REDIRECT = ast.literal_eval(os.environ.get("USE_X_ACCEL_REDIRECT", 'False'))
+X_ACCEL_REDIRECT_PREFIX = os.environ.get("X_ACCEL_REDIRECT_PREFIX", '/protected_files/')
+# materialized report snapshots (gzipped JSON), rendered when a validation workflow completes
+REPORT_SNAPSHOT_ROOT = os.environ.get('REPORT_SNAPSHOT_ROOT', os.path.join(MEDIA_ROOT, '_reports'))
+# snapshots up to this size (in bytes, gzipped) are also kept in the shared cache
+REPORT_SNAPSHOT_CACHE_MAX_SIZE = int(os.environ.get('REPORT_SNAPSHOT_CACHE_MAX_SIZE', 256 * 1024))
+# outcome compaction (opt-in) - only the first N occurrences of the same rule/message are stored in full, the rest as one aggregated outcome (0 = off)
+OUTCOME_COMPACTION_LIMIT = int(os.environ.get('OUTCOME_COMPACTION_LIMIT', 0))
+# outcome message interning (opt-in) - long observed/expected messages are stored as a template reference + parameters,
+# which only this app can read (not the Gherkin rules or other direct readers of the outcome table); existing outcomes
+# are interned, or rendered back to plain text, by the intern_outcome_messages command
+OUTCOME_MESSAGE_INTERNING = ast.literal_eval(os.environ.get('OUTCOME_MESSAGE_INTERNING', 'False'))
+# cold archival (opt-in) - outcomes of requests older than the retention window (days, 0 = off) are moved to gzipped NDJSON
+# files, at most OUTCOME_ARCHIVE_LIMIT requests per (nightly) run, restored on demand and archived again when not restored
+# for OUTCOME_RESTORED_DAYS
+OUTCOME_ARCHIVE_ROOT = os.environ.get('OUTCOME_ARCHIVE_ROOT', os.path.join(MEDIA_ROOT, '_archive'))
+OUTCOME_RETENTION_DAYS = int(os.environ.get('OUTCOME_RETENTION_DAYS', 0))
+OUTCOME_RESTORED_DAYS = int(os.environ.get('OUTCOME_RESTORED_DAYS', 7))
+OUTCOME_ARCHIVE_LIMIT = int(os.environ.get('OUTCOME_ARCHIVE_LIMIT', 100))
+# soft-deleted Validation Requests are purged (permanently deleted) after PURGE_RETENTION_DAYS (opt-in, 0 = never)
+PURGE_RETENTION_DAYS = int(os.environ.get('PURGE_RETENTION_DAYS', 0))
+# bSDD lookups - 'api' (with a shared cache) or 'snapshot': local snapshot first (built by the build_bsdd_snapshot command,
+# refreshed weekly), API on a miss; the snapshot has the classes and properties of BSDD_SNAPSHOT_DICTIONARIES (comma-separated uris)
+BSDD_MODE = os.environ.get('BSDD_MODE', 'api')
+BSDD_SNAPSHOT_PATH = os.environ.get('BSDD_SNAPSHOT_PATH', os.path.join(MEDIA_ROOT, '_bsdd', 'snapshot.sqlite3'))
+BSDD_SNAPSHOT_DICTIONARIES = [uri.strip() for uri in os.environ.get('BSDD_SNAPSHOT_DICTIONARIES', 'https://identifier.buildingsmart.org/uri/buildingsmart/ifc/4.3').split(',') if uri.strip()]
+if BSDD_MODE not in ('api', 'snapshot'):
+    msg = "Configuration for BSDD_MODE is invalid: '{}' (expected 'api' or 'snapshot')."
+    raise ImproperlyConfigured(msg.format(BSDD_MODE))
 
 # Celery broker, timers and result
 CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL", "redis://localhost:6379/0")
@@ -285,6 +390,22 @@ except Exception as err:
     msg = "Configuration for CELERY_BEAT_SCHEDULE_FILENAME is invalid: '{}' does not exist and could not be created ({})."
     raise ImproperlyConfigured(msg.format(os.path.dirname(CELERY_BEAT_SCHEDULE_FILENAME), err))
 
+# scheduled tasks (run by the worker started with --beat)
+CELERY_BEAT_SCHEDULE = {
+    'archive-outcomes': {
+        'task': 'apps.ifc_validation.tasks.archive_outcomes_task',
+        'schedule': crontab(hour=3, minute=0),  # nightly
+    },
+    'purge-expired-requests': {
+        'task': 'apps.ifc_validation.tasks.purge_expired_requests_task',
+        'schedule': crontab(hour=4, minute=0),  # nightly
+    },
+    'refresh-bsdd-snapshot': {
+        'task': 'apps.ifc_validation.tasks.refresh_bsdd_snapshot_task',
+        'schedule': crontab(hour=2, minute=0, day_of_week=0),  # weekly
+    },
+}
+
 # LOGGING
 
 log_folder = os.getenv("DJANGO_LOG_FOLDER", "logs")
@@ -41,6 +41,7 @@ def callback(request):
     
     userinfo = token['userinfo']
     request.session['user'] = userinfo
+    request.session.pop('user_id', None) # resolved on first use (see views_legacy.get_current_user)
 
     username = userinfo['email'].lower()
     user = User.objects.all().filter(username=username).first()
@@ -71,6 +72,7 @@ def callback(request):
 
 def logout(request):
     request.session.pop('user', None)
+    request.session.pop('user_id', None)
     metadata = oauth.b2c.load_server_metadata()
     end_session_endpoint = metadata.get('end_session_endpoint')
     redirect_url = POST_LOGIN_REDIRECT_URL
@@ -17,6 +17,8 @@ do
 done
 echo "DB is ready."
 
+python manage.py build_feature_index
+
 python manage.py makemigrations
 python manage.py migrate
 python manage.py collectstatic --noinput
@@ -27,4 +29,7 @@ DJANGO_GUNICORN_THREADS_PER_WORKER=${DJANGO_GUNICORN_THREADS_PER_WORKER:-4} # de
 echo "Number of worker processes: $DJANGO_GUNICORN_WORKERS"
 echo "Number of threads per worker: $DJANGO_GUNICORN_THREADS_PER_WORKER"
 
-gunicorn core.wsgi --bind 0.0.0.0:8000 --workers $DJANGO_GUNICORN_WORKERS --threads $DJANGO_GUNICORN_THREADS_PER_WORKER --worker-class gevent --worker-tmp-dir /dev/shm --timeout 60 --keep-alive 60
+# database connections per process type (see DATABASES in settings)
+export DJANGO_PROCESS_TYPE=web
+
+gunicorn core.wsgi --config python:core.gunicorn_conf --bind 0.0.0.0:8000 --workers $DJANGO_GUNICORN_WORKERS --threads $DJANGO_GUNICORN_THREADS_PER_WORKER --worker-class gevent --worker-tmp-dir /dev/shm --timeout 60 --keep-alive 60
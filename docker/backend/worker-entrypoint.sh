@@ -17,7 +17,12 @@ do
 done
 echo "DB is ready."
 
+python manage.py build_feature_index
+
 CELERY_CONCURRENCY=${CELERY_CONCURRENCY:-6} # default 6 worker processes
 echo "Celery concurrency: $CELERY_CONCURRENCY"
 
+# database connections per process type (see DATABASES in settings)
+export DJANGO_PROCESS_TYPE=worker
+
 celery --app=core worker --loglevel=info --concurrency $CELERY_CONCURRENCY --task-events --hostname=worker@%n --beat
\ No newline at end of file
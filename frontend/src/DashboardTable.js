@@ -249,12 +249,22 @@ export default function DashboardTable({ models }) {
   const context = useContext(PageContext);
   const handleAsyncError = HandleAsyncError();
 
+  // cursors[n] is the (keyset) cursor of page n, as returned by the backend for page n - 1
+  const cursors = React.useRef(['']);
+
   useEffect(() => {
-    fetch(`${FETCH_PATH}/api/models_paginated/${page * rowsPerPage}/${page * rowsPerPage + rowsPerPage}`)
+    const cursor = cursors.current[page];
+    const url = (cursor !== undefined)
+      ? `${FETCH_PATH}/api/models?limit=${rowsPerPage}&cursor=${encodeURIComponent(cursor)}`
+      : `${FETCH_PATH}/api/models_paginated/${page * rowsPerPage}/${page * rowsPerPage + rowsPerPage}`;
+    fetch(url)
       .then((response) => response.json())
       .then((json) => {
         setRows(json["models"]);
         setCount(json["count"]);
+        if (cursor !== undefined) {
+          cursors.current[page + 1] = json["next"] || undefined;
+        }
         if (json.models.some(m => (m.progress < 100))) {
           setTimeout(() => {setProgress(progress + 1)}, 5000)
         }
@@ -446,7 +456,7 @@ export default function DashboardTable({ models }) {
         rowsPerPage={rowsPerPage}
         page={page}
         onPageChange={handleChangePage}
-        onRowsPerPageChange={(event) => { setRowsPerPage(parseInt(event.target.value, 10)) }}
+        onRowsPerPageChange={(event) => { cursors.current = ['']; setPage(0); setRowsPerPage(parseInt(event.target.value, 10)) }}
       />
 
     </Box>